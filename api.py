@@ -0,0 +1,293 @@
+import argparse
+import base64
+import json
+import os
+from functools import lru_cache
+
+from dotenv import load_dotenv
+
+# Load environment variables from .env file before the modules below read their settings
+load_dotenv()
+
+from starlette.applications import Starlette
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from assistant import Session, answer_question_auto_lang, create_client, create_support_ticket
+from chat_history import ConversationHistory
+from retrieval import index_guide
+from summarizer import DEFAULT_MAX_WORKERS, summarize_user_guide
+from ticket_store import get_ticket_store
+from tracing import prometheus_text, span
+from tts import speak, speak_stream, tts_language_code
+
+# Address and number of worker processes of `python api.py`
+API_HOST = os.getenv("API_HOST", "0.0.0.0")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+API_WORKERS = int(os.getenv("API_WORKERS", "1"))
+NDJSON = "application/x-ndjson"
+
+
+@lru_cache(maxsize=1)
+def get_api_model_client():
+    """Create the rate-limited model client once per worker process"""
+    return create_client()
+
+
+def _client():
+    client = get_api_model_client()
+    if client is None:
+        raise ValueError("Azure OpenAI credentials not found. Set AZURE_OPENAI_API_KEY and AZURE_OPENAI_ENDPOINT.")
+    return client
+
+
+def _ndjson(events):
+    """Encode a sync iterator of events as newline-delimited JSON, run off the event loop"""
+    async def body():
+        async for event in iterate_in_threadpool(events):
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+    return StreamingResponse(body(), media_type=NDJSON)
+
+
+def _error(message, status_code=400):
+    return JSONResponse({"error": message}, status_code=status_code)
+
+
+async def _body(request, fields):
+    """Return the JSON object of a request without its null fields; ValueError names what is malformed.
+
+    fields maps each field the handler reads to its type: str, int, float, bool or dict.
+    """
+    try:
+        body = await request.json()
+    except ValueError:  # Invalid JSON or UTF-8
+        raise ValueError("Request body must be JSON")
+    if not isinstance(body, dict):
+        raise ValueError("Request body must be a JSON object")
+    body = {field: value for field, value in body.items() if value is not None}
+    for field, kind in fields.items():
+        value = body.get(field)
+        if value is None:
+            continue
+        # JSON has no bool subtype of numbers, and an integer is a valid float
+        valid = isinstance(value, (int, float) if kind is float else kind) and (kind is bool or not isinstance(value, bool))
+        if not valid:
+            raise ValueError(f"{field} must be {type_names[kind]}")
+    return body
+
+
+type_names = {str: "a string", int: "an integer", float: "a number", bool: "true or false", dict: "an object"}
+
+
+def session_from_json(state):
+    """Build the conversation state of one request from the client's copy; ValueError when it is malformed"""
+    state = state or {}
+    history = state.get("chat_history", [])
+    if not isinstance(state.get("conversation", {}), dict) or not isinstance(state.get("previous_question", ""), str):
+        raise ValueError("session must hold a conversation object and a previous_question string")
+    if not isinstance(history, list) or not all(isinstance(message, dict) and isinstance(message.get("role"), str) and isinstance(message.get("content"), str) for message in history):
+        raise ValueError("session chat_history must be a list of messages with a role and content")
+    conversation = ConversationHistory()
+    conversation.summary = state.get("conversation", {}).get("summary", "")
+    conversation.summarized_count = state.get("conversation", {}).get("summarized_count", 0)
+    return Session(chat_history=list(state.get("chat_history", [])), conversation=conversation, previous_question=state.get("previous_question", ""))
+
+
+def session_to_json(session):
+    """Return the state the client sends back with its next question"""
+    return {
+        "conversation": {"summary": session.conversation.summary, "summarized_count": session.conversation.summarized_count},
+        "previous_question": session.previous_question
+    }
+
+
+async def summarize(request):
+    """Summarize a guide; with "stream": true, send {"delta"} lines as the summary is generated"""
+    try:
+        body = await _body(request, {"text": str, "style": str, "max_tokens": int, "temperature": float, "language": str, "model": str, "max_workers": int, "stream": bool})
+    except ValueError as e:
+        return _error(str(e))
+    if not body.get("text", "").strip():
+        return _error("text is required")
+    try:
+        client = _client()
+    except ValueError as e:
+        return _error(str(e), 503)
+
+    args = (client, body["text"], body.get("style", "concise"), body.get("max_tokens", 300), body.get("temperature", 0.3), body.get("language", "English"), body.get("model", "gpt-4o-mini"))
+    max_workers = body.get("max_workers", DEFAULT_MAX_WORKERS)
+    if body.get("stream"):
+        deltas = summarize_user_guide(*args, max_workers=max_workers, stream=True)
+        return _ndjson({"delta": delta} for delta in deltas)
+    summary = await run_in_threadpool(summarize_user_guide, *args, max_workers=max_workers)
+    return JSONResponse({"summary": summary})
+
+
+async def guides(request):
+    """Index a guide for retrieval and return its id"""
+    try:
+        body = await _body(request, {"text": str, "model": str})
+    except ValueError as e:
+        return _error(str(e))
+    if not body.get("text", "").strip():
+        return _error("text is required")
+    guide_id = await run_in_threadpool(index_guide, body["text"], body.get("model", "gpt-4o-mini"))
+    return JSONResponse({"guide_id": guide_id})
+
+
+def _answer_events(client, body, session):
+    """Yield {"delta"} events of a streamed answer, then one final event with the answer, its language and the new state"""
+    tickets = len(session.support_tickets)
+    answer_stream = answer_question_auto_lang(
+        client,
+        body["question"],
+        body.get("guide_summary", ""),
+        body.get("guide_document", ""),
+        body.get("fallback_language", "English"),
+        body.get("model", "gpt-4o-mini"),
+        body.get("guide_id"),
+        stream=True,
+        session=session
+    )
+    for delta in answer_stream:
+        yield {"delta": delta}
+    answer, reasoning, tool_call = answer_stream.result
+    new_tickets = session.support_tickets[tickets:]
+    yield {
+        "answer": answer,
+        "reasoning": reasoning,
+        "tool_call": tool_call,
+        "language": session.answer_language,
+        "tickets": new_tickets,
+        "session": session_to_json(session)
+    }
+
+
+async def ask(request):
+    """Answer a question about a guide.
+
+    The service keeps no conversation state: the client sends its chat history (ending with this question),
+    the rolling summary and the previous question, and stores the state returned with the answer.
+    """
+    try:
+        body = await _body(request, {
+            "question": str, "guide_summary": str, "guide_document": str, "fallback_language": str, "model": str, "guide_id": str, "session": dict, "stream": bool
+        })
+        session = session_from_json(body.get("session"))
+    except ValueError as e:
+        return _error(str(e))
+    if not body.get("question", "").strip():
+        return _error("question is required")
+    try:
+        client = _client()
+    except ValueError as e:
+        return _error(str(e), 503)
+
+    events = _answer_events(client, body, session)
+    if body.get("stream"):
+        return _ndjson(events)
+
+    def final_event():
+        *_, final = events
+        return final
+    return JSONResponse(await run_in_threadpool(final_event))
+
+
+def _speech_events(text, lang):
+    """Yield one event per synthesized sentence, encoded like the UI's audio files (Opus, or FLAC) and base64-encoded"""
+    from audio_player import encode_audio
+
+    for audio, sampling_rate in speak_stream(text, lang=lang):
+        with span("audio_encode", samples=len(audio)):
+            data, extension, mime_type = encode_audio(audio, sampling_rate)
+        yield {"sampling_rate": sampling_rate, "format": extension, "mime_type": mime_type, "audio": base64.b64encode(data).decode("ascii")}
+
+
+async def tts(request):
+    """Speak a text in a language name or MMS code ("lang"); returns an encoded audio file, or NDJSON segments with "stream": true"""
+    try:
+        body = await _body(request, {"text": str, "lang": str, "language": str, "stream": bool})
+    except ValueError as e:
+        return _error(str(e))
+    lang = body.get("lang") or tts_language_code(body.get("language", "English"))
+    if not body.get("text", "").strip():
+        return _error("text is required")
+    if lang is None:
+        return _error(f"No voice available for {body.get('language')}")
+
+    if body.get("stream"):
+        return _ndjson(_speech_events(body["text"], lang))
+
+    # The audio encoder lives with the Streamlit player, so it is only imported when speech is requested
+    from audio_player import encode_audio
+
+    def synthesize():
+        audio, sampling_rate = speak(body["text"], lang=lang)
+        with span("audio_encode", samples=len(audio)):
+            return encode_audio(audio, sampling_rate)
+    data, _, mime_type = await run_in_threadpool(synthesize)
+    return Response(data, media_type=mime_type)
+
+
+async def tickets(request):
+    """List one page of the shared support tickets, newest first, or create one idempotently"""
+    store = get_ticket_store()
+    if request.method == "GET":
+        status = request.query_params.get("status")
+        try:
+            limit = min(int(request.query_params.get("limit", "20")), 100)
+            offset = int(request.query_params.get("offset", "0"))
+        except ValueError:
+            return _error("limit and offset must be integers")
+        if limit < 1 or offset < 0:
+            return _error("limit must be positive and offset not negative")
+        page = await run_in_threadpool(store.list, status, limit, offset)
+        return JSONResponse({"tickets": page, "total": await run_in_threadpool(store.count, status)})
+
+    try:
+        body = await _body(request, {"name": str, "email": str, "question": str, "previous_question": str})
+    except ValueError as e:
+        return _error(str(e))
+    missing = [field for field in ("name", "email", "question") if not body.get(field, "").strip()]
+    if missing:
+        return _error(f"Missing fields: {', '.join(missing)}")
+    result = create_support_ticket(body["name"], body["email"], body["question"], body.get("previous_question", ""))
+    if not result["success"]:
+        return _error(result["message"], 500)
+    return JSONResponse(result, status_code=201 if result["created"] else 200)
+
+
+async def healthz(request):
+    return JSONResponse({"status": "ok", "model_client": get_api_model_client() is not None})
+
+
+async def metrics(request):
+    return PlainTextResponse(prometheus_text(), media_type="text/plain; version=0.0.4")
+
+
+app = Starlette(routes=[
+    Route("/v1/summarize", summarize, methods=["POST"]),
+    Route("/v1/guides", guides, methods=["POST"]),
+    Route("/v1/ask", ask, methods=["POST"]),
+    Route("/v1/tts", tts, methods=["POST"]),
+    Route("/v1/tickets", tickets, methods=["GET", "POST"]),
+    Route("/healthz", healthz),
+    Route("/metrics", metrics)
+])
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve the user guide assistant over HTTP")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument("--workers", type=int, default=API_WORKERS, help="Worker processes; each has its own model client, caches and TTS voices")
+    args = parser.parse_args()
+    # Multiple workers need the app as an import string so each process loads it itself
+    uvicorn.run("api:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
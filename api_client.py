@@ -0,0 +1,130 @@
+import base64
+import io
+import json
+import os
+import threading
+from functools import lru_cache
+
+import httpx
+import soundfile as sf
+
+from assistant import AnswerStream
+
+# Base URL of the assistant API service (python api.py); the UI runs the assistant in-process when unset
+ASSISTANT_API_URL = os.getenv("ASSISTANT_API_URL", "")
+# Seconds to wait for a response or the next streamed line
+ASSISTANT_API_TIMEOUT = float(os.getenv("ASSISTANT_API_TIMEOUT", "120"))
+
+
+class RemoteSpeechStream:
+    """Speech segments streamed from the API service, with the attributes of tts_service.SpeechStream"""
+
+    def __init__(self):
+        self.segments = []
+        self.sampling_rate = None
+        self.done = False
+        self.error = None
+
+
+class AssistantAPIClient:
+    """Calls the summarize, ask, tts and tickets endpoints of the API service"""
+
+    def __init__(self, base_url=ASSISTANT_API_URL, timeout=ASSISTANT_API_TIMEOUT, http=None):
+        # Tests pass a starlette TestClient of api.app as the HTTP client
+        self._http = http or httpx.Client(base_url=base_url, timeout=timeout)
+
+    def _events(self, path, payload):
+        """Yield the NDJSON events of a streamed response"""
+        with self._http.stream("POST", path, json={**payload, "stream": True}) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if line:
+                    yield json.loads(line)
+
+    def summarize(self, text, summary_style="concise", max_tokens=300, temperature=0.3, language="English", model="gpt-4o-mini", max_workers=None):
+        """Yield summary text deltas"""
+        payload = {"text": text, "style": summary_style, "max_tokens": max_tokens, "temperature": temperature, "language": language, "model": model}
+        if max_workers:
+            payload["max_workers"] = max_workers
+        try:
+            for event in self._events("/v1/summarize", payload):
+                yield event["delta"]
+        except Exception as e:
+            yield f"❌ Error generating summary: {str(e)}"
+
+    def index_guide(self, text, model="gpt-4o-mini"):
+        response = self._http.post("/v1/guides", json={"text": text, "model": model})
+        response.raise_for_status()
+        return response.json()["guide_id"]
+
+    def ask(self, question, guide_summary, guide_document="", fallback_language="English", model="gpt-4o-mini", guide_id=None, session=None):
+        """Return an AnswerStream of the answer; the session is updated from the service's reply when it ends"""
+        return AnswerStream(self._ask_stream(question, guide_summary, guide_document, fallback_language, model, guide_id, session))
+
+    def _ask_stream(self, question, guide_summary, guide_document, fallback_language, model, guide_id, session):
+        payload = {
+            "question": question,
+            "guide_summary": guide_summary,
+            "guide_document": guide_document,
+            "fallback_language": fallback_language,
+            "model": model,
+            "guide_id": guide_id,
+            "session": {
+                "chat_history": [{"role": message["role"], "content": message["content"]} for message in session.chat_history],
+                "conversation": {"summary": session.conversation.summary, "summarized_count": session.conversation.summarized_count},
+                "previous_question": session.previous_question
+            }
+        }
+        try:
+            for event in self._events("/v1/ask", payload):
+                if "delta" in event:
+                    yield event["delta"]
+                    continue
+                state = event["session"]
+                session.conversation.summary = state["conversation"]["summary"]
+                session.conversation.summarized_count = state["conversation"]["summarized_count"]
+                session.previous_question = state["previous_question"]
+                session.support_tickets.extend(event["tickets"])
+                session.answer_language = event["language"]
+                return event["answer"], event["reasoning"], event["tool_call"]
+            raise ValueError("The answer stream ended early")
+        except Exception as e:
+            print(f"❌ Error answering question: {str(e)}")
+            message = f"❌ Error answering question: {str(e)}"
+            yield message
+            return message, None, None
+
+    def speak_stream(self, text, lang="eng"):
+        """Return a RemoteSpeechStream filled sentence by sentence from a background thread"""
+        stream = RemoteSpeechStream()
+        threading.Thread(target=self._fill_speech, args=(stream, text, lang), name="tts-remote", daemon=True).start()
+        return stream
+
+    def _fill_speech(self, stream, text, lang):
+        try:
+            for event in self._events("/v1/tts", {"text": text, "lang": lang}):
+                # Segments arrive as encoded audio files; the player takes waveforms
+                audio, stream.sampling_rate = sf.read(io.BytesIO(base64.b64decode(event["audio"])), dtype="float32")
+                stream.segments.append(audio)
+        except Exception as e:
+            print(f"❌ Error synthesizing speech: {str(e)}")
+            stream.error = e
+        finally:
+            stream.done = True
+
+    def tickets(self, status=None, limit=20, offset=0):
+        """Return one page of the shared support tickets, newest first, and the total count"""
+        params = {"limit": limit, "offset": offset, **({"status": status} if status else {})}
+        response = self._http.get("/v1/tickets", params=params)
+        response.raise_for_status()
+        body = response.json()
+        return body["tickets"], body["total"]
+
+
+@lru_cache(maxsize=1)
+def get_api_client():
+    """Return the shared API client when ASSISTANT_API_URL is set, otherwise None"""
+    if not ASSISTANT_API_URL:
+        return None
+    print(f"🔌 Using the assistant API at {ASSISTANT_API_URL}")
+    return AssistantAPIClient(ASSISTANT_API_URL)
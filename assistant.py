@@ -0,0 +1,913 @@
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from types import MappingProxyType, SimpleNamespace
+
+from azure_client import get_async_client, get_client, record_usage, usage_scope
+from chat_history import DEFAULT_HISTORY_TOKENS, ConversationHistory
+from fake_client import get_fake_client
+from json_stream import JsonStringFieldStreamer
+from lang_detect import DEFAULT_CONFIDENCE_THRESHOLD, detect_language
+from rate_limit import AsyncLimitedChatClient, LimitedChatClient, get_deployment_pool, hedged
+from response_cache import ResponseCache, get_response_cache
+from retrieval import retrieve
+from semantic_cache import SemanticCache, get_semantic_cache
+from summarizer import count_tokens, truncate_tokens
+from ticket_store import get_ticket_store
+from tracing import increment, span
+
+
+class Session:
+    """Conversation state of one user: chat messages, the rolling history summary, the previous question and created tickets.
+
+    The Streamlit UI passes st.session_state, which has the same attributes; the API builds one per request.
+    """
+
+    def __init__(self, chat_history=None, conversation=None, previous_question="", support_tickets=None):
+        self.chat_history = chat_history if chat_history is not None else []
+        self.conversation = conversation or ConversationHistory()
+        self.previous_question = previous_question
+        self.support_tickets = support_tickets if support_tickets is not None else []
+        self.answer_language = None
+
+
+# Used by callers that do not pass a session, e.g. scripts and benchmarks
+default_session = Session()
+
+
+def _session(session):
+    return default_session if session is None else session
+
+
+def create_client(use_async=False):
+    """Return the shared rate-limited chat client, or None without Azure OpenAI credentials"""
+    limited_client = AsyncLimitedChatClient if use_async else LimitedChatClient
+    # MODEL_BACKEND=fake runs against the in-process fake client, without credentials
+    if os.getenv("MODEL_BACKEND", "azure") == "fake":
+        return limited_client(get_fake_client(use_async))
+
+    api_key = os.getenv("AZURE_OPENAI_API_KEY")
+    endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
+    if not api_key or not endpoint:
+        return None
+
+    # Requests are routed across the deployments of AZURE_OPENAI_DEPLOYMENTS, falling back to this endpoint
+    if use_async:
+        return limited_client(get_deployment_pool(get_async_client(endpoint, api_key), use_async=True))
+    return limited_client(get_deployment_pool(get_client(endpoint, api_key)))
+
+
+# Define available functions for OpenAI
+function_definitions = [{
+    "type": "function",
+    "function": {
+        "name": "create_support_ticket",
+        "description": "Submit a support ticket for further assistance if user provided question cannot be answered, when the user provides enough contact details including name and email",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "name": {
+                    "type": "string",
+                    "description": "The customer's full name"
+                },
+                "email": {
+                    "type": "string",
+                    "description": "The customer's email address"
+                },
+                "issue_description": {
+                    "type": "string",
+                    "description": "The question or issue the person is experiencing, getting from the 'Conversation history' where the question you cannot answered, or the current user requested support question"
+                }
+            },
+            "required": ["name", "email", "issue_description"]
+        }
+    }
+}]
+
+# Language-specific instructions
+language_instructions = {
+    "English": "",
+    "Spanish": " Please respond in Spanish.",
+    "French": " Please respond in French.",
+    "German": " Please respond in German.",
+    "Italian": " Please respond in Italian.",
+    "Portuguese": " Please respond in Portuguese.",
+    "Japanese": " Please respond in Japanese.",
+    "Chinese (Simplified)": " Please respond in Simplified Chinese.",
+    "Korean": " Please respond in Korean.",
+    "Arabic": " Please respond in Arabic.",
+    "Vietnamese": " Please respond in Vietnamese."
+}
+
+def create_support_ticket(name, email, question, previous_question=""):
+    """Create a customer support ticket in the shared ticket store; repeating a request returns the existing ticket"""
+    try:
+        ticket, created = get_ticket_store().create(name, email, question, previous_question)
+        if not created:
+            print(f"📋 Support ticket already exists: {ticket['id']}")
+            return {
+                "success": True,
+                "ticket": ticket,
+                "ticket_id": ticket["id"],
+                "created": False,
+                "message": f"Support ticket {ticket['id']} was already created for this issue. Our team will contact you at {ticket['email']} within 24-48 hours."
+            }
+
+        # Log for debugging
+        print(f"📋 Support ticket created: {ticket['id']}")
+        print(f"   Name: {name}")
+        print(f"   Email: {email}")
+        print(f"   Question: {question}")
+        if previous_question:
+            print(f"   Context: {previous_question}")
+        
+        return {
+            "success": True,
+            "ticket": ticket,
+            "ticket_id": ticket["id"],
+            "created": True,
+            "message": f"Support ticket {ticket['id']} has been created successfully. Our team will contact you at {email} within 24-48 hours."
+        }
+        
+    except Exception as e:
+        print(f"❌ Error creating support ticket: {str(e)}")
+        return {
+            "success": False,
+            "message": f"Failed to create support ticket: {str(e)}"
+        }
+
+
+# System prompt with Chain of Thought reasoning (from merege-code.py)
+# It is language-independent so every language shares the cached prefix; the language instruction is in the user prompt
+answer_system_prompt = """You are a reasoning AI assistant.
+Follow these steps for every answer:
+1. Analyze the question carefully, include subject, context, relationships, and any relevant details.
+2. Think step-by-step.
+3. Produce a clear, final answer if possible.
+
+For each question, respond as JSON:
+{
+  "reasoning": "step-by-step explanation based on the guideline above",
+  "answer": "final concise answer",
+  "confidence": "confidence level from 0.0 to 1.0",
+}
+
+IMPORTANT: 
+- If you you cannot answer, or the information is not found, ask if user wants to contact support, and also ask their name and email if unknown, **do not make up an example user and email, ask user to provide if missing**.
+- If the user wants to contact support, ask for their name and email if unknown, then use the create_support_ticket function to create a support ticket.
+- When you decide to call tool, also include the JSON response as specified above."""
+
+# Few-shot examples (from merege-code.py)
+few_shot_examples = [
+    # 1) Reset device (EN) – direct + steps
+    {
+        "context": (
+            "User Guide Summary:\n"
+            "- Soft reset: Settings > System > Reset.\n"
+            "- Hard reset: giữ nút Reset ~10 giây đến khi LED đỏ nhấp nháy.\n\n"
+            "Original Document (truncated):\n"
+            "Hardware reset requires pressing and holding the recessed button for 8–12 seconds.\n"
+        ),
+        "question": "How do I perform a hard reset?",
+        "final_answer": (
+            "Use the physical reset button:\n"
+            "- Power on the device.\n"
+            "- Press and hold the recessed **Reset** button for ~10 seconds until the LED blinks red.\n"
+            "- Release to complete the hard reset.\n"
+            "If the LED never blinks, check the Hardware Reset section for model-specific notes."
+        ),
+    },
+
+    # 2) Export PDF (EN) – feature gating + alternatives
+    {
+        "context": (
+            "User Guide Summary:\n"
+            "- Export: TXT/HTML available by default.\n"
+            "- PDF export requires Advanced Preview to be enabled.\n"
+        ),
+        "question": "Can I export the summary to PDF?",
+        "final_answer": (
+            "Yes, if **Advanced Preview** is enabled:\n"
+            "- Open **Advanced Preview** → **Export** → **PDF**.\n"
+            "- If it's disabled, either enable Advanced Preview or export **TXT/HTML** instead."
+        ),
+    },
+
+    # 3) Missing data (EN) – Unknown/Not in guide
+    {
+        "context": (
+            "User Guide Summary:\n"
+            "- The app supports English, Spanish, and Japanese UI.\n"
+            "- Auto language detection applies to the chatbot only.\n"
+        ),
+        "question": "Does the UI support German?\n",
+        "final_answer": (
+            "Not in guide. The summary lists **English, Spanish, Japanese** only for the UI. "
+            "German isn't mentioned—please check the Localization section or release notes."
+        ),
+    },
+
+    # 4) Multi-language auto (ES) – respond in question language
+    {
+        "context": (
+            "User Guide Summary:\n"
+            "- Las copias de seguridad automáticas se ejecutan a las 02:00.\n"
+            "- Se pueden cambiar desde Settings > Backup Schedule.\n"
+        ),
+        "question": "¿Cómo cambio la hora de la copia de seguridad?\n",
+        "final_answer": (
+            "Ve a **Settings → Backup Schedule** y cambia la hora predeterminada (02:00) a la que prefieras. "
+            "Guarda los cambios para aplicarlos en la próxima ejecución."
+        ),
+    },
+
+    # 5) Troubleshooting (VI) – actions + conditions
+    {
+        "context": (
+            "User Guide Summary:\n"
+            "- Đăng nhập yêu cầu email đã xác thực.\n"
+            "- Sau 5 lần sai mật khẩu, tài khoản bị tạm khóa 15 phút.\n"
+            "- Có mục Reset password qua email.\n"
+        ),
+        "question": "Không đăng nhập được thì làm sao?\n",
+        "final_answer": (
+            "Thử theo thứ tự:\n"
+            "- Kiểm tra bạn đã xác thực email chưa.\n"
+            "- Nếu quên mật khẩu: dùng **Reset password** để đặt lại.\n"
+            "- Nếu nhập sai >5 lần: chờ 15 phút rồi thử lại.\n"
+            "- Vẫn lỗi: xem mục **Troubleshooting → Login** để kiểm tra mã lỗi cụ thể."
+        ),
+    },
+]
+
+def _build_answer_prompt_prefix():
+    """Build the system prompt and few-shot messages shared by every question"""
+    messages = [{"role": "system", "content": answer_system_prompt}]
+
+    # Add few-shot examples
+    for ex in few_shot_examples:
+        ex_prompt = f"""Based on the following user guide information, please answer the user's question accurately and concisely.
+
+{ex["context"]}
+
+User Question: {ex["question"]}
+
+Answer:"""
+        ex_response = {
+            "reasoning": "Example reasoning omitted.",
+            "answer": ex["final_answer"]
+        }
+        messages.append({"role": "user", "content": ex_prompt})
+        messages.append({"role": "assistant", "content": json.dumps(ex_response, ensure_ascii=False)})
+
+    return tuple(MappingProxyType(message) for message in messages)
+
+# Built once and frozen, so every request starts with byte-identical messages and hits Azure's prompt prefix cache
+answer_prompt_prefix = _build_answer_prompt_prefix()
+
+# Hard cap on the input tokens of one Q&A request
+MAX_PROMPT_TOKENS = 8000
+
+@lru_cache(maxsize=8)
+def _answer_prefix_tokens(model):
+    """Tokens of the static prefix and tool definitions, plus a few tokens of per-message overhead"""
+    prefix = sum(count_tokens(message["content"], model) + 4 for message in answer_prompt_prefix)
+    return prefix + count_tokens(json.dumps(function_definitions), model)
+
+def build_answer_messages(question, guide_summary, guide_document="", language="English", guide_id=None, relevant_chunks=None, client=None, model="gpt-4o-mini", session=None):
+    """Build the few-shot chat messages for a question about the user guide; relevant_chunks skips retrieval when already fetched"""
+    session = _session(session)
+    language_instruction = language_instructions.get(language, "")
+
+    # Create context with document information
+    context = f"User Guide Summary:\n{guide_summary}"
+    if relevant_chunks is None:
+        relevant_chunks = retrieve(guide_id, question) if guide_id else []
+    if relevant_chunks:
+        # Only the sections relevant to the question are sent, so the whole guide stays answerable
+        context += "\n\nRelevant Document Sections:\n" + "\n\n---\n\n".join(relevant_chunks)
+    elif guide_document:
+        context += (
+            f"\n\nOriginal Document:\n{guide_document[:2000]}..."
+            if len(guide_document) > 2000
+            else f"\n\nOriginal Document:\n{guide_document}"
+        )
+
+    # Static system prompt and few-shot examples come first, per-request content last
+    messages = [dict(message) for message in answer_prompt_prefix]
+
+    # User prompt with context and question
+    def user_prompt(context, history):
+        return f"""Based on the following user guide information, please answer the user's question accurately and concisely.{language_instruction}
+
+{context}
+
+Conversation history: 
+{history}
+
+Current User Question: {question}
+
+Answer:"""
+
+    # The prompt never exceeds MAX_PROMPT_TOKENS: the context is trimmed first if it alone is too large,
+    # and the history gets whatever budget is left
+    budget = MAX_PROMPT_TOKENS - _answer_prefix_tokens(model) - 4
+    fixed_tokens = count_tokens(user_prompt(context, ""), model)
+    if fixed_tokens > budget:
+        context = truncate_tokens(context, count_tokens(context, model) - (fixed_tokens - budget), model)
+        fixed_tokens = budget
+
+    history = session.chat_history[:-1]
+    history_text = session.conversation.render(
+        client, history, min(DEFAULT_HISTORY_TOKENS, budget - fixed_tokens), model
+    )
+
+    messages.append({"role": "user", "content": user_prompt(context, history_text)})
+
+    return messages
+
+def handle_tool_call(function_name, function_args, question, previous_question="", session=None):
+    """Run a function requested by the model and return its (answer, reasoning, tool_call) response"""
+    with span("tool_call", function=function_name) as tool_span:
+        result = _run_tool_call(function_name, function_args, question, previous_question, _session(session))
+        tool_span.set(handled=result is not None)
+        return result
+
+def _run_tool_call(function_name, function_args, question, previous_question, session):
+    if function_name == "create_support_ticket":
+        # Call the actual ticket creation function
+        result = create_support_ticket(
+            name=function_args.get("name"),
+            email=function_args.get("email"),
+            question=function_args.get("issue_description"),
+            previous_question=previous_question
+        )
+        function_called = {
+            "function_called": function_name,
+            "name": function_args.get("name"),
+            "email": function_args.get("email"),
+            "issue_description": function_args.get("issue_description"),
+            "ticket_id": result.get('ticket_id')
+        }
+        
+        if result['success']:
+            # Save ticket to session state; a repeated request returns the ticket it already has
+            if result['created']:
+                session.support_tickets.append(result['ticket'])
+            
+            # Update previous_question for next interaction
+            session.previous_question = question
+            return (
+                f"""✅ {result['message']}
+
+📧 **Contact Information Recorded:**
+- Name: {function_args.get('name')}
+- Email: {function_args.get('email')}
+
+📋 **Issue Description:**
+{function_args.get('issue_description')}
+
+Our support team will review your query and respond within 24-48 hours.""", 
+                None, 
+                function_called
+            )
+        else:
+            # Update previous_question for next interaction
+            session.previous_question = question
+            return (
+                f"❌ {result['message']}",
+                None, 
+                function_called
+            )
+
+    # Unknown functions fall back to the model's text response
+    return None
+
+def format_answer(content):
+    """Parse the model's JSON response into the displayed answer and its reasoning"""
+    try:
+        # Parse the JSON response
+        response_json = json.loads(content)
+
+        reasoning = response_json.get('reasoning', None)
+
+        # Get the answer from the JSON - try both 'answer' and 'response' fields
+        answer = response_json.get('answer', content)
+
+        # Check if information was not found and suggest support contact
+        fallback_keywords = [
+            "not found", "not in guide", "not in the guide", "not mentioned",
+            "not available", "no information", "not explicitly found",
+            "does not provide", "doesn't provide", "not provide",
+            "does not contain", "doesn't contain", "not contain",
+            "cannot find", "can't find", "unable to find",
+            "not covered", "not included", "not described",
+            "không tìm thấy", "không có", "không được đề cập"  # Vietnamese
+        ]
+        answer_lower = answer.lower()
+        info_not_found = any(keyword in answer_lower for keyword in fallback_keywords)
+
+        # Add confidence indicator if low confidence
+        confidence = response_json.get('confidence', 1.0)
+        if float(confidence) < 0.5:
+            answer = f"⚠️ *Note: Lower confidence answer*\n\n{answer}"
+
+        # Add sources if available
+        sources = response_json.get('sources', [])
+        if sources:
+            answer += f"\n\n📚 **Sources:** {', '.join(sources)}"
+
+        # Add note if not found in guide with support contact suggestion
+        if info_not_found:
+            answer += "\n\n📌 *Note: This information was not explicitly found in the user guide.*"
+            answer += "\n\n💡 **Need more help?** Contact our support team by providing:"
+            answer += "\n- Your **name**"
+            answer += "\n- Your **email address**"
+            answer += "\n\nExample: *\"I need help with [your issue]. My name is John Doe and email is john@example.com\"*"
+
+        return answer, reasoning
+    except (json.JSONDecodeError, KeyError) as e:
+        # If it's not JSON or has unexpected structure, return the content as-is (fallback)
+        print(f"⚠️ Could not parse JSON: {e}")
+        return content, None
+
+def _answer_cache_key(messages, model):
+    return ResponseCache.make_key(
+        "answer", model=model, messages=messages, tools=function_definitions,
+        max_tokens=1000, temperature=0.2
+    )
+
+# Re-answers a sample of semantic cache hits in the background to measure drift
+_audit_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="semantic-audit")
+
+def _semantic_lookup(question, guide_summary, guide_document, language, model, guide_id, session):
+    """Return (cached answer or None, key to store the new answer under) for a standalone question"""
+    semantic_cache = get_semantic_cache()
+    # Follow-up questions depend on the conversation, so only questions asked without history share answers
+    if semantic_cache is None or session.chat_history[:-1]:
+        return None, None
+    # The cache only saves model calls: when embedding fails (the model downloads on first use) the question is answered normally
+    try:
+        with span("semantic_cache") as cache_span:
+            scope = (SemanticCache.guide_key(guide_summary, guide_document, guide_id), language, model)
+            vector = semantic_cache.embed(question)
+            entry = semantic_cache.lookup(question, vector, scope)
+            cache_span.set(hit=entry is not None)
+    except Exception as e:
+        print(f"⚠️ Semantic cache unavailable: {str(e)}")
+        return None, None
+    return entry, (question, vector, scope)
+
+def _semantic_store(semantic_key, content):
+    if semantic_key is None:
+        return
+    try:
+        question, vector, scope = semantic_key
+        get_semantic_cache().add(question, vector, content, scope)
+    except Exception as e:
+        print(f"⚠️ Semantic cache unavailable: {str(e)}")
+
+def _audit_semantic_hit(client, entry, question, guide_summary, guide_document, language, model, guide_id):
+    """Sometimes answer a semantic cache hit again without the cache and record how far the served answer drifted"""
+    semantic_cache = get_semantic_cache()
+    if not semantic_cache.should_audit():
+        return
+
+    def audit():
+        try:
+            messages = build_answer_messages(
+                question, guide_summary, guide_document, language, guide_id, model=model,
+                session=Session(chat_history=[{"role": "user", "content": question}])
+            )
+            # Its own span and scope keep audit tokens apart from the answers users asked for
+            with usage_scope() as usage, span("semantic_cache_audit", model=model):
+                response = client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    tools=function_definitions,
+                    tool_choice='auto',
+                    max_tokens=1000,
+                    response_format={"type": "json_object"},
+                    temperature=0.2
+                )
+                record_usage(response.usage)
+            for kind in ("prompt_tokens", "completion_tokens"):
+                increment("semantic_cache_audit_tokens", usage[kind], kind=kind.replace("_tokens", ""))
+            message = response.choices[0].message
+            if message.tool_calls or not message.content:
+                return
+            drift = semantic_cache.record_drift(entry, format_answer(entry.value)[0], format_answer(message.content)[0])
+            print(f"🧲 Semantic cache drift {drift:.3f} for: {question[:60]}")
+        except Exception as e:
+            print(f"❌ Error auditing semantic cache hit: {str(e)}")
+
+    _audit_executor.submit(audit)
+
+def _finish_answer(response_message, question, previous_question, session):
+    """Dispatch a tool call or format the JSON answer of a completed response"""
+    if response_message.tool_calls:
+        # The model wants to call a function
+        function_name = response_message.tool_calls[0].function.name
+        function_args = json.loads(response_message.tool_calls[0].function.arguments)
+        result = handle_tool_call(function_name, function_args, question, previous_question, session)
+        if result is not None:
+            return result
+
+    # No function call, parse the JSON response
+    answer, reasoning = format_answer(response_message.content)
+
+    # Update previous_question for next interaction
+    session.previous_question = question
+    return answer, reasoning, None
+
+class AnswerStream:
+    """Iterator over streamed answer text; result holds (answer, reasoning, tool_call) once it is exhausted"""
+
+    def __init__(self, generator):
+        self._generator = generator
+        self.result = None
+
+    def __iter__(self):
+        self.result = yield from self._generator
+
+def answer_question(client, question, guide_summary, guide_document="", language="English", model="gpt-4o-mini", guide_id=None, stream=False, session=None):
+    """Answer questions about the user guide using native OpenAI function calling with Chain of Thought reasoning"""
+    session = _session(session)
+    if stream:
+        return AnswerStream(_answer_question_stream(client, question, guide_summary, guide_document, language, model, guide_id, session))
+
+    try:
+        if not question.strip():
+            return "⚠️ Please ask a question about the user guide."
+
+        if not guide_summary.strip():
+            return "⚠️ No guide summary available. Please generate a summary first."
+
+        # Get the previous question BEFORE updating it
+        previous_question = session.previous_question
+
+        # A near-identical standalone question about the same guide reuses its answer, skipping retrieval and the model
+        cached_entry, semantic_key = _semantic_lookup(question, guide_summary, guide_document, language, model, guide_id, session)
+        if cached_entry is not None:
+            _audit_semantic_hit(client, cached_entry, question, guide_summary, guide_document, language, model, guide_id)
+            return _finish_answer(SimpleNamespace(content=cached_entry.value, tool_calls=None), question, previous_question, session)
+
+        messages = build_answer_messages(question, guide_summary, guide_document, language, guide_id, client=client, model=model, session=session)
+
+        # Identical prompts (same guide, history, question and language) reuse the cached completion
+        cache = get_response_cache()
+        cache_key = _answer_cache_key(messages, model)
+        cached_content = cache.get(cache_key)
+        if cached_content is not None:
+            response_message = SimpleNamespace(content=cached_content, tool_calls=None)
+        else:
+            # Call API with function calling support
+            with span("completion", purpose="answer", model=model):
+                response = hedged(client).chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    tools=function_definitions,
+                    tool_choice='auto',
+                    max_tokens=1000,
+                    response_format={"type": "json_object"},
+                    temperature=0.2
+                )
+                record_usage(response.usage)
+
+            # Check if the model wants to call a function
+            response_message = response.choices[0].message
+
+            # Tool calls have side effects (ticket creation), so only plain answers are cached
+            if not response_message.tool_calls and response_message.content:
+                cache.set(cache_key, response_message.content)
+                _semantic_store(semantic_key, response_message.content)
+
+        return _finish_answer(response_message, question, previous_question, session)
+
+    except Exception as e:
+        # Still update previous_question even on error
+        session.previous_question = question
+        print(f"❌ Error answering question: {str(e)}")
+        return f"❌ Error answering question: {str(e)}", None, None
+
+def _answer_question_stream(client, question, guide_summary, guide_document, language, model, guide_id, session):
+    """Yield the answer field while the JSON response streams in; returns the final (answer, reasoning, tool_call)"""
+    try:
+        if not question.strip():
+            message = "⚠️ Please ask a question about the user guide."
+            yield message
+            return message, None, None
+
+        if not guide_summary.strip():
+            message = "⚠️ No guide summary available. Please generate a summary first."
+            yield message
+            return message, None, None
+
+        # Get the previous question BEFORE updating it
+        previous_question = session.previous_question
+
+        cached_entry, semantic_key = _semantic_lookup(question, guide_summary, guide_document, language, model, guide_id, session)
+        if cached_entry is not None:
+            _audit_semantic_hit(client, cached_entry, question, guide_summary, guide_document, language, model, guide_id)
+            answer, reasoning = format_answer(cached_entry.value)
+            yield answer
+            session.previous_question = question
+            return answer, reasoning, None
+
+        messages = build_answer_messages(question, guide_summary, guide_document, language, guide_id, client=client, model=model, session=session)
+
+        cache = get_response_cache()
+        cache_key = _answer_cache_key(messages, model)
+        cached_content = cache.get(cache_key)
+        if cached_content is not None:
+            answer, reasoning = format_answer(cached_content)
+            yield answer
+            session.previous_question = question
+            return answer, reasoning, None
+
+        # Not made current: the caller runs between the yields below
+        with span("completion", activate=False, purpose="answer", model=model, stream=True) as completion_span:
+            response = hedged(client).chat.completions.create(
+                model=model,
+                messages=messages,
+                tools=function_definitions,
+                tool_choice='auto',
+                max_tokens=1000,
+                response_format={"type": "json_object"},
+                temperature=0.2,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+
+            # The answer field is rendered before reasoning/confidence have finished streaming
+            answer_streamer = JsonStringFieldStreamer("answer")
+            tool_calls = {}
+            streamed = False
+            for chunk in response:
+                # The last chunk carries the usage and no choices
+                if chunk.usage:
+                    record_usage(chunk.usage, completion_span)
+                # Azure sends content-filter chunks without choices
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                if delta.content:
+                    text = answer_streamer.feed(delta.content)
+                    if text:
+                        if not streamed:
+                            completion_span.set(first_token_ms=round((time.perf_counter() - completion_span.started) * 1000, 1))
+                        streamed = True
+                        yield text
+                for tool_call in delta.tool_calls or []:
+                    call = tool_calls.setdefault(tool_call.index, {"name": "", "arguments": ""})
+                    if tool_call.function.name:
+                        call["name"] += tool_call.function.name
+                    if tool_call.function.arguments:
+                        call["arguments"] += tool_call.function.arguments
+
+        content = answer_streamer.text
+        if tool_calls:
+            call = tool_calls[min(tool_calls)]
+            result = handle_tool_call(call["name"], json.loads(call["arguments"]), question, previous_question, session)
+            if result is not None:
+                yield ("\n\n" if streamed else "") + result[0]
+                return result
+        elif content:
+            cache.set(cache_key, content)
+            _semantic_store(semantic_key, content)
+
+        answer, reasoning = format_answer(content)
+        if not streamed:
+            yield answer
+
+        # Update previous_question for next interaction
+        session.previous_question = question
+        return answer, reasoning, None
+
+    except Exception as e:
+        # Still update previous_question even on error
+        session.previous_question = question
+        print(f"❌ Error answering question: {str(e)}")
+        message = f"❌ Error answering question: {str(e)}"
+        yield message
+        return message, None, None
+
+def detect_question_language(client, question, model="gpt-4o-mini", confidence_threshold=DEFAULT_CONFIDENCE_THRESHOLD):
+    """Detect the language of the user's question offline, using AI only when the local detector is unsure"""
+    if not question.strip():
+        return "English"  # Default fallback
+
+    with span("detect_language") as detect_span:
+        detected_language, confidence = detect_language(question)
+        detect_span.set(local_language=detected_language, confidence=confidence)
+        if confidence >= confidence_threshold:
+            detect_span.set(method="local", language=detected_language)
+            return detected_language
+
+        # Low-confidence local detection, ask the model
+        language = detect_question_language_llm(client, question, model)
+        detect_span.set(method="model", language=language)
+        return language
+
+def _language_detection_prompt(question):
+    # Simple language detection prompt
+    return f"""Identify the language of the following text and respond with ONLY the language name in English (e.g., "Spanish", "French", "German", etc.). If you're not sure or it's mixed languages, respond with "English".
+
+Text: "{question}"
+
+Language:"""
+
+def _normalize_detected_language(detected_language):
+    """Map the model's language name onto a supported language"""
+    # Validate detected language against supported languages
+    supported_languages = [
+        "English", "Spanish", "French", "German", "Italian", 
+        "Portuguese", "Japanese", "Chinese", "Korean", "Arabic", "Vietnamese"
+    ]
+    
+    # Handle variations and ensure we return a supported language
+    language_mapping = {
+        "chinese (simplified)": "Chinese (Simplified)",
+        "chinese": "Chinese (Simplified)",
+        "simplified chinese": "Chinese (Simplified)",
+        "mandarin": "Chinese (Simplified)"
+    }
+    
+    detected_lower = detected_language.strip().lower()
+    if detected_lower in language_mapping:
+        return language_mapping[detected_lower]
+
+    # Check if detected language is in supported list (case insensitive)
+    for lang in supported_languages:
+        if lang.lower() == detected_lower:
+            return lang
+
+    # If not found, default to English
+    return "English"
+
+def detect_question_language_llm(client, question, model="gpt-4o-mini"):
+    """Detect the language of the user's question using AI"""
+    try:
+        if not question.strip():
+            return "English"  # Default fallback
+
+        cache = get_response_cache()
+        cache_key = ResponseCache.make_key("language", model=model, question=question)
+        cached_language = cache.get(cache_key)
+        if cached_language is not None:
+            return cached_language
+
+        with span("completion", purpose="language_detection", model=model):
+            response = client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": _language_detection_prompt(question)}],
+                max_tokens=10,
+                temperature=0.1
+            )
+            record_usage(response.usage)
+
+        result = _normalize_detected_language(response.choices[0].message.content)
+        cache.set(cache_key, result)
+        return result
+        
+    except Exception as e:
+        print(f"Language detection error: {e}")
+        return "English"  # Fallback to English on error
+
+def answer_question_auto_lang(client, question, guide_summary, guide_document="", fallback_language="English", model="gpt-4o-mini", guide_id=None, stream=False, session=None):
+    """Answer questions with automatic language detection from the question; the detected language is stored on the session"""
+    session = _session(session)
+    if stream:
+        # The streamed answer reports input errors itself
+        detected_language = detect_question_language(client, question, model)
+        session.answer_language = detected_language
+        return answer_question(client, question, guide_summary, guide_document, detected_language, model, guide_id, stream=True, session=session)
+
+    try:
+        if not question.strip():
+            return "⚠️ Please ask a question about the user guide."
+        
+        if not guide_summary.strip():
+            return "⚠️ No guide summary available. Please generate a summary first."
+        
+        # Detect the language of the question
+        detected_language = detect_question_language(client, question, model)
+        session.answer_language = detected_language
+        
+        # Use the original answer_question function with detected language
+        return answer_question(client, question, guide_summary, guide_document, detected_language, model, guide_id, session=session)
+        
+    except Exception as e:
+        return f"❌ Error answering question: {str(e)}"
+
+
+async def detect_question_language_async(async_client, question, model="gpt-4o-mini", confidence_threshold=DEFAULT_CONFIDENCE_THRESHOLD):
+    """Async variant of detect_question_language for an AsyncAzureOpenAI client"""
+    try:
+        if not question.strip():
+            return "English"  # Default fallback
+
+        detected_language, confidence = detect_language(question)
+        if confidence >= confidence_threshold:
+            return detected_language
+
+        cache = get_response_cache()
+        cache_key = ResponseCache.make_key("language", model=model, question=question)
+        cached_language = cache.get(cache_key)
+        if cached_language is not None:
+            return cached_language
+
+        with span("completion", purpose="language_detection", model=model):
+            response = await async_client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": _language_detection_prompt(question)}],
+                max_tokens=10,
+                temperature=0.1
+            )
+            record_usage(response.usage)
+
+        result = _normalize_detected_language(response.choices[0].message.content)
+        cache.set(cache_key, result)
+        return result
+
+    except Exception as e:
+        print(f"Language detection error: {e}")
+        return "English"  # Fallback to English on error
+
+async def answer_question_async(async_client, question, guide_summary, guide_document="", language="English", model="gpt-4o-mini", guide_id=None, relevant_chunks=None, session=None):
+    """Async variant of answer_question for an AsyncAzureOpenAI client"""
+    session = _session(session)
+    try:
+        if not question.strip():
+            return "⚠️ Please ask a question about the user guide."
+
+        if not guide_summary.strip():
+            return "⚠️ No guide summary available. Please generate a summary first."
+
+        # Get the previous question BEFORE updating it
+        previous_question = session.previous_question
+
+        # Hits are not audited here: the audit runs on a worker thread, which cannot use the async client
+        cached_entry, semantic_key = await asyncio.to_thread(_semantic_lookup, question, guide_summary, guide_document, language, model, guide_id, session)
+        if cached_entry is not None:
+            return _finish_answer(SimpleNamespace(content=cached_entry.value, tool_calls=None), question, previous_question, session)
+
+        if relevant_chunks is None and guide_id:
+            relevant_chunks = await asyncio.to_thread(retrieve, guide_id, question)
+        # Without a synchronous client the history is kept within budget by truncation only
+        messages = build_answer_messages(question, guide_summary, guide_document, language, guide_id, relevant_chunks, model=model, session=session)
+
+        cache = get_response_cache()
+        cache_key = _answer_cache_key(messages, model)
+        cached_content = cache.get(cache_key)
+        if cached_content is not None:
+            response_message = SimpleNamespace(content=cached_content, tool_calls=None)
+        else:
+            with span("completion", purpose="answer", model=model):
+                response = await hedged(async_client).chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    tools=function_definitions,
+                    tool_choice='auto',
+                    max_tokens=1000,
+                    response_format={"type": "json_object"},
+                    temperature=0.2
+                )
+                record_usage(response.usage)
+            response_message = response.choices[0].message
+
+            # Tool calls have side effects (ticket creation), so only plain answers are cached
+            if not response_message.tool_calls and response_message.content:
+                cache.set(cache_key, response_message.content)
+                _semantic_store(semantic_key, response_message.content)
+
+        return _finish_answer(response_message, question, previous_question, session)
+
+    except Exception as e:
+        # Still update previous_question even on error
+        session.previous_question = question
+        print(f"❌ Error answering question: {str(e)}")
+        return f"❌ Error answering question: {str(e)}", None, None
+
+async def answer_question_auto_lang_async(async_client, question, guide_summary, guide_document="", fallback_language="English", model="gpt-4o-mini", guide_id=None, session=None):
+    """Async auto-language answer: language detection and retrieval run concurrently before the answer call"""
+    try:
+        if not question.strip():
+            return "⚠️ Please ask a question about the user guide."
+
+        if not guide_summary.strip():
+            return "⚠️ No guide summary available. Please generate a summary first."
+
+        detected_language, relevant_chunks = await asyncio.gather(
+            detect_question_language_async(async_client, question, model),
+            asyncio.to_thread(retrieve, guide_id, question) if guide_id else asyncio.sleep(0, result=[])
+        )
+        session = _session(session)
+        session.answer_language = detected_language
+        return await answer_question_async(async_client, question, guide_summary, guide_document, detected_language, model, guide_id, relevant_chunks, session)
+
+    except Exception as e:
+        return f"❌ Error answering question: {str(e)}"
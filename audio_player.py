@@ -1,10 +1,130 @@
 import streamlit as st
 import io
 import base64
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
 import numpy as np
 import soundfile as sf  # or scipy.io.wavfile
 from streamlit.components.v1 import html
 
+from tracing import span
+
+# (file extension, soundfile format, subtype, MIME type) per delivery format
+audio_formats = {
+    "opus": ("ogg", "OGG", "OPUS", "audio/ogg"),
+    "flac": ("flac", "FLAC", "PCM_16", "audio/flac"),
+    "wav": ("wav", "WAV", "PCM_16", "audio/wav")
+}
+# Opus is about 15x smaller than WAV for speech; FLAC is lossless and plays in every browser
+AUDIO_FORMAT = os.getenv("AUDIO_FORMAT", "opus")
+# Sampling rates the Opus codec accepts; other rates fall back to FLAC
+opus_sample_rates = {8000, 12000, 16000, 24000, 48000}
+
+# With server.enableStaticServing, Streamlit serves ./static at app/static with HTTP range support
+STATIC_AUDIO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "tts")
+STATIC_AUDIO_URL = "app/static/tts"
+STATIC_AUDIO_MAX_BYTES = 100 * 1024 * 1024
+# Data URIs kept for reuse when static serving is off
+MAX_INLINE_CLIPS = 64
+
+# Size and encode time of every clip sent to the browser in this process
+audio_stats = {"clips": 0, "reused": 0, "bytes": 0, "wav_bytes": 0, "encode_seconds": 0.0}
+_stats_lock = threading.Lock()
+_inline_clips = OrderedDict()
+
+
+def encode_audio(audio_data, sample_rate, audio_format=AUDIO_FORMAT):
+    """Encode a waveform, returning (bytes, file extension, MIME type)"""
+    if audio_format == "opus" and sample_rate not in opus_sample_rates:
+        audio_format = "flac"
+    extension, container, subtype, mime_type = audio_formats[audio_format]
+    buffer = io.BytesIO()
+    sf.write(buffer, audio_data, sample_rate, format=container, subtype=subtype)
+    return buffer.getvalue(), extension, mime_type
+
+def _record_clip(size, samples, encode_seconds, reused=False):
+    with _stats_lock:
+        audio_stats["clips"] += 1
+        audio_stats["reused"] += int(reused)
+        audio_stats["bytes"] += size
+        # What the old base64 WAV data URI would have cost
+        audio_stats["wav_bytes"] += (44 + 2 * samples) * 4 // 3
+        audio_stats["encode_seconds"] += encode_seconds
+
+def audio_stats_summary():
+    """Return the audio delivery counters with the size ratio to base64 WAV and the mean encode time"""
+    with _stats_lock:
+        summary = dict(audio_stats)
+    summary["ratio"] = summary["bytes"] / summary["wav_bytes"] if summary["wav_bytes"] else 0.0
+    encoded = summary["clips"] - summary["reused"]
+    summary["encode_ms"] = 1000 * summary["encode_seconds"] / encoded if encoded else 0.0
+    return summary
+
+def _evict_static_audio():
+    """Delete the least recently used clips beyond the static directory budget"""
+    entries = list(os.scandir(STATIC_AUDIO_DIR))
+    total = sum(entry.stat().st_size for entry in entries)
+    for entry in sorted(entries, key=lambda entry: entry.stat().st_mtime):
+        if total <= STATIC_AUDIO_MAX_BYTES:
+            break
+        total -= entry.stat().st_size
+        os.remove(entry.path)
+
+def audio_source(audio_data, sample_rate, audio_format=AUDIO_FORMAT):
+    """
+    Return a URL the browser can play a waveform from.
+
+    Clips are encoded once and reused by content hash. With static serving enabled the URL points
+    to a file served by Streamlit; otherwise it is a data URI of the compressed clip.
+    """
+    audio_data = np.asarray(audio_data, dtype=np.float32)
+    digest = hashlib.sha256(audio_data.tobytes() + f"{sample_rate}:{audio_format}".encode()).hexdigest()[:32]
+    static = st.get_option("server.enableStaticServing")
+
+    if static:
+        os.makedirs(STATIC_AUDIO_DIR, exist_ok=True)
+        for name in (f"{digest}.{audio_formats[fmt][0]}" for fmt in (audio_format, "flac")):
+            path = os.path.join(STATIC_AUDIO_DIR, name)
+            if os.path.exists(path):
+                os.utime(path)  # Mark as recently used for eviction
+                _record_clip(os.path.getsize(path), len(audio_data), 0.0, reused=True)
+                return f"{STATIC_AUDIO_URL}/{name}"
+    else:
+        with _stats_lock:
+            if digest in _inline_clips:
+                _inline_clips.move_to_end(digest)
+                source, size = _inline_clips[digest]
+                reused = True
+            else:
+                reused = False
+        if reused:
+            _record_clip(size, len(audio_data), 0.0, reused=True)
+            return source
+
+    with span("audio_encode", format=audio_format, audio_seconds=round(len(audio_data) / sample_rate, 2)) as encode_span:
+        data, extension, mime_type = encode_audio(audio_data, sample_rate, audio_format)
+        encode_span.set(bytes=len(data))
+    encode_seconds = encode_span.duration
+
+    if static:
+        name = f"{digest}.{extension}"
+        with open(os.path.join(STATIC_AUDIO_DIR, name), "wb") as file:
+            file.write(data)
+        _evict_static_audio()
+        _record_clip(len(data), len(audio_data), encode_seconds)
+        return f"{STATIC_AUDIO_URL}/{name}"
+
+    source = f"data:{mime_type};base64,{base64.b64encode(data).decode()}"
+    _record_clip(len(source), len(audio_data), encode_seconds)
+    with _stats_lock:
+        _inline_clips[digest] = (source, len(source))
+        while len(_inline_clips) > MAX_INLINE_CLIPS:
+            _inline_clips.popitem(last=False)
+    return source
+
 def create_audio_player(audio_data, sample_rate, autoplay=False):
     """
     Create a custom audio player component from numpy audio data.
@@ -16,14 +136,7 @@ def create_audio_player(audio_data, sample_rate, autoplay=False):
     Returns:
         None: Displays the audio player component in Streamlit
     """
-    # Convert NumPy array -> WAV bytes
-    wav_buffer = io.BytesIO()
-    sf.write(wav_buffer, audio_data, sample_rate, format="WAV")
-    wav_bytes = wav_buffer.getvalue()
-
-    # Convert to base64 for embedding
-    b64_audio = base64.b64encode(wav_bytes).decode()
-    audio_src = f"data:audio/wav;base64,{b64_audio}"
+    audio_src = audio_source(audio_data, sample_rate)
 
     # Custom minimal audio player
     html(f"""
@@ -80,4 +193,102 @@ btn.textContent = '⏹';
 </script>
 """, height=80)
 
+def create_audio_queue_player(segments, sample_rate, queue_id, start=0):
+    """
+    Queue audio segments for gapless playback while later segments are still being synthesized.
+
+    The queue lives in the parent page, so playback continues while this component is re-rendered
+    with newly arrived segments; only segments not sent before need to be passed.
+
+    Args:
+        segments (list[np.ndarray]): New audio segments, in playback order
+        sample_rate (int): Sample rate of the audio
+        queue_id (str): Identifies one playback; re-rendering with the same id appends to it
+        start (int): Position of the first given segment in the whole sequence
 
+    Returns:
+        None: Displays the player component in Streamlit
+    """
+    sources = {start + index: audio_source(segment, sample_rate) for index, segment in enumerate(segments)}
+
+    html(f"""
+<div class="audio-player">
+  <button id="play-btn">⏹</button>
+</div>
+
+<style>
+body {{
+  margin: 0;
+}}
+.audio-player {{
+  display: flex;
+  align-items: center;
+  gap: 10px;
+}}
+#play-btn {{
+  font-size: 18px;
+  width: 40px;
+  height: 40px;
+  border-radius: 0.5rem;
+  cursor: pointer;
+  background-color: rgb(255, 255, 255);
+  border: 1px solid rgba(49, 51, 63, 0.2);
+  transition: transform .1s;
+}}
+#play-btn:hover {{
+  background-color: rgba(151, 166, 195, 0.15);
+}}
+#play-btn:active {{
+  transform: scale(0.95);
+}}
+</style>
+
+<script>
+// Streamlit components are same-origin iframes, so the queue can be kept by the parent page
+const root = window.parent;
+root.__ttsQueues = root.__ttsQueues || {{}};
+const queue = root.__ttsQueues[{json.dumps(queue_id)}] = root.__ttsQueues[{json.dumps(queue_id)}] || {{next: 0, segments: {{}}, audio: null, stopped: false}};
+// Defined in the parent realm so the chain of 'ended' handlers survives this iframe being replaced
+root.__ttsPlayNext = root.__ttsPlayNext || new root.Function('queue', `
+  const play = () => {{
+    const src = queue.segments[queue.next];
+    if (queue.stopped || !src) {{
+      queue.audio = null;
+      return;
+    }}
+    queue.next += 1;
+    queue.audio = new Audio(src);
+    queue.audio.addEventListener('ended', play);
+    queue.audio.play();
+  }};
+  play();
+`);
+
+const segments = {json.dumps(sources)};
+for (const [index, src] of Object.entries(segments)) {{
+  queue.segments[index] = queue.segments[index] || src;
+}}
+if (!queue.audio && !queue.stopped) {{
+  root.__ttsPlayNext(queue);
+}}
+
+const btn = document.getElementById('play-btn');
+const refresh = () => {{
+  btn.textContent = queue.audio ? '⏹' : '▶';
+}};
+btn.addEventListener('click', () => {{
+  if (queue.audio) {{
+    queue.stopped = true;
+    queue.audio.pause();
+    queue.audio = null;
+  }} else {{
+    queue.stopped = false;
+    queue.next = 0;
+    root.__ttsPlayNext(queue);
+  }}
+  refresh();
+}});
+setInterval(refresh, 200);
+refresh();
+</script>
+""", height=80)
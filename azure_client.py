@@ -0,0 +1,111 @@
+import asyncio
+import contextvars
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+
+import httpx
+from openai import AsyncAzureOpenAI, AzureOpenAI
+
+from tracing import current_span
+
+# Prompt caching and streamed usage need 2024-10-21 or later
+API_VERSION = "2024-10-21"
+
+# Connection pool shared by every request of the process, so keep-alive and TLS sessions survive reruns
+http_limits = httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=120)
+http_timeout = httpx.Timeout(60.0, connect=5.0)
+
+
+# Token usage of every completion in this process
+usage_totals = {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}
+_usage_lock = threading.Lock()
+# Usage of the current task, e.g. one file of a batch run; set by usage_scope
+_usage_scope = contextvars.ContextVar("usage_scope", default=None)
+
+
+def record_usage(usage, span=None):
+    """Accumulate a completion's token usage, including prompt tokens served from Azure's prompt cache.
+
+    The usage is also added to span, or to the active tracing span when none is given.
+    """
+    if usage is None:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached_tokens = (getattr(details, "cached_tokens", 0) or 0) if details else 0
+    with _usage_lock:
+        usage_totals["requests"] += 1
+        usage_totals["prompt_tokens"] += usage.prompt_tokens
+        usage_totals["cached_tokens"] += cached_tokens
+        usage_totals["completion_tokens"] += usage.completion_tokens
+        scope = _usage_scope.get()
+        if scope is not None:
+            scope["requests"] += 1
+            scope["prompt_tokens"] += usage.prompt_tokens
+            scope["cached_tokens"] += cached_tokens
+            scope["completion_tokens"] += usage.completion_tokens
+    span = span or current_span()
+    if span is not None:
+        span.add_usage(usage.prompt_tokens, usage.completion_tokens, cached_tokens)
+
+
+def usage_summary():
+    """Return the accumulated token usage and the share of prompt tokens read from the prompt cache"""
+    with _usage_lock:
+        summary = dict(usage_totals)
+    summary["cached_ratio"] = summary["cached_tokens"] / summary["prompt_tokens"] if summary["prompt_tokens"] else 0.0
+    return summary
+
+
+@contextmanager
+def usage_scope():
+    """Collect the token usage of the completions made inside the block.
+
+    Worker threads only contribute when they run in a copy of the caller's context
+    (contextvars.copy_context), as the map-reduce summarizer does.
+    """
+    totals = {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}
+    token = _usage_scope.set(totals)
+    try:
+        yield totals
+    finally:
+        _usage_scope.reset(token)
+
+
+@lru_cache(maxsize=4)
+def get_client(endpoint, api_key, api_version=API_VERSION):
+    """Return the process-wide synchronous Azure OpenAI client for an endpoint"""
+    return AzureOpenAI(
+        api_version=api_version,
+        azure_endpoint=endpoint,
+        api_key=api_key,
+        http_client=httpx.Client(limits=http_limits, timeout=http_timeout),
+    )
+
+
+@lru_cache(maxsize=4)
+def get_async_client(endpoint, api_key, api_version=API_VERSION):
+    """Return the process-wide async Azure OpenAI client for an endpoint; use it from run_async only"""
+    return AsyncAzureOpenAI(
+        api_version=api_version,
+        azure_endpoint=endpoint,
+        api_key=api_key,
+        http_client=httpx.AsyncClient(limits=http_limits, timeout=http_timeout),
+    )
+
+
+@lru_cache(maxsize=1)
+def _event_loop():
+    """Start the background event loop that owns the async connection pool"""
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="azure-openai-loop", daemon=True).start()
+    return loop
+
+
+def run_async(coroutine):
+    """Run a coroutine on the shared event loop and wait for its result.
+
+    Pooled async connections are bound to the loop that opened them, so every coroutine using
+    get_async_client must run here rather than in a fresh asyncio.run loop.
+    """
+    return asyncio.run_coroutine_threadsafe(coroutine, _event_loop()).result()
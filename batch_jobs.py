@@ -0,0 +1,256 @@
+"""
+Bulk summarization through the Azure OpenAI Batch API
+
+Builds one chat-completion request per guide, language and style, submits them as a single batch
+job, polls until it finishes and loads the summaries into the response cache, where the app and
+summarize_batch.py pick them up. Batch jobs cost about half of synchronous calls and do not count
+against the deployment's real-time quota; they need a Global-Batch deployment.
+
+Usage:
+    python batch_jobs.py docs/ --languages all --styles all    # submit, wait and load
+    python batch_jobs.py docs/ --local                          # run the same job through the local stand-in
+    python batch_jobs.py --resume batch_abc123                  # wait for and load an earlier job
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+from types import SimpleNamespace
+
+from dotenv import load_dotenv
+
+from azure_client import get_client
+from documents import GuideDocument
+from response_cache import get_response_cache
+from summarize_batch import find_guides
+from summarizer import (
+    DEFAULT_CHUNK_TOKENS,
+    build_summary_prompt,
+    count_tokens,
+    document_summary_key,
+    language_instructions,
+    style_prompts,
+    summary_cache_key
+)
+
+BATCH_ENDPOINT = "/chat/completions"
+COMPLETION_WINDOW = "24h"
+POLL_SECONDS = 60
+# Final states of a batch job
+terminal_statuses = {"completed", "failed", "expired", "cancelled"}
+# Separates the cache keys a custom_id carries
+KEY_SEPARATOR = "+"
+
+
+def cache_keys(custom_id):
+    """Return the cache keys a batch result is stored under"""
+    return custom_id.split(KEY_SEPARATOR)
+
+
+def build_batch_requests(guides, languages, styles, model="gpt-4o-mini", max_tokens=300, temperature=0.3, chunk_tokens=DEFAULT_CHUNK_TOKENS):
+    """Return (requests, skipped paths) for every (path, text, document key) guide, language and style.
+
+    The custom_id of each request joins the summary's cache keys: the one pasted text and the API look up
+    and, when the guide has a document key, the one uploads of the same file look up. Guides larger than
+    one chunk need the multi-round map-reduce and are skipped; summarize_batch.py handles them.
+    """
+    requests = []
+    skipped = []
+    for path, text, document_key in guides:
+        if count_tokens(text, model) > chunk_tokens:
+            skipped.append(path)
+            continue
+        for language in languages:
+            for style in styles:
+                keys = [summary_cache_key(text, style, max_tokens, temperature, language, model, chunk_tokens)]
+                if document_key:
+                    keys.append(document_summary_key(document_key, style, max_tokens, temperature, language, model, chunk_tokens))
+                requests.append({
+                    "custom_id": KEY_SEPARATOR.join(keys),
+                    "method": "POST",
+                    "url": BATCH_ENDPOINT,
+                    "body": {
+                        "model": model,
+                        "messages": [{"role": "user", "content": build_summary_prompt(text, style, language)}],
+                        "max_tokens": max_tokens,
+                        "temperature": temperature
+                    }
+                })
+    return requests, skipped
+
+
+def write_batch_file(requests, path):
+    """Write the requests in the Batch API's JSONL input format"""
+    with open(path, "w", encoding="utf-8") as f:
+        for request in requests:
+            f.write(json.dumps(request, ensure_ascii=False) + "\n")
+    return path
+
+
+def submit_batch(client, input_path):
+    """Upload the input file and start the batch job"""
+    with open(input_path, "rb") as f:
+        input_file = client.files.create(file=f, purpose="batch")
+    batch = client.batches.create(input_file_id=input_file.id, endpoint=BATCH_ENDPOINT, completion_window=COMPLETION_WINDOW)
+    print(f"📤 Submitted batch {batch.id} ({input_path})")
+    return batch
+
+
+def wait_for_batch(client, batch_id, poll_seconds=POLL_SECONDS):
+    """Poll a batch job until it reaches a final state"""
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        print(f"⏳ Batch {batch_id}: {batch.status} ({counts.completed}/{counts.total} done, {counts.failed} failed)")
+        if batch.status in terminal_statuses:
+            return batch
+        time.sleep(poll_seconds)
+
+
+def load_batch_results(client, batch, cache=None):
+    """Store the summaries of a finished batch in the response cache; return (loaded, failed, usage)"""
+    cache = cache or get_response_cache()
+    usage = {"prompt_tokens": 0, "completion_tokens": 0}
+    loaded = failed = 0
+    if not batch.output_file_id:
+        return loaded, batch.request_counts.failed, usage
+
+    for line in client.files.content(batch.output_file_id).text.splitlines():
+        if not line.strip():
+            continue
+        result = json.loads(line)
+        response = result.get("response") or {}
+        if result.get("error") or response.get("status_code") != 200:
+            failed += 1
+            continue
+        body = response["body"]
+        for key in cache_keys(result["custom_id"]):
+            cache.set(key, body["choices"][0]["message"]["content"])
+        usage["prompt_tokens"] += body["usage"]["prompt_tokens"]
+        usage["completion_tokens"] += body["usage"]["completion_tokens"]
+        loaded += 1
+    return loaded, failed, usage
+
+
+class LocalBatchClient:
+    """File-based stand-in for the Batch API with the same files/batches interface.
+
+    Jobs run synchronously at creation through complete(body), a function returning the response
+    body as a dict, e.g. a regular chat-completions call or a fake in tests.
+    """
+
+    def __init__(self, complete, directory=None):
+        self.complete = complete
+        self.directory = directory or tempfile.mkdtemp(prefix="batch-")
+        self._batches = {}
+        self.files = SimpleNamespace(create=self._create_file, content=self._file_content)
+        self.batches = SimpleNamespace(create=self._create_batch, retrieve=self._batches.__getitem__)
+
+    def _write(self, data):
+        file_id = f"file-{uuid.uuid4().hex}"
+        with open(os.path.join(self.directory, file_id), "wb") as f:
+            f.write(data)
+        return file_id
+
+    def _create_file(self, file, purpose):
+        return SimpleNamespace(id=self._write(file.read()), purpose=purpose)
+
+    def _file_content(self, file_id):
+        with open(os.path.join(self.directory, file_id), encoding="utf-8") as f:
+            return SimpleNamespace(text=f.read())
+
+    def _create_batch(self, input_file_id, endpoint, completion_window):
+        lines = []
+        failed = 0
+        for line in self._file_content(input_file_id).text.splitlines():
+            request = json.loads(line)
+            try:
+                body = self.complete(request["body"])
+                lines.append({"custom_id": request["custom_id"], "response": {"status_code": 200, "body": body}, "error": None})
+            except Exception as e:
+                failed += 1
+                lines.append({"custom_id": request["custom_id"], "response": None, "error": {"message": str(e)}})
+
+        batch = SimpleNamespace(
+            id=f"batch_{uuid.uuid4().hex}",
+            status="completed",
+            endpoint=endpoint,
+            output_file_id=self._write("".join(json.dumps(line) + "\n" for line in lines).encode("utf-8")),
+            request_counts=SimpleNamespace(total=len(lines), completed=len(lines) - failed, failed=failed)
+        )
+        self._batches[batch.id] = batch
+        return batch
+
+
+def _choices(values, allowed):
+    """Expand 'all' or a comma-separated list, validating each entry"""
+    selected = list(allowed) if values == "all" else [value.strip() for value in values.split(",")]
+    unknown = [value for value in selected if value not in allowed]
+    if unknown:
+        raise SystemExit(f"❌ Unknown value(s): {', '.join(unknown)}. Choose from: {', '.join(allowed)}")
+    return selected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", nargs="?", help="Directory of .txt/.md guides or a glob pattern")
+    parser.add_argument("--languages", default="English", help="Comma-separated languages or 'all'")
+    parser.add_argument("--styles", default="concise", help="Comma-separated styles or 'all'")
+    parser.add_argument("--model", default="gpt-4o-mini", help="Global-Batch deployment name")
+    parser.add_argument("--max-tokens", type=int, default=300)
+    parser.add_argument("--temperature", type=float, default=0.3)
+    parser.add_argument("--poll-seconds", type=int, default=POLL_SECONDS)
+    parser.add_argument("--resume", metavar="BATCH_ID", help="Wait for and load an already submitted batch")
+    parser.add_argument("--local", action="store_true", help="Run the job through the local stand-in with synchronous calls")
+    args = parser.parse_args()
+    if not args.source and not args.resume:
+        parser.error("a source or --resume is required")
+
+    load_dotenv()
+    api_key = os.getenv("AZURE_OPENAI_API_KEY")
+    endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
+    if not api_key or not endpoint:
+        print("❌ Azure OpenAI credentials not found. Set AZURE_OPENAI_API_KEY and AZURE_OPENAI_ENDPOINT")
+        sys.exit(1)
+    client = get_client(endpoint, api_key)
+    if args.local:
+        chat_client = client
+        client = LocalBatchClient(lambda body: chat_client.chat.completions.create(**body).model_dump())
+
+    if args.resume:
+        batch_id = args.resume
+    else:
+        guides = []
+        for path in find_guides(args.source):
+            with open(path, encoding="utf-8") as f:
+                text = f.read()
+            # The same key as an upload of this file in the app
+            with open(path, "rb") as f:
+                document_key = GuideDocument(f, path).key
+            if text.strip():
+                guides.append((path, text, document_key))
+        languages = _choices(args.languages, language_instructions)
+        styles = _choices(args.styles, style_prompts)
+        requests, skipped = build_batch_requests(guides, languages, styles, args.model, args.max_tokens, args.temperature)
+        for path in skipped:
+            print(f"⚠️ {path} is larger than one chunk, summarize it with summarize_batch.py")
+        if not requests:
+            print("⚠️ Nothing to submit")
+            return
+        print(f"📚 {len(requests)} requests for {len(guides) - len(skipped)} guides × {len(languages)} languages × {len(styles)} styles")
+        input_path = write_batch_file(requests, os.path.join(tempfile.mkdtemp(prefix="batch-"), "requests.jsonl"))
+        batch_id = submit_batch(client, input_path).id
+
+    batch = wait_for_batch(client, batch_id, args.poll_seconds)
+    loaded, failed, usage = load_batch_results(client, batch)
+    print(f"🏁 Batch {batch.status}: {loaded} summaries cached, {failed} failed, "
+          f"{usage['prompt_tokens']:,} prompt / {usage['completion_tokens']:,} completion tokens")
+    sys.exit(0 if batch.status == "completed" and not failed else 1)
+
+
+if __name__ == "__main__":
+    main()
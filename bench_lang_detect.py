@@ -0,0 +1,60 @@
+"""
+Benchmark: offline language detection vs. the LLM round-trip
+
+Usage:
+    python bench_lang_detect.py          # offline detector only
+    python bench_lang_detect.py --llm    # also call Azure OpenAI (needs .env credentials)
+"""
+
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from lang_detect import DEFAULT_CONFIDENCE_THRESHOLD, detect_language
+
+
+def run(name, detect, samples, repeat=1):
+    """Time a detector over the labelled samples and report accuracy and latency"""
+    latencies = []
+    correct = 0
+    for sample in samples:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            language = detect(sample["text"])
+            latencies.append(time.perf_counter() - start)
+        correct += language == sample["language"]
+
+    latencies.sort()
+    print(f"{name}:")
+    print(f"   Accuracy: {correct}/{len(samples)} ({correct / len(samples):.1%})")
+    print(f"   Latency:  mean {statistics.mean(latencies) * 1e6:.1f} µs, "
+          f"p95 {latencies[int(len(latencies) * 0.95)] * 1e6:.1f} µs")
+
+
+def main():
+    with open("data/language_samples.json", encoding="utf-8") as f:
+        samples = json.load(f)
+
+    run("Offline detector", lambda text: detect_language(text)[0], samples, repeat=200)
+    fallbacks = sum(detect_language(s["text"])[1] < DEFAULT_CONFIDENCE_THRESHOLD for s in samples)
+    print(f"   LLM fallbacks at threshold {DEFAULT_CONFIDENCE_THRESHOLD}: {fallbacks}/{len(samples)}")
+
+    if "--llm" in sys.argv:
+        # A throwaway response cache keeps every LLM call a real round-trip
+        os.environ["RESPONSE_CACHE_PATH"] = os.path.join(tempfile.mkdtemp(), "bench_cache.sqlite3")
+        from dotenv import load_dotenv
+        load_dotenv()
+        from assistant import create_client, detect_question_language_llm
+
+        client = create_client()
+        if client is None:
+            print("❌ Azure OpenAI credentials not found, skipping the LLM benchmark")
+            return
+        run("LLM detector", lambda text: detect_question_language_llm(client, text), samples)
+
+
+if __name__ == "__main__":
+    main()
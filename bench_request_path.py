@@ -0,0 +1,191 @@
+"""
+Benchmark suite for the end-to-end request path, run offline against the fake model backend
+
+Each benchmark times one stage and stores its token count and memory use in extra_info. Saved
+runs under .benchmarks/ are compared to catch regressions.
+
+Usage (needs pytest-benchmark, pip install -r requirements-dev.txt):
+    python -m pytest bench_request_path.py --benchmark-autosave           # run and store results
+    python -m pytest bench_request_path.py --benchmark-compare --benchmark-compare-fail=median:20%
+    python -m pytest bench_request_path.py -k audio                       # one stage group
+"""
+
+import base64
+import itertools
+import json
+import tracemalloc
+
+import numpy as np
+import pytest
+
+import assistant
+import summarizer
+from audio_player import encode_audio
+from azure_client import usage_scope
+from fake_client import FakeChatClient
+from json_stream import JsonStringFieldStreamer
+from lang_detect import detect_language
+from assistant import Session, answer_question, build_answer_messages, detect_question_language_llm, format_answer
+from response_cache import ResponseCache
+from semantic_cache import SemanticCache, hashed_embedding
+from summarizer import count_tokens, summarize_user_guide
+
+# The benchmark fixture comes from the pytest-benchmark plugin in requirements-dev.txt
+pytest.importorskip("pytest_benchmark")
+
+with open("data/user_guide_sample.txt", encoding="utf-8") as f:
+    sample_guide = f.read()
+with open("data/upload_example.txt", encoding="utf-8") as f:
+    upload_guide = f.read()
+
+sample_summary = sample_guide[:1500]
+answer_json = json.dumps({
+    "reasoning": "The guide's setup section lists the steps in order.",
+    "answer": "Open **Settings → Notifications**, pick the channels you want and press **Save**. " * 4,
+    "confidence": "0.9"
+})
+# Five seconds of speech-like audio at the MMS sampling rate
+speech = (0.3 * np.sin(np.arange(16000 * 5) / 7) * np.sin(np.arange(16000 * 5) / 900)).astype(np.float32)
+questions = itertools.count()
+
+
+@pytest.fixture(autouse=True)
+def isolated_state(tmp_path, monkeypatch):
+    """An empty response cache and conversation per benchmark"""
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"))
+    monkeypatch.setattr(assistant, "get_response_cache", lambda: cache)
+    monkeypatch.setattr(summarizer, "get_response_cache", lambda: cache)
+    semantic_cache = SemanticCache(embed=hashed_embedding, audit_rate=0)
+    monkeypatch.setattr(assistant, "get_semantic_cache", lambda: semantic_cache)
+    monkeypatch.setattr(assistant, "default_session", Session())
+
+
+def profile(benchmark, function, tokens=None):
+    """Benchmark a stage and record its peak traced memory, model usage and processed token count"""
+    tracemalloc.start()
+    with usage_scope() as usage:
+        function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    benchmark.extra_info["peak_kb"] = round(peak / 1024, 1)
+    if usage["requests"]:
+        # The fake backend estimates usage at four characters per token
+        benchmark.extra_info.update(usage)
+    if tokens is not None:
+        benchmark.extra_info["tokens"] = tokens
+    return benchmark(function)
+
+
+def _question():
+    """A new question per call, so the response cache never short-circuits a stage"""
+    return f"How do I configure notification channel {next(questions)}?"
+
+
+@pytest.mark.benchmark(group="prompt")
+def test_build_answer_messages(benchmark):
+    messages = build_answer_messages(_question(), sample_summary, sample_guide)
+    tokens = sum(count_tokens(message["content"]) for message in messages)
+    profile(benchmark, lambda: build_answer_messages(_question(), sample_summary, sample_guide), tokens)
+
+
+@pytest.mark.benchmark(group="parse")
+def test_format_answer(benchmark):
+    profile(benchmark, lambda: format_answer(answer_json), count_tokens(answer_json))
+
+
+@pytest.mark.benchmark(group="parse")
+def test_stream_answer_field(benchmark):
+    fragments = [answer_json[i:i + 12] for i in range(0, len(answer_json), 12)]
+
+    def stream():
+        streamer = JsonStringFieldStreamer("answer")
+        for fragment in fragments:
+            streamer.feed(fragment)
+        return streamer.value
+
+    profile(benchmark, stream, count_tokens(answer_json))
+
+
+@pytest.mark.benchmark(group="detection")
+def test_detect_language_offline(benchmark):
+    profile(benchmark, lambda: detect_language("¿Cómo configuro las notificaciones en la aplicación?"))
+
+
+@pytest.mark.benchmark(group="detection")
+def test_detect_language_llm(benchmark):
+    client = FakeChatClient(responder=lambda messages, **kwargs: "Spanish")
+    profile(benchmark, lambda: detect_question_language_llm(client, f"¿Cómo configuro {next(questions)}?"))
+
+
+@pytest.mark.benchmark(group="answer")
+def test_answer_question(benchmark):
+    client = FakeChatClient(responder=lambda messages, **kwargs: answer_json)
+    profile(benchmark, lambda: answer_question(client, _question(), sample_summary, sample_guide))
+
+
+@pytest.mark.benchmark(group="answer")
+def test_answer_semantic_cache_hit(benchmark):
+    """A rephrased standalone question served from the semantic cache: one embedding and an in-memory lookup"""
+    client = FakeChatClient(responder=lambda messages, **kwargs: answer_json)
+    answer_question(client, "How do I turn on notifications?", sample_summary, sample_guide)
+    profile(benchmark, lambda: answer_question(client, "how do i turn on the notifications", sample_summary, sample_guide))
+    assert len(client.requests) == 1
+
+
+@pytest.mark.benchmark(group="answer")
+def test_answer_question_streamed(benchmark):
+    client = FakeChatClient(responder=lambda messages, **kwargs: answer_json)
+
+    def stream():
+        answer_stream = answer_question(client, _question(), sample_summary, sample_guide, stream=True)
+        for _ in answer_stream:
+            pass
+        return answer_stream.result
+
+    profile(benchmark, stream)
+
+
+@pytest.mark.benchmark(group="summary")
+def test_summarize_single_call(benchmark):
+    client = FakeChatClient()
+    profile(benchmark, lambda: summarize_user_guide(client, f"{sample_guide}\n{next(questions)}"), count_tokens(sample_guide))
+
+
+@pytest.mark.benchmark(group="summary")
+def test_summarize_map_reduce(benchmark):
+    client = FakeChatClient()
+    guide = f"{sample_guide}\n\n{upload_guide}"
+    profile(benchmark, lambda: summarize_user_guide(client, f"{guide}\n{next(questions)}", chunk_tokens=800, max_workers=4), count_tokens(guide))
+
+
+@pytest.mark.benchmark(group="audio")
+@pytest.mark.parametrize("audio_format", ["opus", "flac", "wav"])
+def test_encode_audio(benchmark, audio_format):
+    data, _, _ = encode_audio(speech, 16000, audio_format)
+    benchmark.extra_info["bytes"] = len(data)
+    profile(benchmark, lambda: encode_audio(speech, 16000, audio_format))
+
+
+@pytest.mark.benchmark(group="audio")
+def test_encode_audio_base64_wav(benchmark):
+    """The previous inline delivery: WAV bytes embedded as a base64 data URI"""
+    def inline():
+        data, _, _ = encode_audio(speech, 16000, "wav")
+        return f"data:audio/wav;base64,{base64.b64encode(data).decode()}"
+
+    benchmark.extra_info["bytes"] = len(inline())
+    profile(benchmark, inline)
+
+
+@pytest.mark.benchmark(group="tts")
+def test_speak(benchmark):
+    """Needs transformers, torch and the downloaded MMS model; skipped otherwise"""
+    pytest.importorskip("transformers")
+    from tts import load_tts, speak
+
+    try:
+        tts = load_tts("eng")
+    except Exception as e:
+        pytest.skip(f"TTS model unavailable: {e}")
+    sentence = "Open Settings, choose Notifications and press Save."
+    benchmark.pedantic(speak, args=(sentence, tts), kwargs={"lang": "eng"}, rounds=3, warmup_rounds=1)
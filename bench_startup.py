@@ -0,0 +1,74 @@
+"""
+Benchmark: cold-start import time of the app's entry points
+
+Each module is imported in a fresh interpreter with `python -X importtime`, so nothing is warm.
+The run fails when an entry point is over its budget or imports a package that should only load
+on first use (transformers, torch, chromadb).
+
+Usage:
+    python bench_startup.py                          # assistant, api and main
+    python bench_startup.py --budget-ms 1500 --top 15
+    python bench_startup.py api --runs 5
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+# Import time allowed per entry point; the Azure OpenAI SDK and Streamlit alone take most of it
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "2500"))
+# Packages that take seconds to import and are only needed for speech or retrieval
+deferred_packages = ("transformers", "torch", "chromadb", "onnxruntime")
+entry_points = ("assistant", "api", "main")
+
+
+def measure(module):
+    """Import a module in a fresh interpreter; return its cumulative import ms, self ms per top-level package and the package names"""
+    env = {**os.environ, "TRACE_LOG": "0"}
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    lines = [line for line in completed.stderr.splitlines() if line.startswith("import time:") and "self [us]" not in line]
+    if completed.returncode != 0 or not lines:
+        raise RuntimeError(f"Importing {module} failed:\n{completed.stderr.strip()[-2000:]}")
+
+    total_us = 0
+    packages = {}
+    for line in lines:
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0) + int(self_us)
+        if name.strip() == module and not name.startswith("  "):
+            total_us = int(cumulative_us)
+    return total_us / 1000, {package: us / 1000 for package, us in packages.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=list(entry_points), help="Modules to import")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh imports per module; the fastest is reported")
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS, help="Maximum import time per module")
+    parser.add_argument("--top", type=int, default=8, help="Heaviest packages to list")
+    args = parser.parse_args()
+
+    failed = False
+    for module in args.modules:
+        runs = [measure(module) for _ in range(args.runs)]
+        total_ms, packages = min(runs, key=lambda run: run[0])
+        loaded = sorted(package for package in deferred_packages if package in packages)
+        over_budget = total_ms > args.budget_ms
+        failed = failed or over_budget or bool(loaded)
+
+        print(f"{'❌' if over_budget or loaded else '✅'} import {module}: {total_ms:.0f} ms (budget {args.budget_ms:.0f} ms, best of {args.runs})")
+        for package, ms in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"   {package:<24} {ms:8.1f} ms")
+        if loaded:
+            print(f"   Loaded at import time, should be deferred: {', '.join(loaded)}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark: full-precision vs. quantized CPU text-to-speech
+
+Each mode runs in its own process so peak memory is measured in isolation.
+
+Usage:
+    python bench_tts.py                  # fp32 and int8 on the sample guide
+    python bench_tts.py --threads 2      # bound torch's intra-op threads
+    python bench_tts.py --lang vie --text data/upload_example.txt
+"""
+
+import argparse
+import io
+import json
+import resource
+import subprocess
+import sys
+import time
+
+
+def model_megabytes(model):
+    """Size of the serialized weights, which includes the packed int8 linear layers"""
+    import torch
+
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / 1024 / 1024
+
+
+def measure(lang, text_path, fast, threads):
+    """Load one pipeline, synthesize the text sentence by sentence and return the measurements"""
+    from tts import load_pipeline, speak_stream, split_sentences
+
+    with open(text_path, encoding="utf-8") as f:
+        text = f.read()
+
+    start = time.perf_counter()
+    tts = load_pipeline(lang, fast=fast, threads=threads)
+    load_seconds = time.perf_counter() - start
+
+    # The first call pays for lazy initialisation, so it is excluded from the timing
+    next(speak_stream(split_sentences(text)[0], tts=tts))
+
+    audio_seconds = 0.0
+    start = time.perf_counter()
+    for audio, sampling_rate in speak_stream(text, tts=tts):
+        audio_seconds += len(audio) / sampling_rate
+    synthesis_seconds = time.perf_counter() - start
+
+    return {
+        "mode": "int8" if fast else "fp32",
+        "load_seconds": load_seconds,
+        "audio_seconds": audio_seconds,
+        "synthesis_seconds": synthesis_seconds,
+        "rtf": synthesis_seconds / audio_seconds,
+        "model_mb": model_megabytes(tts.model),
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lang", default="eng", help="MMS language code")
+    parser.add_argument("--text", default="data/user_guide_sample.txt", help="Text file to synthesize")
+    parser.add_argument("--threads", type=int, default=0, help="torch intra-op threads (0 = torch default)")
+    parser.add_argument("--mode", choices=["fp32", "int8"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(measure(args.lang, args.text, args.mode == "int8", args.threads)))
+        return
+
+    print(f"🔊 facebook/mms-tts-{args.lang} on {args.text} ({args.threads or 'default'} threads)")
+    for mode in ("fp32", "int8"):
+        command = [sys.executable, __file__, "--mode", mode, "--lang", args.lang, "--text", args.text, "--threads", str(args.threads)]
+        completed = subprocess.run(command, capture_output=True, text=True)
+        if completed.returncode != 0:
+            print(f"❌ {mode} run failed:\n{completed.stderr.strip()}")
+            continue
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        print(f"{mode}:")
+        print(f"   Real-time factor: {result['rtf']:.3f} ({result['synthesis_seconds']:.1f} s for {result['audio_seconds']:.1f} s of audio)")
+        print(f"   Model size:       {result['model_mb']:.1f} MB")
+        print(f"   Peak memory:      {result['peak_rss_mb']:.0f} MB")
+        print(f"   Load time:        {result['load_seconds']:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+from azure_client import record_usage
+from summarizer import count_tokens, truncate_tokens
+from tracing import span
+
+# Token budget for the conversation history in one Q&A prompt
+DEFAULT_HISTORY_TOKENS = 1500
+# Most recent question/answer turns that are always kept verbatim
+DEFAULT_KEEP_TURNS = 3
+
+rolling_summary_prompt = """Update the running summary of a support conversation about a user guide with the new messages below. Keep the user's name and email if given, open questions, and the facts the assistant provided. Reply with the updated summary only.
+
+Current summary:
+{summary}
+
+New messages:
+{messages}"""
+
+
+def format_messages(messages):
+    """Render chat messages as 'role: content' lines"""
+    return "\n".join(f"{message['role']}: {message['content']}" for message in messages)
+
+
+class ConversationHistory:
+    """Token-budgeted conversation history: recent turns verbatim, older turns folded into a rolling summary"""
+
+    def __init__(self, keep_turns=DEFAULT_KEEP_TURNS):
+        self.keep_turns = keep_turns
+        self.summary = ""
+        self.summarized_count = 0  # Leading messages already folded into the summary
+
+    def reset(self):
+        self.summary = ""
+        self.summarized_count = 0
+
+    def _render(self, messages):
+        text = format_messages(messages)
+        if self.summary:
+            return f"Summary of earlier conversation: {self.summary}\n{text}"
+        return text
+
+    def _fold(self, client, messages, max_tokens, model):
+        """Merge messages into the rolling summary with one completion call"""
+        with span("completion", purpose="history_summary", model=model):
+            response = client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": rolling_summary_prompt.format(
+                    summary=self.summary or "(none)", messages=format_messages(messages)
+                )}],
+                max_tokens=max_tokens,
+                temperature=0.1
+            )
+            record_usage(response.usage)
+        self.summary = response.choices[0].message.content.strip()
+
+    def render(self, client, messages, max_tokens=DEFAULT_HISTORY_TOKENS, model="gpt-4o-mini"):
+        """Render the history within max_tokens, summarizing older turns only when the budget is exceeded"""
+        if max_tokens <= 0:
+            return ""
+        # The chat was cleared since the last render
+        if self.summarized_count > len(messages):
+            self.reset()
+
+        pending = messages[self.summarized_count:]
+        text = self._render(pending)
+        if count_tokens(text, model) <= max_tokens:
+            return text
+
+        keep = self.keep_turns * 2
+        if client is not None and len(pending) > keep:
+            try:
+                self._fold(client, pending[:-keep], max(max_tokens // 3, 50), model)
+                self.summarized_count += len(pending) - keep
+                pending = pending[-keep:]
+                text = self._render(pending)
+                print(f"🗜️ Folded conversation history into the rolling summary ({self.summarized_count} messages)")
+            except Exception as e:
+                print(f"❌ Error summarizing conversation history: {str(e)}")
+
+        # Hard cap: when recent turns alone exceed the budget, the most recent text wins
+        return truncate_tokens(text, max_tokens, model, keep_end=True)
@@ -0,0 +1,211 @@
+import hashlib
+import io
+import os
+import re
+import tempfile
+import unicodedata
+import zipfile
+from xml.etree import ElementTree
+
+# Upload types accepted by the UI
+DOCUMENT_TYPES = ("txt", "md", "pdf", "pptx", "docx")
+# Text and Word documents have no fixed pages; they are read in pages of about this many characters
+PAGE_CHARACTERS = 8000
+# Start of the document kept for the input preview and the Q&A fallback when indexing fails
+HEAD_CHARACTERS = 4000
+# Block size when hashing and decoding uploaded files
+READ_BLOCK_BYTES = 1 << 20
+PAGE_SEPARATOR = "\f\n"
+
+WORD_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+def normalize_text(text):
+    """Normalize extracted text: Unicode compatibility forms, line endings, soft hyphens and runs of blank space"""
+    text = unicodedata.normalize("NFKC", text)
+    text = text.replace("\u00ad", "").replace("\r\n", "\n").replace("\r", "\n")
+    text = re.sub(r"[\f\v\x00]", "\n", text)
+    # Indentation is kept for Markdown lists and code; spaces inside and at the end of lines are collapsed
+    text = re.sub(r"(?<=\S)[ \t]+", " ", text)
+    text = re.sub(r"[ \t]+\n", "\n", text)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return text.strip()
+
+
+def _text_pages(file):
+    """Decode a text or Markdown file block by block, ending each page at a blank line once it is large enough"""
+    reader = io.TextIOWrapper(file, encoding="utf-8", errors="replace", newline="")
+    lines = []
+    size = 0
+    try:
+        for line in reader:
+            lines.append(line)
+            size += len(line)
+            if size >= PAGE_CHARACTERS and not line.strip():
+                yield "".join(lines)
+                lines, size = [], 0
+        if lines:
+            yield "".join(lines)
+    finally:
+        # Detached, the wrapper leaves the uploaded file open for the next pass
+        reader.detach()
+
+
+def _pdf_pages(file):
+    from pypdf import PdfReader
+
+    for page in PdfReader(file).pages:
+        # Words hyphenated at the end of a line are joined again
+        yield re.sub(r"(\w)-\n(\w)", r"\1\2", page.extract_text() or "")
+
+
+def _pptx_pages(file):
+    from pptx import Presentation
+
+    for number, slide in enumerate(Presentation(file).slides, start=1):
+        texts = [f"Slide {number}"]
+        for shape in slide.shapes:
+            if shape.has_text_frame:
+                texts.append(shape.text_frame.text)
+            elif getattr(shape, "has_table", False) and shape.has_table:
+                texts.extend(" | ".join(cell.text for cell in row.cells) for row in shape.table.rows)
+        if slide.has_notes_slide:
+            texts.append(slide.notes_slide.notes_text_frame.text)
+        yield "\n\n".join(text for text in texts if text.strip())
+
+
+def _docx_pages(file):
+    """Read the paragraphs of a Word document with iterparse, releasing each one once its text is taken"""
+    paragraphs = []
+    size = 0
+    with zipfile.ZipFile(file) as archive, archive.open("word/document.xml") as xml:
+        for _, element in ElementTree.iterparse(xml, events=("end",)):
+            if element.tag != f"{WORD_NAMESPACE}p":
+                continue
+            parts = []
+            page_break = False
+            for node in element.iter():
+                if node.tag == f"{WORD_NAMESPACE}t":
+                    parts.append(node.text or "")
+                elif node.tag == f"{WORD_NAMESPACE}tab":
+                    parts.append("\t")
+                elif node.tag == f"{WORD_NAMESPACE}br":
+                    page_break = page_break or node.get(f"{WORD_NAMESPACE}type") == "page"
+                    parts.append("\n")
+            element.clear()
+
+            paragraph = "".join(parts)
+            if paragraph.strip():
+                paragraphs.append(paragraph)
+                size += len(paragraph)
+            if paragraphs and (page_break or size >= PAGE_CHARACTERS):
+                yield "\n\n".join(paragraphs)
+                paragraphs, size = [], 0
+    if paragraphs:
+        yield "\n\n".join(paragraphs)
+
+
+page_readers = {
+    "txt": _text_pages,
+    "md": _text_pages,
+    "pdf": _pdf_pages,
+    "pptx": _pptx_pages,
+    "docx": _docx_pages
+}
+
+
+def document_type(filename):
+    """Return the type of a document from its file name"""
+    return os.path.splitext(filename)[1].lower().lstrip(".")
+
+
+def iter_pages(file, filename):
+    """Yield the normalized text of a document one page (or slide) at a time; empty pages are skipped"""
+    kind = document_type(filename)
+    if kind not in page_readers:
+        raise ValueError(f"Unsupported document type: {filename} (expected {', '.join(DOCUMENT_TYPES)})")
+    file.seek(0)
+    for page in page_readers[kind](file):
+        page = normalize_text(page)
+        if page:
+            yield page
+
+
+class GuideDocument:
+    """An uploaded guide read page by page instead of as one string.
+
+    The first complete pass spools the normalized pages to a temporary file, so summarizing and indexing
+    the same upload extract it only once, and records the counts and start of the document.
+    """
+
+    def __init__(self, file, filename):
+        self.file = file
+        self.filename = filename
+        self.pages_read = 0
+        self.words = 0
+        self.characters = 0
+        self._head = ""
+        self._spool = None
+        self._key = None
+
+    @property
+    def key(self):
+        """Content hash of the file, read in blocks; identifies the document in the summary cache and the index"""
+        if self._key is None:
+            digest = hashlib.sha256(document_type(self.filename).encode("utf-8"))
+            self.file.seek(0)
+            for block in iter(lambda: self.file.read(READ_BLOCK_BYTES), b""):
+                digest.update(block)
+            self._key = digest.hexdigest()
+        return self._key
+
+    def pages(self):
+        """Yield the normalized pages, from the spool once a pass has completed"""
+        if self._spool is not None:
+            yield from self._replay()
+            return
+
+        spool = tempfile.TemporaryFile("w+", encoding="utf-8")
+        pages_read = words = characters = 0
+        head = []
+        for page in iter_pages(self.file, self.filename):
+            spool.write(page + "\n" + PAGE_SEPARATOR)
+            pages_read += 1
+            words += len(page.split())
+            characters += len(page)
+            if sum(map(len, head)) < HEAD_CHARACTERS:
+                head.append(page[:HEAD_CHARACTERS])
+            yield page
+
+        # Only a pass that reached the end is reused and counted
+        self._spool = spool
+        self.pages_read, self.words, self.characters = pages_read, words, characters
+        self._head = "\n\n".join(head)[:HEAD_CHARACTERS]
+        print(f"📄 Read {self.filename}: {pages_read} pages, {words} words")
+
+    def _replay(self):
+        self._spool.seek(0)
+        lines = []
+        for line in self._spool:
+            if line == PAGE_SEPARATOR:
+                yield "".join(lines)[:-1]
+                lines = []
+            else:
+                lines.append(line)
+
+    def head(self):
+        """Return the start of the document, reading it through once if no pass has completed yet"""
+        if self._spool is None:
+            for _ in self.pages():
+                pass
+        return self._head
+
+    def preview(self, characters=500):
+        """Return the start of the first page without reading the rest of the document"""
+        if self._head:
+            return self._head[:characters]
+        return next(iter_pages(self.file, self.filename), "")[:characters]
+
+    def text(self):
+        """Return the whole document as one string, for the API client, which sends text"""
+        return "\n\n".join(self.pages())
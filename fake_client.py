@@ -0,0 +1,187 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from functools import lru_cache
+from types import SimpleNamespace
+
+import httpx
+import openai
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+# Characters per token used to estimate usage of fake completions
+CHARS_PER_TOKEN = 4
+# Characters per streamed chunk
+STREAM_CHUNK_CHARS = 12
+
+
+class FakeResponse:
+    """A canned completion: text content, or a tool call with JSON arguments"""
+
+    def __init__(self, content=None, tool_name=None, tool_arguments=None):
+        self.content = content
+        self.tool_name = tool_name
+        self.tool_arguments = tool_arguments or {}
+
+
+def default_responder(messages, **kwargs):
+    """Pick a plausible response from the request: JSON answers, language names or a summary"""
+    prompt = messages[-1]["content"] if messages else ""
+    if kwargs.get("response_format", {}).get("type") == "json_object":
+        return FakeResponse(json.dumps({
+            "reasoning": "The guide summary covers this question.",
+            "answer": f"According to the guide, here is what you asked about: {prompt[:80]}",
+            "confidence": "0.9"
+        }))
+    if "only the language name" in prompt.lower():
+        return FakeResponse("English")
+    if "running summary" in prompt.lower():
+        return FakeResponse("The user asked about the guide and received answers.")
+    return FakeResponse("- Main features of the guide\n- Step-by-step setup\n- Troubleshooting tips")
+
+
+def _error(kind):
+    """Build an SDK exception as the Azure endpoint would raise it"""
+    request = httpx.Request("POST", "https://fake.openai.azure.com/openai/deployments/fake/chat/completions")
+    if kind == "rate_limit":
+        response = httpx.Response(429, headers={"retry-after-ms": "10"}, request=request)
+        return openai.RateLimitError("Rate limit reached (fake)", response=response, body=None)
+    if kind == "timeout":
+        return openai.APITimeoutError(request=request)
+    response = httpx.Response(500, request=request)
+    return openai.InternalServerError("Internal server error (fake)", response=response, body=None)
+
+
+class FakeChatClient:
+    """In-process stand-in for the Azure OpenAI client with canned, streamed and tool-call responses.
+
+    responder(messages, **kwargs) returns a FakeResponse or a string; latency is the time to the first
+    token, token_latency the delay between streamed chunks. Errors are raised from the errors list in
+    order ("rate_limit", "timeout", "server" or an exception), then at random with error_rate.
+    """
+
+    def __init__(self, responder=default_responder, latency=0.0, token_latency=0.0, errors=None, error_rate=0.0, seed=0):
+        self.responder = responder
+        self.latency = latency
+        self.token_latency = token_latency
+        self.errors = list(errors or [])
+        self.error_rate = error_rate
+        self.requests = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def with_options(self, **options):
+        return self
+
+    def _respond(self, kwargs):
+        """Record the request, raise an injected error or return the FakeResponse"""
+        with self._lock:
+            self.requests.append(kwargs)
+            error = self.errors.pop(0) if self.errors else None
+            if error is None and self.error_rate and self._random.random() < self.error_rate:
+                error = "server"
+        if error is not None:
+            raise _error(error) if isinstance(error, str) else error
+
+        response = self.responder(kwargs.get("messages", []), **{k: v for k, v in kwargs.items() if k != "messages"})
+        return FakeResponse(response) if isinstance(response, str) else response
+
+    def _usage(self, kwargs, response):
+        prompt_chars = sum(len(str(message.get("content") or "")) for message in kwargs.get("messages", []))
+        completion_chars = len(response.content or json.dumps(response.tool_arguments))
+        prompt_tokens = max(1, prompt_chars // CHARS_PER_TOKEN)
+        completion_tokens = max(1, completion_chars // CHARS_PER_TOKEN)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": 0}
+        }
+
+    def _completion(self, kwargs, response):
+        message = {"role": "assistant", "content": response.content}
+        finish_reason = "stop"
+        if response.tool_name:
+            message["tool_calls"] = [{
+                "id": f"call_{uuid.uuid4().hex[:12]}",
+                "type": "function",
+                "function": {"name": response.tool_name, "arguments": json.dumps(response.tool_arguments)}
+            }]
+            finish_reason = "tool_calls"
+        return ChatCompletion.model_validate({
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": kwargs.get("model", "fake"),
+            "choices": [{"index": 0, "finish_reason": finish_reason, "message": message}],
+            "usage": self._usage(kwargs, response)
+        })
+
+    def _chunks(self, kwargs, response):
+        """Split a response into stream chunks, ending with a usage chunk when requested"""
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex}", "object": "chat.completion.chunk", "created": int(time.time()), "model": kwargs.get("model", "fake")}
+        deltas = []
+        if response.tool_name:
+            arguments = json.dumps(response.tool_arguments)
+            deltas.append({"role": "assistant", "tool_calls": [{"index": 0, "id": f"call_{uuid.uuid4().hex[:12]}", "type": "function", "function": {"name": response.tool_name, "arguments": ""}}]})
+            deltas += [{"tool_calls": [{"index": 0, "function": {"arguments": arguments[i:i + STREAM_CHUNK_CHARS]}}]} for i in range(0, len(arguments), STREAM_CHUNK_CHARS)]
+        else:
+            content = response.content or ""
+            deltas += [{"content": content[i:i + STREAM_CHUNK_CHARS]} for i in range(0, len(content), STREAM_CHUNK_CHARS)]
+
+        chunks = [ChatCompletionChunk.model_validate({**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}) for delta in deltas]
+        if kwargs.get("stream_options", {}).get("include_usage"):
+            chunks.append(ChatCompletionChunk.model_validate({**base, "choices": [], "usage": self._usage(kwargs, response)}))
+        return chunks
+
+    def _stream(self, chunks):
+        for index, chunk in enumerate(chunks):
+            if index and self.token_latency:
+                time.sleep(self.token_latency)
+            yield chunk
+
+    def create(self, **kwargs):
+        """Same contract as client.chat.completions.create"""
+        response = self._respond(kwargs)
+        if self.latency:
+            time.sleep(self.latency)
+        if kwargs.get("stream"):
+            return self._stream(self._chunks(kwargs, response))
+        return self._completion(kwargs, response)
+
+
+class AsyncFakeChatClient(FakeChatClient):
+    """Async variant of FakeChatClient; latency is awaited instead of blocking the event loop"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create_async))
+
+    async def _stream_async(self, chunks):
+        for index, chunk in enumerate(chunks):
+            if index and self.token_latency:
+                await asyncio.sleep(self.token_latency)
+            yield chunk
+
+    async def create_async(self, **kwargs):
+        response = self._respond(kwargs)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if kwargs.get("stream"):
+            return self._stream_async(self._chunks(kwargs, response))
+        return self._completion(kwargs, response)
+
+
+@lru_cache(maxsize=2)
+def get_fake_client(use_async=False):
+    """Return the process-wide fake client configured from FAKE_LATENCY_MS, FAKE_TOKEN_LATENCY_MS and FAKE_ERROR_RATE"""
+    client_class = AsyncFakeChatClient if use_async else FakeChatClient
+    return client_class(
+        latency=float(os.getenv("FAKE_LATENCY_MS", "0")) / 1000,
+        token_latency=float(os.getenv("FAKE_TOKEN_LATENCY_MS", "0")) / 1000,
+        error_rate=float(os.getenv("FAKE_ERROR_RATE", "0"))
+    )
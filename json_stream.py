@@ -0,0 +1,77 @@
+import re
+
+# JSON escapes that map to a single character
+_simple_escapes = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class JsonStringFieldStreamer:
+    """Incrementally extract one top-level string field from a JSON object streamed in fragments.
+
+    feed() accepts raw JSON text as it arrives and returns the newly decoded characters of the
+    field's value, so the field can be rendered before the rest of the object is complete.
+    """
+
+    def __init__(self, field):
+        self._key_pattern = re.compile(r'(?<!\\)"' + re.escape(field) + r'"\s*:\s*"')
+        self._buffer = ""
+        self._position = None  # Index of the next undecoded value character in the buffer
+        self.value = ""
+        self.done = False
+
+    def feed(self, fragment):
+        """Add a fragment of the JSON text and return the newly decoded part of the field value"""
+        self._buffer += fragment
+        if self.done:
+            return ""
+
+        if self._position is None:
+            match = self._key_pattern.search(self._buffer)
+            if match is None:
+                return ""
+            self._position = match.end()
+
+        decoded = []
+        buffer = self._buffer
+        position = self._position
+        while position < len(buffer):
+            char = buffer[position]
+            if char == '"':
+                self.done = True
+                position += 1
+                break
+            if char != "\\":
+                decoded.append(char)
+                position += 1
+                continue
+
+            # Escape sequences split across fragments are decoded once they are complete
+            if position + 1 >= len(buffer):
+                break
+            escape = buffer[position + 1]
+            if escape == "u":
+                if position + 6 > len(buffer):
+                    break
+                code = int(buffer[position + 2:position + 6], 16)
+                # Surrogate pairs need the second \\uXXXX escape as well
+                if 0xD800 <= code <= 0xDBFF:
+                    if position + 12 > len(buffer):
+                        break
+                    low = int(buffer[position + 8:position + 12], 16)
+                    decoded.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                    position += 12
+                    continue
+                decoded.append(chr(code))
+                position += 6
+                continue
+            decoded.append(_simple_escapes.get(escape, escape))
+            position += 2
+
+        self._position = position
+        text = "".join(decoded)
+        self.value += text
+        return text
+
+    @property
+    def text(self):
+        """The raw JSON text received so far"""
+        return self._buffer
@@ -0,0 +1,112 @@
+import re
+import unicodedata
+
+# Below this confidence the caller should fall back to the LLM detector
+DEFAULT_CONFIDENCE_THRESHOLD = 0.6
+
+# Frequent function words per Latin-script language
+stopwords = {
+    "English": {
+        "the", "is", "are", "what", "how", "do", "does", "i", "you", "can", "to", "of", "and", "in",
+        "this", "that", "my", "it", "with", "for", "where", "when", "why", "which", "on", "be",
+        "have", "has", "should", "please", "there", "about", "main", "described", "guide", "if", "not",
+        "a", "an", "your", "get", "use", "will", "from"
+    },
+    "Spanish": {
+        "el", "la", "los", "las", "de", "que", "es", "en", "y", "cómo", "qué", "cuál", "cuáles",
+        "son", "para", "por", "una", "un", "del", "se", "esta", "este", "puedo", "mi", "con", "hay",
+        "dónde", "guía", "cuando", "también", "pero", "si", "no", "lo", "al"
+    },
+    "French": {
+        "le", "la", "les", "des", "est", "et", "en", "que", "quelles", "quels", "quel", "quelle",
+        "sont", "comment", "pour", "une", "un", "du", "ce", "cette", "je", "puis", "mon", "avec",
+        "dans", "il", "où", "pourquoi", "sur", "par", "pas", "au", "aux", "ne", "qui", "vous"
+    },
+    "German": {
+        "der", "die", "das", "und", "ist", "wie", "was", "welche", "gibt", "es", "ich", "kann",
+        "ein", "eine", "nicht", "mit", "für", "auf", "zu", "den", "dem", "sie", "wo", "warum",
+        "mein", "sind", "im", "von", "wird", "auch", "oder", "wenn"
+    },
+    "Italian": {
+        "il", "lo", "la", "gli", "le", "di", "che", "è", "e", "come", "cosa", "quali", "sono", "per",
+        "una", "un", "del", "della", "posso", "mio", "con", "non", "dove", "perché", "questo",
+        "questa", "nel", "nella", "si", "anche", "ma", "funzionalità", "principali"
+    },
+    "Portuguese": {
+        "o", "a", "os", "as", "de", "que", "é", "em", "como", "quais", "são", "para", "uma", "um",
+        "do", "da", "posso", "meu", "com", "não", "onde", "por", "isso", "este", "esta", "você",
+        "no", "na", "também", "mas", "se", "ao", "principais"
+    }
+}
+
+# Character n-grams that are characteristic of one Latin-script language
+ngram_hints = {
+    "English": ["th", "ing", "ould", "ght", "wh", "ee", "ow"],
+    "Spanish": ["ñ", "¿", "¡", "ción", "ciones", "ll", "ué", "ía"],
+    "French": ["ç", "è", "ê", "ù", "â", "î", "ô", "œ", "ë", "eau", "aux", "qu'", "ou", "ée"],
+    "German": ["ä", "ö", "ü", "ß", "sch", "ung", "keit", "heit", "lich", "ei", "ie", "tz"],
+    "Italian": ["ì", "ò", "zione", "zioni", "gli", "cch", "tt", "zz", "ità"],
+    "Portuguese": ["ã", "õ", "ção", "ções", "ões", "nh", "lh", "ê"]
+}
+
+# Letters that only occur in Vietnamese among the supported languages
+vietnamese_letters = set("ăđơưĂĐƠƯ")
+
+
+def _script_counts(letters):
+    """Count letters per writing system"""
+    counts = {"hangul": 0, "kana": 0, "han": 0, "arabic": 0, "vietnamese": 0}
+    for char in letters:
+        code = ord(char)
+        if 0xAC00 <= code <= 0xD7AF or 0x1100 <= code <= 0x11FF or 0x3130 <= code <= 0x318F:
+            counts["hangul"] += 1
+        elif 0x3040 <= code <= 0x30FF or 0x31F0 <= code <= 0x31FF:
+            counts["kana"] += 1
+        elif 0x4E00 <= code <= 0x9FFF or 0x3400 <= code <= 0x4DBF:
+            counts["han"] += 1
+        elif 0x0600 <= code <= 0x06FF or 0x0750 <= code <= 0x077F:
+            counts["arabic"] += 1
+        elif char in vietnamese_letters or 0x1EA0 <= code <= 0x1EF9:
+            counts["vietnamese"] += 1
+    return counts
+
+
+def _latin_scores(text):
+    """Score Latin-script languages by function words and characteristic n-grams"""
+    words = re.findall(r"\w+", text)
+    scores = {lang: 0.0 for lang in stopwords}
+    for lang, vocabulary in stopwords.items():
+        scores[lang] += sum(1.0 for word in words if word in vocabulary)
+        scores[lang] += sum(0.5 * min(text.count(hint), 2) for hint in ngram_hints[lang])
+    return scores
+
+
+def detect_language(text):
+    """Detect the language of a text offline, returning (language, confidence between 0 and 1)"""
+    text = unicodedata.normalize("NFC", text).lower()
+    letters = [char for char in text if char.isalpha()]
+    if not letters:
+        return "English", 0.0
+
+    # Non-Latin scripts identify the language on their own
+    counts = _script_counts(letters)
+    total = len(letters)
+    if counts["hangul"] / total > 0.3:
+        return "Korean", min(1.0, 0.5 + counts["hangul"] / total)
+    if counts["kana"] and (counts["kana"] + counts["han"]) / total > 0.3:
+        return "Japanese", min(1.0, 0.5 + (counts["kana"] + counts["han"]) / total)
+    if counts["han"] / total > 0.3:
+        return "Chinese (Simplified)", min(1.0, 0.5 + counts["han"] / total)
+    if counts["arabic"] / total > 0.3:
+        return "Arabic", min(1.0, 0.5 + counts["arabic"] / total)
+    if counts["vietnamese"] >= 2 or counts["vietnamese"] / total > 0.05:
+        return "Vietnamese", min(1.0, 0.6 + 4 * counts["vietnamese"] / total)
+
+    # Latin scripts: confidence grows with the margin over the runner-up and with the evidence found
+    scores = _latin_scores(text)
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    (best, best_score), (_, second_score) = ranked[0], ranked[1]
+    if best_score == 0:
+        return "English", 0.0
+    confidence = (best_score - second_score) / best_score * min(1.0, best_score / 3)
+    return best, round(confidence, 3)
@@ -0,0 +1,90 @@
+"""
+Load harness: answer_question and summarize_user_guide against the in-process fake backend
+
+Measures our own overhead (prompt building, token counting, parsing, caching) and behaviour under
+concurrency without calling Azure OpenAI. Every request uses a distinct question or guide, so the
+response cache does not hide the work.
+
+Usage:
+    python load_test.py                                    # 200 answers and 50 summaries, 8 concurrent
+    python load_test.py --target answer --requests 1000 --concurrency 32 --latency-ms 300
+    python load_test.py --stream --token-latency-ms 20 --error-rate 0.05
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# A throwaway response cache so earlier runs do not turn requests into hits
+os.environ["RESPONSE_CACHE_PATH"] = os.path.join(tempfile.mkdtemp(), "load_cache.sqlite3")
+
+from fake_client import FakeChatClient
+from assistant import answer_question
+from summarizer import summarize_user_guide
+
+with open("data/user_guide_sample.txt", encoding="utf-8") as f:
+    sample_guide = f.read()
+
+
+def run_answer(client, index, stream):
+    question = f"How do I configure feature number {index}?"
+    if stream:
+        answer_stream = answer_question(client, question, sample_guide[:1500], sample_guide, stream=True)
+        for _ in answer_stream:
+            pass
+        return answer_stream.result[0]
+    return answer_question(client, question, sample_guide[:1500], sample_guide)[0]
+
+
+def run_summary(client, index, stream):
+    guide = f"{sample_guide}\n\nRevision {index}"
+    if stream:
+        return "".join(summarize_user_guide(client, guide, stream=True))
+    return summarize_user_guide(client, guide)
+
+
+def run(name, function, client, requests, concurrency, stream):
+    """Fire requests from a thread pool and report throughput, latency percentiles and errors"""
+    def timed(index):
+        start = time.perf_counter()
+        result = function(client, index, stream)
+        return time.perf_counter() - start, result.startswith("❌")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(timed, range(requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for latency, _ in results)
+    errors = sum(error for _, error in results)
+    print(f"{name} ({requests} requests, {concurrency} concurrent{', streamed' if stream else ''}):")
+    print(f"   Throughput: {requests / elapsed:.1f} req/s")
+    print(f"   Latency:    p50 {statistics.median(latencies) * 1000:.1f} ms, "
+          f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:.1f} ms, max {latencies[-1] * 1000:.1f} ms")
+    print(f"   Overhead:   {(statistics.median(latencies) - client.latency) * 1000:.1f} ms per request beyond the simulated model latency")
+    print(f"   Errors:     {errors}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=["answer", "summarize", "both"], default="both")
+    parser.add_argument("--requests", type=int, default=200, help="Answer requests; summaries use a quarter")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=0, help="Simulated time to first token")
+    parser.add_argument("--token-latency-ms", type=float, default=0, help="Simulated delay between streamed chunks")
+    parser.add_argument("--error-rate", type=float, default=0, help="Share of requests failing with a 500")
+    parser.add_argument("--stream", action="store_true")
+    args = parser.parse_args()
+
+    client = FakeChatClient(latency=args.latency_ms / 1000, token_latency=args.token_latency_ms / 1000, error_rate=args.error_rate)
+    if args.target in ("answer", "both"):
+        run("answer_question", run_answer, client, args.requests, args.concurrency, args.stream)
+    if args.target in ("summarize", "both"):
+        run("summarize_user_guide", run_summary, client, max(1, args.requests // 4), args.concurrency, args.stream)
+
+
+if __name__ == "__main__":
+    main()
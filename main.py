@@ -1,18 +1,31 @@
 import streamlit as st
-import os
-from openai import AzureOpenAI
 from dotenv import load_dotenv
 import io
-import json
 import re
-from datetime import datetime
+import time
 
-from audio_player import create_audio_player
-from tts import load_tts, speak
-
-# Load environment variables from .env file
+# Load environment variables from .env file before the modules below read their settings
 load_dotenv()
 
+from api_client import AssistantAPIClient, get_api_client
+from assistant import answer_question_auto_lang, create_client
+from audio_player import audio_stats_summary, create_audio_queue_player
+from azure_client import usage_summary
+from chat_history import ConversationHistory
+from documents import DOCUMENT_TYPES, GuideDocument
+from rate_limit import LimitedChatClient
+from response_cache import get_response_cache
+from retrieval import guide_id_for_document, index_guide, index_pages
+from semantic_cache import get_semantic_cache
+from summarizer import summarize_document, summarize_user_guide
+from ticket_store import get_ticket_store
+from tracing import counter_totals, start_metrics_server
+from tts import get_tts_registry, tts_language_code
+from tts_service import get_tts_service
+
+# Support tickets shown per page in the viewer
+TICKETS_PER_PAGE = 10
+
 # Page configuration
 st.set_page_config(
     page_title="User Guide Summarization",
@@ -52,57 +65,21 @@ st.markdown(
     </style>
     ''',unsafe_allow_html=True)
 
-
-# Define available functions for OpenAI
-function_definitions = [{
-    "type": "function",
-    "function": {
-        "name": "create_support_ticket",
-        "description": "Submit a support ticket for further assistance if user provided question cannot be answered, when the user provides enough contact details including name and email",
-        "parameters": {
-            "type": "object",
-            "properties": {
-                "name": {
-                    "type": "string",
-                    "description": "The customer's full name"
-                },
-                "email": {
-                    "type": "string",
-                    "description": "The customer's email address"
-                },
-                "issue_description": {
-                    "type": "string",
-                    "description": "The question or issue the person is experiencing, getting from the 'Conversation history' where the question you cannot answered, or the current user requested support question"
-                }
-            },
-            "required": ["name", "email", "issue_description"]
-        }
-    }
-}]
-
-# Language-specific instructions
-language_instructions = {
-    "English": "",
-    "Spanish": " Please respond in Spanish.",
-    "French": " Please respond in French.",
-    "German": " Please respond in German.",
-    "Italian": " Please respond in Italian.",
-    "Portuguese": " Please respond in Portuguese.",
-    "Japanese": " Please respond in Japanese.",
-    "Chinese (Simplified)": " Please respond in Simplified Chinese.",
-    "Korean": " Please respond in Korean.",
-    "Arabic": " Please respond in Arabic."
-}
-
 # Initialize session state
 if 'summary' not in st.session_state:
     st.session_state.summary = ""
 if 'last_input' not in st.session_state:
     st.session_state.last_input = ""
+if 'input_words' not in st.session_state:
+    st.session_state.input_words = 0
 if 'chat_history' not in st.session_state:
     st.session_state.chat_history = []
+if 'conversation' not in st.session_state:
+    st.session_state.conversation = ConversationHistory()
 if 'guide_context' not in st.session_state:
     st.session_state.guide_context = ""
+if 'guide_id' not in st.session_state:
+    st.session_state.guide_id = None
 if 'previous_question' not in st.session_state:
     st.session_state.previous_question = ""
 if 'support_tickets' not in st.session_state:
@@ -111,481 +88,101 @@ if "tts_playing" not in st.session_state:
     st.session_state.tts_playing = {}
 if "tts_last_clicked" not in st.session_state:
     st.session_state.tts_last_clicked = None
+if "tts_streams" not in st.session_state:
+    st.session_state.tts_streams = {}
 
-def initialize_client():
-    """Initialize Azure OpenAI client with error handling"""
+def initialize_client(use_async=False):
+    """Initialize Azure OpenAI client with error handling; the client and its connection pool are shared across reruns"""
     try:
-        api_key = os.getenv("AZURE_OPENAI_API_KEY")
-        endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
-        
-        if not api_key or not endpoint:
+        client = create_client(use_async)
+        if client is None:
             st.error("⚠️ Azure OpenAI credentials not found. Please check your .env file.")
             st.info("Required environment variables: AZURE_OPENAI_API_KEY, AZURE_OPENAI_ENDPOINT")
-            return None
-            
-        client = AzureOpenAI(
-            api_version="2024-07-01-preview",
-            azure_endpoint=endpoint,
-            api_key=api_key,
-        )
         return client
     except Exception as e:
         st.error(f"❌ Failed to initialize Azure OpenAI client: {str(e)}")
         return None
 
-def create_support_ticket(name, email, question, previous_question=""):
-    """Create a customer support ticket"""
-    try:
-        # Create ticket object
-        ticket = {
-            "id": f"TICKET-{datetime.now().strftime('%Y%m%d%H%M%S')}",
-            "name": name,
-            "email": email,
-            "question": question,
-            "previous_question": previous_question,
-            "timestamp": datetime.now().isoformat(),
-            "status": "pending"
-        }
-        
-        # Log for debugging
-        print(f"📋 Support ticket created: {ticket['id']}")
-        print(f"   Name: {name}")
-        print(f"   Email: {email}")
-        print(f"   Question: {question}")
-        if previous_question:
-            print(f"   Context: {previous_question}")
-        
-        return {
-            "success": True,
-            "ticket": ticket,
-            "ticket_id": ticket["id"],
-            "message": f"Support ticket {ticket['id']} has been created successfully. Our team will contact you at {email} within 24-48 hours."
-        }
-        
-    except Exception as e:
-        print(f"❌ Error creating support ticket: {str(e)}")
-        return {
-            "success": False,
-            "message": f"Failed to create support ticket: {str(e)}"
-        }
-
-
-def summarize_user_guide(client, text, summary_style="concise", max_tokens=300, temperature=0.3, language="English", model="gpt-4o-mini"):
-    """Generate user guide summary using Azure OpenAI"""
-    try:
-        if not text.strip():
-            return "⚠️ No content to summarize. Please provide a user guide document."
-        
-        # Language-specific instructions
-        language_instructions = {
-            "English": "",
-            "Spanish": "Respond in Spanish.",
-            "French": "Respond in French.",
-            "German": "Respond in German.",
-            "Italian": "Respond in Italian.",
-            "Portuguese": "Respond in Portuguese.",
-            "Japanese": "Respond in Japanese.",
-            "Chinese (Simplified)": "Respond in Simplified Chinese.",
-            "Korean": "Respond in Korean.",
-            "Arabic": "Respond in Arabic."
-        }
-        
-        # Customize prompt based on style
-        style_prompts = {
-            "concise": "Summarize the following user guide documentation into concise bullet points covering key features, instructions, and important information:",
-            "detailed": "Provide a detailed summary of the following user guide documentation, including all major sections, procedures, and important details:",
-            "action-focused": "Extract and organize the key procedures, step-by-step instructions, and important guidelines from the following user guide documentation:"
-        }
-        
-        base_prompt = style_prompts.get(summary_style, style_prompts['concise'])
-        language_instruction = language_instructions.get(language, "")
-        
-        if language_instruction:
-            prompt = f"{base_prompt} {language_instruction}\n\n{text}"
-        else:
-            prompt = f"{base_prompt}\n\n{text}"
-        
-        response = client.chat.completions.create(
-            model=model,
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=max_tokens,
-            temperature=temperature
-        )
-        
-        return response.choices[0].message.content
-        
-    except Exception as e:
-        return f"❌ Error generating summary: {str(e)}"
-
-def answer_question(client, question, guide_summary, guide_document="", language="English", model="gpt-4o-mini"):
-    """Answer questions about the user guide using native OpenAI function calling with Chain of Thought reasoning"""
-    try:
-        if not question.strip():
-            return "⚠️ Please ask a question about the user guide."
-
-        if not guide_summary.strip():
-            return "⚠️ No guide summary available. Please generate a summary first."
-
-        # Get the previous question BEFORE updating it
-        previous_question = st.session_state.get('previous_question', '')
-
-        language_instruction = language_instructions.get(language, "")
-
-        # System prompt with Chain of Thought reasoning (from merege-code.py)
-        system_prompt = f"""You are a reasoning AI assistant.{language_instruction}
-Follow these steps for every answer:
-1. Analyze the question carefully, include subject, context, relationships, and any relevant details.
-2. Think step-by-step.
-3. Produce a clear, final answer if possible.
-
-For each question, respond as JSON:
-{{
-  "reasoning": "step-by-step explanation based on the guideline above",
-  "answer": "final concise answer",
-  "confidence": "confidence level from 0.0 to 1.0",
-}}
-
-IMPORTANT: 
-- If you you cannot answer, or the information is not found, ask if user wants to contact support, and also ask their name and email if unknown, **do not make up an example user and email, ask user to provide if missing**.
-- If the user wants to contact support, ask for their name and email if unknown, then use the create_support_ticket function to create a support ticket.
-- When you decide to call tool, also include the JSON response as specified above."""
-
-        # Few-shot examples (from merege-code.py)
-        few_shot_examples = [
-            # 1) Reset device (EN) – direct + steps
-            {
-                "context": (
-                    "User Guide Summary:\n"
-                    "- Soft reset: Settings > System > Reset.\n"
-                    "- Hard reset: giữ nút Reset ~10 giây đến khi LED đỏ nhấp nháy.\n\n"
-                    "Original Document (truncated):\n"
-                    "Hardware reset requires pressing and holding the recessed button for 8–12 seconds.\n"
-                ),
-                "question": "How do I perform a hard reset?",
-                "final_answer": (
-                    "Use the physical reset button:\n"
-                    "- Power on the device.\n"
-                    "- Press and hold the recessed **Reset** button for ~10 seconds until the LED blinks red.\n"
-                    "- Release to complete the hard reset.\n"
-                    "If the LED never blinks, check the Hardware Reset section for model-specific notes."
-                ),
-            },
-
-            # 2) Export PDF (EN) – feature gating + alternatives
-            {
-                "context": (
-                    "User Guide Summary:\n"
-                    "- Export: TXT/HTML available by default.\n"
-                    "- PDF export requires Advanced Preview to be enabled.\n"
-                ),
-                "question": "Can I export the summary to PDF?",
-                "final_answer": (
-                    "Yes, if **Advanced Preview** is enabled:\n"
-                    "- Open **Advanced Preview** → **Export** → **PDF**.\n"
-                    "- If it's disabled, either enable Advanced Preview or export **TXT/HTML** instead."
-                ),
-            },
-
-            # 3) Missing data (EN) – Unknown/Not in guide
-            {
-                "context": (
-                    "User Guide Summary:\n"
-                    "- The app supports English, Spanish, and Japanese UI.\n"
-                    "- Auto language detection applies to the chatbot only.\n"
-                ),
-                "question": "Does the UI support German?\n",
-                "final_answer": (
-                    "Not in guide. The summary lists **English, Spanish, Japanese** only for the UI. "
-                    "German isn't mentioned—please check the Localization section or release notes."
-                ),
-            },
-
-            # 4) Multi-language auto (ES) – respond in question language
-            {
-                "context": (
-                    "User Guide Summary:\n"
-                    "- Las copias de seguridad automáticas se ejecutan a las 02:00.\n"
-                    "- Se pueden cambiar desde Settings > Backup Schedule.\n"
-                ),
-                "question": "¿Cómo cambio la hora de la copia de seguridad?\n",
-                "final_answer": (
-                    "Ve a **Settings → Backup Schedule** y cambia la hora predeterminada (02:00) a la que prefieras. "
-                    "Guarda los cambios para aplicarlos en la próxima ejecución."
-                ),
-            },
-
-            # 5) Troubleshooting (VI) – actions + conditions
-            {
-                "context": (
-                    "User Guide Summary:\n"
-                    "- Đăng nhập yêu cầu email đã xác thực.\n"
-                    "- Sau 5 lần sai mật khẩu, tài khoản bị tạm khóa 15 phút.\n"
-                    "- Có mục Reset password qua email.\n"
-                ),
-                "question": "Không đăng nhập được thì làm sao?\n",
-                "final_answer": (
-                    "Thử theo thứ tự:\n"
-                    "- Kiểm tra bạn đã xác thực email chưa.\n"
-                    "- Nếu quên mật khẩu: dùng **Reset password** để đặt lại.\n"
-                    "- Nếu nhập sai >5 lần: chờ 15 phút rồi thử lại.\n"
-                    "- Vẫn lỗi: xem mục **Troubleshooting → Login** để kiểm tra mã lỗi cụ thể."
-                ),
-            },
-        ]
-
-        # Create context with document information
-        context = f"User Guide Summary:\n{guide_summary}"
-        if guide_document:
-            context += (
-                f"\n\nOriginal Document:\n{guide_document[:2000]}..."
-                if len(guide_document) > 2000
-                else f"\n\nOriginal Document:\n{guide_document}"
-            )
-
-        # Build messages with few-shot examples
-        messages = [{"role": "system", "content": system_prompt}]
-
-        # Add few-shot examples
-        for ex in few_shot_examples:
-            ex_prompt = f"""Based on the following user guide information, please answer the user's question accurately and concisely.
-
-{ex["context"]}
-
-User Question: {ex["question"]}
-
-Answer:"""
-            ex_response = {
-                "reasoning": "Example reasoning omitted.",
-                "answer": ex["final_answer"]
-            }
-            messages.append({"role": "user", "content": ex_prompt})
-            messages.append({"role": "assistant", "content": json.dumps(ex_response, ensure_ascii=False)})
-
-        # User prompt with context and question
-        history = st.session_state.chat_history
-        previous_questions = [f"{content['role']}: {content['content']}" for content in history[:-1]]
-        user_prompt = f"""Based on the following user guide information, please answer the user's question accurately and concisely.{language_instruction}
-
-{context}
-
-Conversation history: 
-{','.join(previous_questions)}
-
-Current User Question: {question}
-
-Answer:"""
-
-        messages.append({"role": "user", "content": user_prompt})
-
-        # Call API with function calling support
-        response = client.chat.completions.create(
-            model=model,
-            messages=messages,
-            tools=function_definitions,
-            tool_choice='auto',
-            max_tokens=1000,
-            response_format={"type": "json_object"},
-            temperature=0.2
-        )
-        
-        # Check if the model wants to call a function
-        response_message = response.choices[0].message
-        print(response_message)
-        
-        if response_message.tool_calls:
-            # The model wants to call a function
-            function_name = response_message.tool_calls[0].function.name
-            function_args = json.loads(response_message.tool_calls[0].function.arguments)
-            
-            print(f"🔧 Function call detected: {function_name}")
-            print(f"📝 Arguments: {function_args}")
-            
-            if function_name == "create_support_ticket":
-                # Call the actual ticket creation function
-                result = create_support_ticket(
-                    name=function_args.get("name"),
-                    email=function_args.get("email"),
-                    question=function_args.get("issue_description"),
-                    previous_question=previous_question
-                )
-                function_called = {
-                    "function_called": function_name,
-                    "name": function_args.get("name"),
-                    "email": function_args.get("email"),
-                    "issue_description": function_args.get("issue_description"),
-                    "ticket_id": result.get('ticket_id')
-                }
-                
-                if result['success']:
-                    # Save ticket to session state
-                    st.session_state.support_tickets.append(result['ticket'])
-                    
-                    # Update previous_question for next interaction
-                    st.session_state.previous_question = question
-                    return (
-                        f"""✅ {result['message']}
-
-📧 **Contact Information Recorded:**
-- Name: {function_args.get('name')}
-- Email: {function_args.get('email')}
-
-📋 **Issue Description:**
-{function_args.get('issue_description')}
-
-Our support team will review your query and respond within 24-48 hours.""", 
-                        None, 
-                        function_called
-                    )
-                else:
-                    # Update previous_question for next interaction
-                    st.session_state.previous_question = question
-                    return (
-                        f"❌ {result['message']}",
-                        None, 
-                        function_called
-                    )
-        
-        # No function call, parse the JSON response
-        try:
-            response_json = json.loads(response.choices[0].message.content)
-        except Exception:
-            print("⚠️ Could not parse JSON response")
-            response_json = {
-                "reasoning": None,
-                "answer": response_message.content
-            }
-
-        try:
-            # Parse the JSON response
-            response_json = json.loads(response.choices[0].message.content)
-
-            # Log the reasoning internally (visible in terminal/logs)
-            reasoning = response_json.get('reasoning', None)
-            if reasoning:
-                print(f"🧠 Reasoning: {reasoning}")
-
-            # Get the answer from the JSON - try both 'answer' and 'response' fields
-            answer = response_json.get('answer', response_message.content)
-
-            # Check if information was not found and suggest support contact
-            fallback_keywords = [
-                "not found", "not in guide", "not in the guide", "not mentioned",
-                "not available", "no information", "not explicitly found",
-                "does not provide", "doesn't provide", "not provide",
-                "does not contain", "doesn't contain", "not contain",
-                "cannot find", "can't find", "unable to find",
-                "not covered", "not included", "not described",
-                "không tìm thấy", "không có", "không được đề cập"  # Vietnamese
-            ]
-            answer_lower = answer.lower()
-            info_not_found = any(keyword in answer_lower for keyword in fallback_keywords)
-
-            # Add confidence indicator if low confidence
-            confidence = response_json.get('confidence', 1.0)
-            if float(confidence) < 0.5:
-                answer = f"⚠️ *Note: Lower confidence answer*\n\n{answer}"
-
-            # Add sources if available
-            sources = response_json.get('sources', [])
-            if sources:
-                answer += f"\n\n📚 **Sources:** {', '.join(sources)}"
-
-            # Add note if not found in guide with support contact suggestion
-            if info_not_found:
-                answer += "\n\n📌 *Note: This information was not explicitly found in the user guide.*"
-                answer += "\n\n💡 **Need more help?** Contact our support team by providing:"
-                answer += "\n- Your **name**"
-                answer += "\n- Your **email address**"
-                answer += "\n\nExample: *\"I need help with [your issue]. My name is John Doe and email is john@example.com\"*"
-
-            # Update previous_question for next interaction
-            st.session_state.previous_question = question
-            return answer, reasoning, None
-        except (json.JSONDecodeError, KeyError) as e:
-            # If it's not JSON or has unexpected structure, return the content as-is (fallback)
-            print(f"⚠️ Could not parse JSON: {e}")
-            # Update previous_question for next interaction
-            st.session_state.previous_question = question
-            return response_message.content, None, None
-        
-    except Exception as e:
-        # Still update previous_question even on error
-        st.session_state.previous_question = question
-        print(f"❌ Error answering question: {str(e)}")
-        return f"❌ Error answering question: {str(e)}", None, None
-
-def detect_question_language(client, question, model="gpt-4o-mini"):
-    """Detect the language of the user's question using AI"""
-    try:
-        if not question.strip():
-            return "English"  # Default fallback
-        
-        # Simple language detection prompt
-        detection_prompt = f"""Identify the language of the following text and respond with ONLY the language name in English (e.g., "Spanish", "French", "German", etc.). If you're not sure or it's mixed languages, respond with "English".
-
-Text: "{question}"
-
-Language:"""
-        
-        response = client.chat.completions.create(
-            model=model,
-            messages=[{"role": "user", "content": detection_prompt}],
-            max_tokens=10,
-            temperature=0.1
-        )
-        
-        detected_language = response.choices[0].message.content.strip()
-        
-        # Validate detected language against supported languages
-        supported_languages = [
-            "English", "Spanish", "French", "German", "Italian", 
-            "Portuguese", "Japanese", "Chinese", "Korean", "Arabic"
-        ]
-        
-        # Handle variations and ensure we return a supported language
-        language_mapping = {
-            "chinese (simplified)": "Chinese (Simplified)",
-            "chinese": "Chinese (Simplified)",
-            "simplified chinese": "Chinese (Simplified)",
-            "mandarin": "Chinese (Simplified)"
-        }
-        
-        detected_lower = detected_language.lower()
-        if detected_lower in language_mapping:
-            return language_mapping[detected_lower]
-        
-        # Check if detected language is in supported list (case insensitive)
-        for lang in supported_languages:
-            if lang.lower() == detected_lower:
-                return lang
-        
-        # If not found, default to English
-        return "English"
-        
-    except Exception as e:
-        print(f"Language detection error: {e}")
-        return "English"  # Fallback to English on error
-
-def answer_question_auto_lang(client, question, guide_summary, guide_document="", fallback_language="English", model="gpt-4o-mini"):
-    """Answer questions with automatic language detection from the question"""
-    try:
-        if not question.strip():
-            return "⚠️ Please ask a question about the user guide."
-        
-        if not guide_summary.strip():
-            return "⚠️ No guide summary available. Please generate a summary first."
-        
-        # Detect the language of the question
-        detected_language = detect_question_language(client, question, model)
-        
-        # Use the original answer_question function with detected language
-        return answer_question(client, question, guide_summary, guide_document, detected_language, model)
-        
-    except Exception as e:
-        return f"❌ Error answering question: {str(e)}"
-
+def summarize_guide(client, guide, summary_style, max_tokens, temperature, language, model, max_workers):
+    """Stream a summary of pasted text or an uploaded GuideDocument, from the API service when the UI is its client"""
+    if isinstance(client, AssistantAPIClient):
+        # The service takes text, so an uploaded document is read into one string here
+        text = guide.text() if isinstance(guide, GuideDocument) else guide
+        return client.summarize(text, summary_style, max_tokens, temperature, language, model, max_workers)
+    if isinstance(guide, GuideDocument):
+        return summarize_document(client, guide.pages(), guide.key, summary_style, max_tokens, temperature, language, model, max_workers=max_workers)
+    return summarize_user_guide(client, guide, summary_style, max_tokens, temperature, language, model, max_workers=max_workers, stream=True)
+
+def index_document(client, guide, model):
+    if isinstance(client, AssistantAPIClient):
+        return client.index_guide(guide.text() if isinstance(guide, GuideDocument) else guide, model)
+    if isinstance(guide, GuideDocument):
+        return index_pages(guide_id_for_document(guide.key), guide.pages(), model)
+    return index_guide(guide, model)
+
+def ask_question(client, question, language, model):
+    """Stream an answer in the question's language, storing the conversation state in st.session_state"""
+    if isinstance(client, AssistantAPIClient):
+        return client.ask(question, st.session_state.summary, st.session_state.last_input, language, model, st.session_state.guide_id, session=st.session_state)
+    return answer_question_auto_lang(
+        client,
+        question,
+        st.session_state.summary,
+        st.session_state.last_input,
+        language,  # fallback language
+        model,
+        st.session_state.guide_id,
+        stream=True,
+        session=st.session_state
+    )
 
-def display_assistant_response(answer, reasoning=None, tool_call=None):
+def ticket_page(client, offset):
+    """Return one page of support tickets, newest first, and the total count"""
+    if isinstance(client, AssistantAPIClient):
+        return client.tickets(limit=TICKETS_PER_PAGE, offset=offset)
+    store = get_ticket_store()
+    return store.list(limit=TICKETS_PER_PAGE, offset=offset), store.count()
+
+def speech_stream(answer, lang):
+    """Synthesize speech on the API service when configured, otherwise on the local TTS workers"""
+    remote = get_api_client()
+    if remote is not None:
+        return remote.speak_stream(answer, lang)
+    return get_tts_service().submit_stream(answer, lang=lang)
+
+def stream_assistant_response(answer_stream, language="English"):
+    """Render answer tokens as they arrive, then replace them with the final formatted response in the answer's language"""
+    placeholder = st.empty()
+    with placeholder.container():
+        with st.chat_message("assistant"):
+            st.write_stream(answer_stream)
+    placeholder.empty()
+
+    # The detected language picks the voice; through the API it only arrives with the end of the stream
+    language = st.session_state.get("answer_language", language)
+    answer, reasoning, tool_call = answer_stream.result
+    display_assistant_response(answer, reasoning, tool_call, language)
+    return answer, reasoning, tool_call, language
+
+def play_speech_stream(playback):
+    """Queue newly synthesized sentences from a fragment, so playback starts before the whole answer is spoken"""
+    stream = playback["stream"]
+    if stream.done:
+        st.rerun()
+    available = len(stream.segments)
+    if available == 0:
+        st.markdown("⏳")
+        return
+    create_audio_queue_player(stream.segments[playback["sent"]:available], stream.sampling_rate, playback["queue_id"], start=playback["sent"])
+    playback["sent"] = available
+
+def prefetch_speech(answer, language="English"):
+    """Start synthesizing an answer in the background when pre-generation is enabled"""
+    lang = tts_language_code(language)
+    if st.session_state.get("tts_prefetch") and lang:
+        speech_stream(answer, lang)
+
+def display_assistant_response(answer, reasoning=None, tool_call=None, language="English"):
     with st.chat_message("assistant"):
         col1, col2 = st.columns([0.9, 0.1])
         with col1:
@@ -599,22 +196,40 @@ def display_assistant_response(answer, reasoning=None, tool_call=None):
                 with st.expander("Show tool_call", expanded=False):
                     st.code(tool_call)
         with col2:
+            lang = tts_language_code(language)
+            if lang is None:
+                st.button("🔇", key=f"tts_{hash(answer)}", disabled=True, help=f"No voice available for {language}")
+                return
             key=f"tts_{hash(answer)}"
             # if key not in st.session_state.tts_playing:
             #     st.session_state.tts_playing[key] = False
 
-            if not st.session_state.tts_playing[key]:
+            if not st.session_state.tts_playing.get(key):
                 if st.button("🔊", key=key):
+                    # Synthesis runs sentence by sentence on the TTS worker pool; replays come from the audio cache
+                    st.session_state.tts_streams[key] = {
+                        "stream": speech_stream(answer, lang),
+                        "queue_id": f"{key}-{time.time_ns()}",  # A new queue per click restarts playback
+                        "sent": 0
+                    }
                     st.session_state.tts_playing[key] = True
                     st.session_state.tts_last_clicked = key
                     st.rerun()  # ensure immediate refresh to show player
             else:
-                with st.spinner(""):
-                    audio_data, sr = speak(answer, lang='eng')
-                autoplay = (st.session_state.tts_last_clicked == key)
-                create_audio_player(audio_data, sr, autoplay=True)
-                st.session_state.tts_last_clicked = None
-                st.session_state.tts_playing[key] = False
+                playback = st.session_state.tts_streams[key]
+                stream = playback["stream"]
+                if not stream.done:
+                    st.fragment(play_speech_stream, run_every=0.5)(playback)
+                elif stream.error is not None:
+                    st.error("❌")
+                    st.session_state.tts_playing[key] = False
+                    st.session_state.tts_streams.pop(key, None)
+                else:
+                    # Queue whatever arrived after the last fragment run
+                    create_audio_queue_player(stream.segments[playback["sent"]:], stream.sampling_rate, playback["queue_id"], start=playback["sent"])
+                    st.session_state.tts_last_clicked = None
+                    st.session_state.tts_playing[key] = False
+                    st.session_state.tts_streams.pop(key, None)
 
             # if st.button("🔊", key=key):
             #     with st.spinner(""):
@@ -656,6 +271,7 @@ def main():
     with st.sidebar.expander("Advanced Settings"):
         max_tokens = st.slider("Max Output Length", 150, 1000, 300, 50)
         temperature = st.slider("Creativity (Temperature)", 0.0, 1.0, 0.3, 0.1)
+        max_workers = st.slider("Parallel Workers", 1, 8, 4, 1, help="Concurrent requests used to summarize large documents chunk by chunk")
         
         # Model information
         st.info(f"**Selected Model:** {model}")
@@ -667,13 +283,68 @@ def main():
             "gpt-35-turbo-16k": "Extended context length support"
         }
         st.caption(model_info.get(model, "Azure OpenAI model"))
+
+        st.checkbox(
+            "🔊 Pre-generate speech for answers",
+            key="tts_prefetch",
+            help="Synthesize audio in the background as soon as an answer arrives, so 🔊 plays instantly"
+        )
+
+        # Response cache counters
+        cache_stats = get_response_cache().stats()
+        st.caption(
+            f"**Response Cache:** {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+            f"({cache_stats['entries']} entries)"
+        )
+
+        # Near-duplicate questions answered from memory, and how far audited answers drifted from fresh ones
+        semantic_cache = get_semantic_cache()
+        if semantic_cache is not None and not get_api_client():
+            semantic_stats = semantic_cache.stats()
+            st.caption(
+                f"**Semantic Cache:** {semantic_stats['hits']} hits / {semantic_stats['misses']} misses "
+                f"({semantic_stats['entries']} answers, drift {semantic_stats['mean_drift']:.2f} over {semantic_stats['audits']} audits)"
+            )
+
+        # Azure prompt caching: share of input tokens served from the cached static prefix
+        usage = usage_summary()
+        st.caption(
+            f"**Prompt Cache:** {usage['cached_tokens']:,} of {usage['prompt_tokens']:,} input tokens cached "
+            f"({usage['cached_ratio']:.0%})"
+        )
+
+        # Client-side throttling: retried errors, time spent waiting for quota and hedged duplicates
+        counters = counter_totals()
+        if counters.get("model_retries") or counters.get("rate_limit_wait_seconds") or counters.get("model_hedged_requests"):
+            st.caption(
+                f"**Rate Limits:** {counters.get('model_retries', 0):,} retries, "
+                f"{counters.get('rate_limit_wait_seconds', 0):.1f}s waiting for quota, "
+                f"{counters.get('model_hedged_requests', 0):,} hedged"
+            )
+
+        # Compressed audio delivery: bytes sent compared to inline base64 WAV
+        audio = audio_stats_summary()
+        if audio["clips"]:
+            st.caption(
+                f"**Audio:** {audio['bytes'] / 1024:,.0f} KB sent for {audio['clips']} clips "
+                f"({audio['ratio']:.0%} of WAV, {audio['reused']} reused, {audio['encode_ms']:.0f} ms encode)"
+            )
     
-    # Initialize client
-    client = initialize_client()
-    tts = load_tts('eng')
+    # Initialize client; with ASSISTANT_API_URL the UI is a thin client of the API service
+    client = get_api_client() or initialize_client()
+    # Prometheus scrape endpoint when METRICS_PORT is set
+    start_metrics_server()
     
-    if client is None or tts is None:
+    if client is None:
         st.stop()
+
+    # Latency and health of each deployment when a model is served by several
+    for pool_model, deployments in (client.pool.status().items() if isinstance(client, LimitedChatClient) else []):
+        if len(deployments) > 1:
+            st.sidebar.caption(f"**{pool_model}:** " + ", ".join(
+                f"{d['name']} {d['latency_ms']} ms, {d['quota_left']:.0%} quota{'' if d['healthy'] else ' ⚠️ unhealthy'}"
+                for d in deployments
+            ))
     
     # Main content area with tabs
     tab1, tab2, tab3 = st.tabs(["🔍 User Guide Summary", "💬 Q&A Chatbot", "🎫 Support Questions"])
@@ -691,17 +362,25 @@ def main():
             )
             
             transcript_text = ""
+            # Uploaded files are read page by page when summarized and indexed, never as one string
+            document = None
+            preview = ""
             
             if input_method == "Upload file":
                 uploaded_file = st.file_uploader(
                     "Upload user guide document",
-                    type=['txt', 'md'],
-                    help="Upload a text file containing your user guide documentation",
+                    type=list(DOCUMENT_TYPES),
+                    help="Upload your user guide documentation as text, Markdown, PDF, PowerPoint or Word",
                 )
                 
                 if uploaded_file is not None:
-                    transcript_text = str(uploaded_file.read(), "utf-8")
-                    st.success(f"✅ File uploaded successfully! ({len(transcript_text)} characters)")
+                    document = GuideDocument(uploaded_file, uploaded_file.name)
+                    try:
+                        preview = document.preview()
+                        st.success(f"✅ File uploaded successfully! ({uploaded_file.size:,} bytes)")
+                    except Exception as e:
+                        st.error(f"❌ Could not read {uploaded_file.name}: {str(e)}")
+                        document = None
             
             elif input_method == "Paste text":
                 transcript_text = st.text_area(
@@ -721,31 +400,48 @@ def main():
                         transcript_text = ""
             
             # Display input preview
-            if transcript_text:
+            preview = preview or transcript_text
+            if preview:
                 with st.expander("📖 Preview Input"):
-                    st.text_area("Document preview:", transcript_text[:500] + "..." if len(transcript_text) > 500 else transcript_text, height=150, disabled=True)
+                    st.text_area("Document preview:", preview[:500] + "..." if len(preview) > 500 or document is not None else preview, height=150, disabled=True)
         
         with col2:
             st.header("📤 Output")
             
             # Generate summary button
-            if st.button("🎯 Generate Summary", type="primary", disabled=not transcript_text):
-                if transcript_text.strip():
+            if st.button("🎯 Generate Summary", type="primary", disabled=not (transcript_text or document)):
+                if document is not None or transcript_text.strip():
+                    guide = document if document is not None else transcript_text
                     with st.spinner("🤖 Generating summary..."):
-                        summary = summarize_user_guide(
-                            client, 
-                            transcript_text, 
-                            summary_style, 
-                            max_tokens, 
-                            temperature,
-                            language,
-                            model
-                        )
+                        # Tokens are shown as they arrive; the summary section below takes over once done
+                        summary_placeholder = st.empty()
+                        with summary_placeholder.container():
+                            summary = st.write_stream(summarize_guide(
+                                client, 
+                                guide, 
+                                summary_style, 
+                                max_tokens, 
+                                temperature,
+                                language,
+                                model,
+                                max_workers
+                            ))
+                        summary_placeholder.empty()
                         st.session_state.summary = summary
-                        st.session_state.last_input = transcript_text
-                        st.session_state.guide_context = transcript_text
                         # Clear chat history when new summary is generated
                         st.session_state.chat_history = []
+                        st.session_state.conversation.reset()
+                    with st.spinner("🗂️ Indexing document for Q&A..."):
+                        try:
+                            st.session_state.guide_id = index_document(client, guide, model)
+                        except Exception as e:
+                            # Q&A falls back to the truncated document when indexing fails
+                            print(f"❌ Error indexing document: {str(e)}")
+                            st.session_state.guide_id = None
+                    # Of an uploaded document only its start is kept, which is all the Q&A fallback sends
+                    st.session_state.last_input = document.head() if document is not None else transcript_text
+                    st.session_state.guide_context = st.session_state.last_input
+                    st.session_state.input_words = document.words if document is not None else len(transcript_text.split())
                 else:
                     st.warning("⚠️ Please provide a user guide document first.")
             
@@ -777,9 +473,9 @@ def main():
                         st.info("💡 Use Ctrl+A, Ctrl+C to copy the summary above")
             
             # Display statistics
-            if st.session_state.summary and st.session_state.last_input:
+            if st.session_state.summary and st.session_state.input_words:
                 st.subheader("📊 Statistics")
-                input_words = len(st.session_state.last_input.split())
+                input_words = st.session_state.input_words
                 output_words = len(st.session_state.summary.split())
                 compression_ratio = round((1 - output_words/input_words) * 100, 1) if input_words > 0 else 0
                 
@@ -813,11 +509,10 @@ def main():
                     # Display chat messages from history on app rerun
                     for i, message in enumerate(st.session_state.chat_history):
                         if (message["role"] == "assistant"):
-                            print(message)
                             reasoning = message.get("reasoning")
                             tool_call = message.get("tool_call")
                             answer = message["content"]
-                            display_assistant_response(answer, reasoning, tool_call)
+                            display_assistant_response(answer, reasoning, tool_call, message.get("language", "English"))
                         else:
                             with st.chat_message(message["role"]):
                                 st.markdown(message["content"])
@@ -845,16 +540,10 @@ def main():
                                             st.markdown(suggestion)
                                         with st.spinner("🤔 Thinking..."):
                                             # Use auto-detection for suggested questions too
-                                            answer, reasoning, tool_call = answer_question_auto_lang(
-                                                client,
-                                                suggestion,
-                                                st.session_state.summary,
-                                                st.session_state.last_input,
-                                                language,  # fallback language
-                                                model
-                                            )
-                                            display_assistant_response(answer, reasoning, tool_call)
-                                            st.session_state.chat_history.append({"role": "assistant", "content": answer, "reasoning": reasoning, "tool_call": tool_call})
+                                            answer_stream = ask_question(client, suggestion, language, model)
+                                            answer, reasoning, tool_call, answer_language = stream_assistant_response(answer_stream, language)
+                                            st.session_state.chat_history.append({"role": "assistant", "content": answer, "reasoning": reasoning, "tool_call": tool_call, "language": answer_language})
+                                            prefetch_speech(answer, answer_language)
                                             st.rerun()
 
             # Process question
@@ -868,17 +557,11 @@ def main():
                             st.markdown(question)
                         with st.spinner("🤔 Thinking..."):
                             # Use auto-detection for chatbot, but keep manual language for summaries
-                            answer, reasoning, tool_call = answer_question_auto_lang(
-                                client,
-                                question,
-                                st.session_state.summary,
-                                st.session_state.last_input,
-                                language,  # fallback language
-                                model
-                            )
+                            answer_stream = ask_question(client, question, language, model)
+                            answer, reasoning, tool_call, answer_language = stream_assistant_response(answer_stream, language)
                             # Add assistant response to chat history
-                            display_assistant_response(answer, reasoning, tool_call)
-                            st.session_state.chat_history.append({"role": "assistant", "content": answer, "reasoning": reasoning, "tool_call": tool_call})
+                            st.session_state.chat_history.append({"role": "assistant", "content": answer, "reasoning": reasoning, "tool_call": tool_call, "language": answer_language})
+                            prefetch_speech(answer, answer_language)
                             scroll_to_bottom()
                         # Clear input and rerun to show new message
                         # st.rerun()
@@ -891,6 +574,7 @@ def main():
             with col_clear:
                 if st.button("🗑️ Clear Chat") and st.session_state.chat_history:
                     st.session_state.chat_history = []
+                    st.session_state.conversation.reset()
                     st.rerun()
             
             with col_export:
@@ -914,10 +598,17 @@ def main():
 
         with tab3:
             st.header("🎫 Support Questions")    
-            # Support Tickets Viewer (Admin Section)
-            if st.session_state.support_tickets:
+            # Support Tickets Viewer (Admin Section): one indexed page of the shared ticket store per rerun
+            page = st.session_state.get("ticket_page", 1)
+            tickets, total = ticket_page(client, (page - 1) * TICKETS_PER_PAGE)
+            if total:
                 st.markdown("**Customer Support Requests:**")
-                for ticket in st.session_state.support_tickets:
+                pages = (total + TICKETS_PER_PAGE - 1) // TICKETS_PER_PAGE
+                if pages > 1:
+                    st.number_input("Page", min_value=1, max_value=pages, step=1, key="ticket_page")
+                start = (page - 1) * TICKETS_PER_PAGE
+                st.caption(f"Tickets {start + 1}–{start + len(tickets)} of {total}, newest first")
+                for ticket in tickets:
                     st.markdown(f"""
                     **Ticket ID:** {ticket['id']}  
                     **Name:** {ticket['name']}  
@@ -928,7 +619,12 @@ def main():
                     **Time:** {ticket['timestamp']}
                     """)
                     st.markdown("---")
-            
+
+    if not isinstance(client, AssistantAPIClient):
+        # TTS voices load in the background once the page has rendered, or on the first 🔊, so importing
+        # transformers and torch never delays the first paint
+        get_tts_registry()
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,418 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import lru_cache
+from types import SimpleNamespace
+
+import openai
+
+from azure_client import get_async_client, get_client
+from tracing import increment
+
+# Deployment quota in tokens per minute; 0 disables client-side token limiting
+AZURE_OPENAI_TPM = int(os.getenv("AZURE_OPENAI_TPM", "0"))
+# Azure grants 6 requests per minute per 1000 TPM unless set explicitly
+AZURE_OPENAI_RPM = int(os.getenv("AZURE_OPENAI_RPM", str(AZURE_OPENAI_TPM * 6 // 1000)))
+# JSON file listing the deployments that serve each logical model, see deployments.example.json
+AZURE_OPENAI_DEPLOYMENTS = os.getenv("AZURE_OPENAI_DEPLOYMENTS", "deployments.json")
+# Retries of throttled, timed-out and failed requests before the error reaches the user
+MODEL_MAX_RETRIES = int(os.getenv("MODEL_MAX_RETRIES", "4"))
+# Send a duplicate Q&A request when the first has not answered after this many ms; 0 disables hedging
+HEDGE_AFTER_MS = float(os.getenv("HEDGE_AFTER_MS", "0"))
+# Errors worth retrying: throttling, timeouts and transient server failures
+retryable_errors = (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError)
+BASE_DELAY = 2.0
+MAX_DELAY = 60.0
+# Interactive requests give up sooner than batch jobs
+INTERACTIVE_BASE_DELAY = 0.5
+INTERACTIVE_MAX_DELAY = 8.0
+# Azure estimates the prompt side of the TPM quota from the character count
+CHARS_PER_TOKEN = 4
+# Consecutive failures that take a deployment out of rotation, and for how long
+UNHEALTHY_AFTER = 3
+HEALTH_COOLDOWN = 30.0
+# Weight of the newest request in a deployment's moving average latency
+LATENCY_SMOOTHING = 0.3
+retry_reasons = {
+    openai.RateLimitError: "rate_limit",
+    openai.APITimeoutError: "timeout",
+    openai.APIConnectionError: "connection",
+    openai.InternalServerError: "server"
+}
+
+_hedge_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="hedge")
+
+
+def retry_delay(error, attempt, base_delay=BASE_DELAY, max_delay=MAX_DELAY):
+    """Honour the server's retry-after header, otherwise back off exponentially with jitter"""
+    response = getattr(error, "response", None)
+    if response is not None:
+        if response.headers.get("retry-after-ms"):
+            return float(response.headers["retry-after-ms"]) / 1000
+        if response.headers.get("retry-after", "").replace(".", "", 1).isdigit():
+            return float(response.headers["retry-after"])
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+def estimate_tokens(request):
+    """Tokens a chat request counts against the TPM quota: estimated prompt tokens plus max_tokens"""
+    chars = sum(len(str(message.get("content") or "")) for message in request.get("messages", []))
+    return chars // CHARS_PER_TOKEN + (request.get("max_tokens") or 0)
+
+
+class TokenBucket:
+    """Continuously refilled per-minute budget; reservations may overdraw it, which queues later callers"""
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until amount is covered, after the reservations already made"""
+        return max(0.0, (min(amount, self.capacity) - self.level) / self.rate)
+
+    def reserve(self, amount, now):
+        """Take amount from the bucket and return the seconds until it is covered"""
+        self.refill(now)
+        self.level -= min(amount, self.capacity)
+        return max(0.0, -self.level / self.rate)
+
+
+class RateLimiter:
+    """Client-side TPM/RPM limiter of one deployment, shared by every session of the process"""
+
+    def __init__(self, tpm=AZURE_OPENAI_TPM, rpm=AZURE_OPENAI_RPM):
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _buckets(self, tokens):
+        return [(bucket, amount) for bucket, amount in ((self.requests, 1), (self.tokens, tokens)) if bucket]
+
+    def wait_time(self, tokens):
+        """Seconds a request of tokens would wait now, without reserving it"""
+        with self._lock:
+            now = time.monotonic()
+            delay = max(0.0, self.paused_until - now)
+            for bucket, amount in self._buckets(tokens):
+                bucket.refill(now)
+                delay = max(delay, bucket.wait_time(amount))
+            return delay
+
+    def remaining(self):
+        """Share of the token quota (or the request quota without one) currently unspent"""
+        bucket = self.tokens or self.requests
+        if bucket is None:
+            return 1.0
+        with self._lock:
+            bucket.refill(time.monotonic())
+            return max(0.0, bucket.level / bucket.capacity)
+
+    def reserve(self, tokens, block=True):
+        """Reserve one request of tokens and return the seconds to wait before sending it.
+
+        With block=False the request is only reserved when it can go now; otherwise None is returned.
+        """
+        if not block and self.wait_time(tokens) > 0:
+            return None
+        with self._lock:
+            now = time.monotonic()
+            delay = max(0.0, self.paused_until - now)
+            for bucket, amount in self._buckets(tokens):
+                delay = max(delay, bucket.reserve(amount, now))
+        if delay:
+            increment("rate_limit_wait_seconds", delay)
+        return delay
+
+    def pause(self, seconds):
+        """Hold every request to this deployment for seconds, e.g. for a 429's retry-after"""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class Deployment:
+    """One Azure deployment of a logical model with its own quota, recent latency and health"""
+
+    def __init__(self, name, client, deployment, tpm=AZURE_OPENAI_TPM, rpm=AZURE_OPENAI_RPM):
+        self.name = name
+        self.client = client
+        self.deployment = deployment
+        self.limiter = RateLimiter(tpm, rpm)
+        self.latency = 0.0  # Moving average in seconds; unmeasured deployments are tried first
+        self.in_flight = 0
+        self.failures = 0
+        self.unhealthy_until = 0.0
+        self._lock = threading.Lock()
+
+    def healthy(self):
+        return time.monotonic() >= self.unhealthy_until
+
+    def cost(self, tokens):
+        """Expected seconds to a response: quota wait plus recent latency, scaled up by load and scarce quota"""
+        return (self.limiter.wait_time(tokens) + self.latency) * (1 + self.in_flight) / max(self.limiter.remaining(), 0.1)
+
+    def send(self, request):
+        """Send a request under this deployment's name and record its latency and outcome"""
+        self._begin()
+        start = time.perf_counter()
+        try:
+            response = self.client.chat.completions.create(**{**request, "model": self.deployment})
+        except Exception as e:
+            self._failed(e)
+            raise
+        self._succeeded(time.perf_counter() - start)
+        return response
+
+    async def send_async(self, request):
+        self._begin()
+        start = time.perf_counter()
+        try:
+            response = await self.client.chat.completions.create(**{**request, "model": self.deployment})
+        except Exception as e:
+            self._failed(e)
+            raise
+        self._succeeded(time.perf_counter() - start)
+        return response
+
+    def _begin(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def _succeeded(self, elapsed):
+        with self._lock:
+            self.in_flight -= 1
+            self.failures = 0
+            self.latency = elapsed if not self.latency else (1 - LATENCY_SMOOTHING) * self.latency + LATENCY_SMOOTHING * elapsed
+        increment("deployment_requests", deployment=self.name, outcome="ok")
+
+    def _failed(self, error):
+        with self._lock:
+            self.in_flight -= 1
+            # Throttling is a quota signal handled by the limiter, not a health problem
+            if isinstance(error, retryable_errors) and not isinstance(error, openai.RateLimitError):
+                self.failures += 1
+                if self.failures >= UNHEALTHY_AFTER:
+                    self.unhealthy_until = time.monotonic() + HEALTH_COOLDOWN
+                    print(f"🩺 Deployment {self.name} failed {self.failures} times in a row, out of rotation for {HEALTH_COOLDOWN:.0f}s")
+        increment("deployment_requests", deployment=self.name, outcome=retry_reasons.get(type(error), "error"))
+
+    def status(self):
+        return {
+            "name": self.name,
+            "latency_ms": round(self.latency * 1000),
+            "in_flight": self.in_flight,
+            "quota_left": self.limiter.remaining(),
+            "healthy": self.healthy()
+        }
+
+
+class DeploymentPool:
+    """Deployments serving each logical model; models without configured deployments use the default client"""
+
+    def __init__(self, default_client=None, deployments=None):
+        self.default_client = default_client
+        self.deployments = {model: list(entries) for model, entries in (deployments or {}).items()}
+        self._lock = threading.Lock()
+
+    def for_model(self, model):
+        with self._lock:
+            if model not in self.deployments:
+                self.deployments[model] = [Deployment(model, self.default_client, model)]
+            return self.deployments[model]
+
+    def choose(self, model, tokens, exclude=()):
+        """Pick the healthy deployment with the lowest expected latency; when none is healthy, the first to recover"""
+        candidates = [deployment for deployment in self.for_model(model) if deployment not in exclude] or self.for_model(model)
+        healthy = [deployment for deployment in candidates if deployment.healthy()]
+        if not healthy:
+            return min(candidates, key=lambda deployment: deployment.unhealthy_until)
+        return min(healthy, key=lambda deployment: deployment.cost(tokens))
+
+    def status(self):
+        """Status of every deployment by logical model"""
+        with self._lock:
+            deployments = {model: list(entries) for model, entries in self.deployments.items()}
+        return {model: [deployment.status() for deployment in entries] for model, entries in deployments.items()}
+
+
+def load_deployments(path=AZURE_OPENAI_DEPLOYMENTS, use_async=False):
+    """Build the configured deployments per logical model from a JSON file; without the file there are none.
+
+    Entries name an endpoint, the deployment, its quota and the environment variable holding the
+    API key: {"gpt-4o-mini": [{"name": "eastus", "endpoint": "https://...", "deployment": "gpt-4o-mini",
+    "tpm": 200000, "api_key_env": "AZURE_OPENAI_API_KEY_EASTUS"}]}
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+
+    client_for = get_async_client if use_async else get_client
+    return {
+        model: [
+            Deployment(
+                entry.get("name", entry["endpoint"]),
+                client_for(entry["endpoint"], os.getenv(entry.get("api_key_env", "AZURE_OPENAI_API_KEY"))).with_options(max_retries=0),
+                entry.get("deployment", model),
+                entry.get("tpm", AZURE_OPENAI_TPM),
+                # A deployment with its own TPM gets Azure's 6 RPM per 1000 TPM unless its RPM is listed too
+                entry.get("rpm", entry["tpm"] * 6 // 1000 if "tpm" in entry else AZURE_OPENAI_RPM)
+            )
+            for entry in entries
+        ]
+        for model, entries in config.items()
+    }
+
+
+@lru_cache(maxsize=4)
+def get_deployment_pool(default_client, use_async=False):
+    """Return the process-wide pool of the configured deployments around a default client"""
+    return DeploymentPool(default_client.with_options(max_retries=0), load_deployments(use_async=use_async))
+
+
+def _discard(future):
+    """Close a losing hedged stream so its connection is released"""
+    if not future.cancelled() and future.exception() is None and hasattr(future.result(), "close"):
+        closed = future.result().close()
+        if asyncio.iscoroutine(closed):
+            asyncio.ensure_future(closed)
+
+
+class LimitedChatClient:
+    """Chat client over a deployment pool: each request goes to the deployment expected to answer first,
+    waits for its quota, fails over or backs off on errors, and with hedge_after set races a slow
+    first attempt with a duplicate"""
+
+    def __init__(self, pool, max_retries=MODEL_MAX_RETRIES, hedge_after=0.0):
+        self.pool = pool if isinstance(pool, DeploymentPool) else DeploymentPool(pool)
+        self.max_retries = max_retries
+        self.hedge_after = hedge_after
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def hedged(self, hedge_after):
+        return type(self)(self.pool, self.max_retries, hedge_after)
+
+    def _backoff(self, error, attempt, model, deployment, tried):
+        """Count a failed attempt and return the wait before the next one.
+
+        Another healthy deployment is tried at once; the backoff applies when none is left, and
+        throttling pauses the throttled deployment rather than the caller.
+        """
+        delay = retry_delay(error, attempt, INTERACTIVE_BASE_DELAY, INTERACTIVE_MAX_DELAY)
+        increment("model_retries", reason=retry_reasons.get(type(error), "server"))
+        if isinstance(error, openai.RateLimitError):
+            deployment.limiter.pause(delay)
+            delay = 0.0
+        if any(other not in tried and other.healthy() for other in self.pool.for_model(model)):
+            print(f"🔀 {type(error).__name__} from {deployment.name}, failing over")
+            return 0.0
+        print(f"⏳ {type(error).__name__} from {deployment.name}, retrying in {delay:.1f}s")
+        return delay
+
+    def _backup(self, request, deployment, tokens):
+        """Pick the deployment for a hedged duplicate, or None when no quota is free right now"""
+        backup = self.pool.choose(request.get("model", ""), tokens, exclude=[deployment])
+        return backup if backup.limiter.reserve(tokens, block=False) is not None else None
+
+    def _hedge(self, request, deployment, tokens):
+        primary = _hedge_pool.submit(deployment.send, request)
+        if wait([primary], timeout=self.hedge_after).done:
+            return primary.result()
+        backup_deployment = self._backup(request, deployment, tokens)
+        if backup_deployment is None:
+            return primary.result()
+
+        backup = _hedge_pool.submit(backup_deployment.send, request)
+        pending = [primary, backup]
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner = next((future for future in done if future.exception() is None), None)
+            if winner is not None or not pending:
+                break
+        increment("model_hedged_requests", winner="hedge" if winner is backup else "primary" if winner else "none")
+        for future in (primary, backup):
+            if future is not winner:
+                future.add_done_callback(_discard)
+        return (winner or backup).result()
+
+    def create(self, **request):
+        """Same contract as client.chat.completions.create; model names the logical model"""
+        model = request.get("model", "")
+        tokens = estimate_tokens(request)
+        tried = []
+        for attempt in range(self.max_retries + 1):
+            deployment = self.pool.choose(model, tokens, exclude=tried)
+            time.sleep(deployment.limiter.reserve(tokens))
+            try:
+                if self.hedge_after:
+                    return self._hedge(request, deployment, tokens)
+                return deployment.send(request)
+            except retryable_errors as e:
+                if attempt == self.max_retries:
+                    raise
+                tried.append(deployment)
+                time.sleep(self._backoff(e, attempt, model, deployment, tried))
+
+
+class AsyncLimitedChatClient(LimitedChatClient):
+    """Async variant of LimitedChatClient; waits are awaited instead of blocking the event loop"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create_async))
+
+    async def _hedge_async(self, request, deployment, tokens):
+        primary = asyncio.ensure_future(deployment.send_async(request))
+        done, _ = await asyncio.wait([primary], timeout=self.hedge_after)
+        backup_deployment = None if done else self._backup(request, deployment, tokens)
+        if backup_deployment is None:
+            return await primary
+
+        backup = asyncio.ensure_future(backup_deployment.send_async(request))
+        pending = {primary, backup}
+        while True:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            winner = next((task for task in done if task.exception() is None), None)
+            if winner is not None or not pending:
+                break
+        increment("model_hedged_requests", winner="hedge" if winner is backup else "primary" if winner else "none")
+        for task in pending:
+            task.cancel()
+        for task in done - {winner}:
+            _discard(task)
+        return await (winner or backup)
+
+    async def create_async(self, **request):
+        model = request.get("model", "")
+        tokens = estimate_tokens(request)
+        tried = []
+        for attempt in range(self.max_retries + 1):
+            deployment = self.pool.choose(model, tokens, exclude=tried)
+            await asyncio.sleep(deployment.limiter.reserve(tokens))
+            try:
+                if self.hedge_after:
+                    return await self._hedge_async(request, deployment, tokens)
+                return await deployment.send_async(request)
+            except retryable_errors as e:
+                if attempt == self.max_retries:
+                    raise
+                tried.append(deployment)
+                await asyncio.sleep(self._backoff(e, attempt, model, deployment, tried))
+
+
+def hedged(client, hedge_after=HEDGE_AFTER_MS / 1000):
+    """Return a hedging view of a limited client for latency-critical requests; other clients are returned as is"""
+    if hedge_after and isinstance(client, LimitedChatClient):
+        return client.hedged(hedge_after)
+    return client
@@ -0,0 +1,99 @@
+import hashlib
+import os
+from functools import lru_cache
+
+from summarizer import iter_chunks
+from tracing import span
+
+# Location of the persistent Chroma index
+CHROMA_PATH = os.getenv("CHROMA_PATH", "chroma_db")
+# Token budget for one indexed chunk of the guide
+INDEX_CHUNK_TOKENS = 400
+# Chunks of a document read page by page are embedded and added this many at a time
+INDEX_BATCH_SIZE = 64
+# Number of chunks injected into each Q&A prompt
+DEFAULT_TOP_K = 4
+
+
+@lru_cache(maxsize=1)
+def get_chroma_client(path=CHROMA_PATH):
+    """Return the process-wide persistent Chroma client"""
+    # chromadb pulls in onnxruntime and its embedding model, so it is imported with the first guide
+    import chromadb
+
+    return chromadb.PersistentClient(path=path)
+
+
+def guide_id_for(text):
+    """Content hash used as the collection name, so the same guide is only embedded once"""
+    return f"guide-{hashlib.sha256(text.encode('utf-8')).hexdigest()[:32]}"
+
+
+def guide_id_for_document(document_key):
+    """Collection name of an uploaded document, from the hash of its file"""
+    return f"guide-{document_key[:32]}"
+
+
+def index_guide(text, model="gpt-4o-mini", chunk_tokens=INDEX_CHUNK_TOKENS):
+    """Chunk and embed a guide into its own collection, returning the guide id"""
+    return index_pages(guide_id_for(text), [text], model, chunk_tokens)
+
+
+def index_pages(guide_id, pages, model="gpt-4o-mini", chunk_tokens=INDEX_CHUNK_TOKENS):
+    """Chunk and embed a guide read page by page into its own collection, INDEX_BATCH_SIZE chunks at a time.
+
+    The collection is marked complete after the last batch; one without the mark is rebuilt.
+    """
+    chroma = get_chroma_client()
+    collection = chroma.get_or_create_collection(guide_id)
+
+    # Already indexed by a previous upload or session
+    if (collection.metadata or {}).get("complete"):
+        return guide_id
+    # Chunks left by a run that stopped partway are indexed again from the start
+    if collection.count() > 0:
+        chroma.delete_collection(guide_id)
+        collection = chroma.get_or_create_collection(guide_id)
+
+    position = 0
+    batch = []
+    for chunk in iter_chunks(pages, chunk_tokens, model):
+        batch.append(chunk)
+        if len(batch) == INDEX_BATCH_SIZE:
+            position = _add_chunks(collection, guide_id, position, batch)
+            batch = []
+    if batch:
+        position = _add_chunks(collection, guide_id, position, batch)
+    # Marks the collection as holding the whole guide
+    collection.modify(metadata={"complete": True})
+    print(f"🗂️ Indexed {position} chunks into {guide_id}")
+    return guide_id
+
+
+def _add_chunks(collection, guide_id, position, chunks):
+    """Embed and add chunks numbered from position, returning the position of the next chunk"""
+    positions = range(position, position + len(chunks))
+    collection.add(
+        ids=[f"{guide_id}-{i}" for i in positions],
+        documents=chunks,
+        metadatas=[{"position": i} for i in positions]
+    )
+    return position + len(chunks)
+
+
+def retrieve(guide_id, question, top_k=DEFAULT_TOP_K):
+    """Return the top_k guide chunks most relevant to a question, in document order"""
+    with span("retrieve", top_k=top_k) as retrieve_span:
+        collection = get_chroma_client().get_or_create_collection(guide_id)
+        count = collection.count()
+        if count == 0:
+            retrieve_span.set(chunks=0)
+            return []
+
+        results = collection.query(query_texts=[question], n_results=min(top_k, count))
+        hits = sorted(
+            zip(results["metadatas"][0], results["documents"][0]),
+            key=lambda hit: hit[0]["position"]
+        )
+        retrieve_span.set(chunks=len(hits))
+        return [document for _, document in hits]
@@ -0,0 +1,240 @@
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+
+from tracing import increment
+
+# Serve answers to near-identical standalone questions from memory; 0 turns the cache off
+SEMANTIC_CACHE = os.getenv("SEMANTIC_CACHE", "1") == "1"
+# Minimum cosine similarity between two questions to share an answer
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9"))
+# Least recently used answers are evicted beyond this many, across all guides
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2000"))
+# Answers older than this are treated as misses
+SEMANTIC_CACHE_TTL_SECONDS = int(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", str(24 * 3600)))
+# Opt-in share of hits answered again in the background to measure how far cached answers drift;
+# every audit is a paid completion, counted apart in the semantic_cache_audit token metrics
+SEMANTIC_CACHE_AUDIT_RATE = float(os.getenv("SEMANTIC_CACHE_AUDIT_RATE", "0"))
+# An audited answer whose fresh answer differs by more than this (1 - cosine similarity) is evicted
+DRIFT_EVICTION = 0.25
+# Scopes up to this size are searched exactly; larger ones through the LSH tables
+EXACT_SEARCH_LIMIT = 256
+# Random-hyperplane LSH: tables and bits per table
+LSH_TABLES = 8
+LSH_BITS = 8
+HASHED_DIMENSIONS = 1024
+
+
+def numbers_in(text):
+    """Numbers in a question; "step 2" and "step 3" embed almost identically but need different answers"""
+    return frozenset(re.findall(r"\d+", text))
+
+
+def hashed_embedding(text, dimensions=HASHED_DIMENSIONS):
+    """Embed text as hashed word and character trigram counts; a lexical stand-in without the embedding model"""
+    words = re.findall(r"\w+", text.lower())
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for word in words:
+        vector[zlib.crc32(word.encode("utf-8")) % dimensions] += 2.0
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            vector[zlib.crc32(padded[i:i + 3].encode("utf-8")) % dimensions] += 1.0
+    return vector
+
+
+@lru_cache(maxsize=1)
+def get_embedder():
+    """Return text -> vector using the MiniLM model that Chroma embeds guide chunks with"""
+    try:
+        from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
+
+        embedding_function = DefaultEmbeddingFunction()
+        return lambda text: np.asarray(embedding_function([text])[0], dtype=np.float32)
+    except Exception as e:
+        print(f"⚠️ Embedding model unavailable ({type(e).__name__}), comparing questions by hashed n-grams")
+        return hashed_embedding
+
+
+class CachedAnswer:
+    """One answered question in a scope"""
+
+    def __init__(self, entry_id, scope, question, vector, value):
+        self.entry_id = entry_id
+        self.scope = scope
+        self.question = question
+        self.vector = vector
+        self.numbers = numbers_in(question)
+        self.value = value
+        self.created_at = time.time()
+        self.hits = 0
+
+
+class _Scope:
+    """Answers for one guide, language and model, with LSH buckets over the question vectors"""
+
+    def __init__(self):
+        self.entries = {}
+        self.buckets = [{} for _ in range(LSH_TABLES)]
+
+    def candidates(self, signature):
+        if len(self.entries) <= EXACT_SEARCH_LIMIT:
+            return list(self.entries.values())
+        ids = set()
+        for table, bucket in zip(self.buckets, signature):
+            ids.update(table.get(bucket, ()))
+        return [self.entries[entry_id] for entry_id in ids]
+
+    def add(self, entry, signature):
+        self.entries[entry.entry_id] = entry
+        for table, bucket in zip(self.buckets, signature):
+            table.setdefault(bucket, set()).add(entry.entry_id)
+
+    def remove(self, entry_id, signature):
+        self.entries.pop(entry_id, None)
+        for table, bucket in zip(self.buckets, signature):
+            table.get(bucket, set()).discard(entry_id)
+
+
+class SemanticCache:
+    """In-memory cache of Q&A answers keyed by question meaning, scoped by guide, language and model.
+
+    Scopes derive from the guide's content, so a changed guide starts empty; invalidate() drops the
+    answers of a replaced guide at once. A sample of hits is re-asked in the background and compared
+    with the cached answer to track drift.
+    """
+
+    def __init__(self, embed=None, threshold=SEMANTIC_CACHE_THRESHOLD, max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+                 ttl_seconds=SEMANTIC_CACHE_TTL_SECONDS, audit_rate=SEMANTIC_CACHE_AUDIT_RATE):
+        self._embed = embed
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.audit_rate = audit_rate
+        self.hits = 0
+        self.misses = 0
+        self.audits = 0
+        self.drift_total = 0.0
+        self._scopes = {}
+        self._lru = OrderedDict()  # entry id -> entry, least recently used first
+        self._signatures = {}
+        self._hyperplanes = None
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def guide_key(guide_summary, guide_document="", guide_id=None):
+        """Identify a guide by its content: the indexed guide id or document, and the summary sent with every question"""
+        payload = f"{guide_id or guide_document}\0{guide_summary}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+    def embed(self, text):
+        """Return the unit-length embedding of a question"""
+        vector = (self._embed or get_embedder())(" ".join(text.split()))
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _signature(self, vector):
+        if self._hyperplanes is None:
+            rng = np.random.default_rng(0)
+            self._hyperplanes = rng.standard_normal((LSH_TABLES, LSH_BITS, len(vector))).astype(np.float32)
+        bits = (self._hyperplanes @ vector) > 0
+        return tuple(int(row.dot(1 << np.arange(LSH_BITS))) for row in bits)
+
+    def lookup(self, question, vector, scope):
+        """Return the cached answer of the most similar earlier question above the threshold, or None"""
+        now = time.time()
+        numbers = numbers_in(question)
+        with self._lock:
+            best, similarity = None, 0.0
+            answers = self._scopes.get(scope)
+            if answers is not None:
+                for entry in answers.candidates(self._signature(vector)):
+                    if now - entry.created_at > self.ttl_seconds:
+                        self._remove(entry, "ttl")
+                        continue
+                    score = float(entry.vector @ vector)
+                    if score > similarity and entry.numbers == numbers:
+                        best, similarity = entry, score
+
+            if best is None or similarity < self.threshold:
+                self.misses += 1
+                increment("semantic_cache_requests", result="miss")
+                return None
+            best.hits += 1
+            self._lru.move_to_end(best.entry_id)
+            self.hits += 1
+        increment("semantic_cache_requests", result="hit")
+        print(f"🧲 Semantic cache hit ({similarity:.3f}): {best.question[:60]}")
+        return best
+
+    def add(self, question, vector, value, scope):
+        """Store the answer content of a question, evicting the least recently used answers over the limit"""
+        with self._lock:
+            entry = CachedAnswer(self._next_id, scope, question, vector, value)
+            self._next_id += 1
+            signature = self._signature(vector)
+            self._signatures[entry.entry_id] = signature
+            self._scopes.setdefault(scope, _Scope()).add(entry, signature)
+            self._lru[entry.entry_id] = entry
+            while len(self._lru) > self.max_entries:
+                self._remove(next(iter(self._lru.values())), "lru")
+            return entry
+
+    def _remove(self, entry, reason):
+        if self._lru.pop(entry.entry_id, None) is None:
+            return
+        answers = self._scopes[entry.scope]
+        answers.remove(entry.entry_id, self._signatures.pop(entry.entry_id))
+        if not answers.entries:
+            del self._scopes[entry.scope]
+        increment("semantic_cache_evictions", reason=reason)
+
+    def invalidate(self, guide_key):
+        """Drop every answer about a guide, in all languages and models; returns how many were dropped"""
+        with self._lock:
+            entries = [entry for scope, answers in self._scopes.items() if scope[0] == guide_key for entry in list(answers.entries.values())]
+            for entry in entries:
+                self._remove(entry, "invalidated")
+        return len(entries)
+
+    def should_audit(self):
+        return random.random() < self.audit_rate
+
+    def record_drift(self, entry, cached_answer, fresh_answer):
+        """Compare a cached answer with a fresh one for the same question; evict it when they drifted apart"""
+        drift = max(0.0, 1.0 - float(self.embed(cached_answer) @ self.embed(fresh_answer)))
+        with self._lock:
+            self.audits += 1
+            self.drift_total += drift
+            if drift > DRIFT_EVICTION:
+                self._remove(entry, "drift")
+        increment("semantic_cache_audits")
+        increment("semantic_cache_drift", drift)
+        return drift
+
+    def stats(self):
+        """Return hit/miss counters, entries and the mean drift of audited hits"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": len(self._lru),
+                "audits": self.audits,
+                "mean_drift": self.drift_total / self.audits if self.audits else 0.0
+            }
+
+
+@lru_cache(maxsize=1)
+def get_semantic_cache():
+    """Return the process-wide semantic answer cache, or None when SEMANTIC_CACHE=0"""
+    return SemanticCache() if SEMANTIC_CACHE else None
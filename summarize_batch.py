@@ -0,0 +1,169 @@
+"""
+Summarize a directory of user guides from the command line
+
+Results are appended to a JSONL file, one record per guide with its latency and token usage.
+Guides already summarized with the same content and settings are skipped, so an interrupted run
+resumes where it stopped.
+
+Usage:
+    python summarize_batch.py docs/                         # every .txt/.md under docs/
+    python summarize_batch.py "docs/**/*.md" -o out.jsonl   # glob
+    python summarize_batch.py docs/ --language Spanish --style detailed --workers 8
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from types import SimpleNamespace
+
+from dotenv import load_dotenv
+
+from azure_client import get_client, usage_scope
+from rate_limit import retry_delay, retryable_errors
+from summarizer import generate_summary, language_instructions, style_prompts
+
+# Extensions picked up when a directory is given
+GUIDE_EXTENSIONS = (".txt", ".md")
+# Attempts of one model request before its guide is recorded as failed
+MAX_ATTEMPTS = 6
+
+
+def find_guides(pattern):
+    """Return the guide files of a directory (recursively) or a glob pattern, sorted"""
+    if os.path.isdir(pattern):
+        paths = (
+            os.path.join(root, name)
+            for root, _, names in os.walk(pattern)
+            for name in names
+            if name.lower().endswith(GUIDE_EXTENSIONS)
+        )
+    else:
+        paths = glob.glob(pattern, recursive=True)
+    return sorted(path for path in paths if os.path.isfile(path))
+
+
+def job_key(text, settings):
+    """Identify a guide's content together with the summary settings"""
+    payload = json.dumps(settings, sort_keys=True) + "\0" + text
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def load_completed(output_path):
+    """Return the job keys already summarized successfully in an earlier run"""
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # A run killed mid-write leaves a partial last line
+            if record.get("status") == "ok":
+                completed.add(record["key"])
+    return completed
+
+
+class RetryingClient:
+    """Retries each model request on its own, so a throttled chunk of a large guide does not redo the chunks that succeeded"""
+
+    def __init__(self, client, label):
+        self.client = client
+        self.label = label
+        self.retries = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **request):
+        for attempt in range(MAX_ATTEMPTS):
+            try:
+                return self.client.chat.completions.create(**request)
+            except retryable_errors as e:
+                if attempt == MAX_ATTEMPTS - 1:
+                    raise
+                delay = retry_delay(e, attempt)
+                self.retries += 1
+                print(f"⏳ {self.label}: {type(e).__name__}, retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+
+def summarize_file(client, path, text, settings, chunk_workers):
+    """Summarize one guide, retrying each request with backoff, and return its JSONL record"""
+    start = time.perf_counter()
+    record = {"path": path, "key": job_key(text, settings), **settings}
+    retrying_client = RetryingClient(client, path)
+    with usage_scope() as usage:
+        try:
+            record["summary"] = generate_summary(
+                retrying_client, text, settings["style"], settings["max_tokens"], settings["temperature"],
+                settings["language"], settings["model"], max_workers=chunk_workers
+            )
+            record["status"] = "ok"
+        except Exception as e:
+            record["status"], record["error"] = "error", str(e)
+    record["retries"] = retrying_client.retries
+    record["latency_seconds"] = round(time.perf_counter() - start, 3)
+    record.update(usage)
+    record["finished_at"] = datetime.now().isoformat()
+    return record
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="Directory of .txt/.md guides or a glob pattern")
+    parser.add_argument("-o", "--output", default="summaries.jsonl", help="JSONL file results are appended to")
+    parser.add_argument("--language", default="English", choices=list(language_instructions))
+    parser.add_argument("--style", default="concise", choices=list(style_prompts))
+    parser.add_argument("--model", default="gpt-4o-mini")
+    parser.add_argument("--max-tokens", type=int, default=300)
+    parser.add_argument("--temperature", type=float, default=0.3)
+    parser.add_argument("--workers", type=int, default=4, help="Guides summarized concurrently")
+    parser.add_argument("--chunk-workers", type=int, default=2, help="Concurrent chunk requests per large guide")
+    args = parser.parse_args()
+
+    load_dotenv()
+    api_key = os.getenv("AZURE_OPENAI_API_KEY")
+    endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
+    if not api_key or not endpoint:
+        print("❌ Azure OpenAI credentials not found. Set AZURE_OPENAI_API_KEY and AZURE_OPENAI_ENDPOINT")
+        sys.exit(1)
+    # Retries are handled here, so rate limits back off per request with the batch delays instead of inside the SDK
+    client = get_client(endpoint, api_key).with_options(max_retries=0)
+
+    settings = {
+        "language": args.language, "style": args.style, "model": args.model,
+        "max_tokens": args.max_tokens, "temperature": args.temperature
+    }
+    completed = load_completed(args.output)
+    jobs = []
+    for path in find_guides(args.source):
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+        if text.strip() and job_key(text, settings) not in completed:
+            jobs.append((path, text))
+    print(f"📚 {len(jobs)} guides to summarize ({len(completed)} already done), {args.workers} workers")
+
+    failed = 0
+    with open(args.output, "a", encoding="utf-8") as output, ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = [executor.submit(summarize_file, client, path, text, settings, args.chunk_workers) for path, text in jobs]
+        for future in as_completed(futures):
+            record = future.result()
+            failed += record["status"] != "ok"
+            # Flushed per guide so a restart resumes after the last finished one
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+            icon = "✅" if record["status"] == "ok" else "❌"
+            print(f"{icon} {record['path']}: {record['latency_seconds']:.1f}s, "
+                  f"{record['prompt_tokens']} prompt / {record['completion_tokens']} completion tokens")
+
+    print(f"🏁 {len(jobs) - failed} summarized, {failed} failed → {args.output}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
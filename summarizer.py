@@ -0,0 +1,465 @@
+import asyncio
+import contextvars
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from functools import lru_cache
+
+import tiktoken
+
+from azure_client import record_usage
+from response_cache import ResponseCache, get_response_cache
+from tracing import span
+
+# Language-specific instructions
+language_instructions = {
+    "English": "",
+    "Spanish": "Respond in Spanish.",
+    "French": "Respond in French.",
+    "German": "Respond in German.",
+    "Italian": "Respond in Italian.",
+    "Portuguese": "Respond in Portuguese.",
+    "Japanese": "Respond in Japanese.",
+    "Chinese (Simplified)": "Respond in Simplified Chinese.",
+    "Korean": "Respond in Korean.",
+    "Arabic": "Respond in Arabic."
+}
+
+# Customize prompt based on style
+style_prompts = {
+    "concise": "Summarize the following user guide documentation into concise bullet points covering key features, instructions, and important information:",
+    "detailed": "Provide a detailed summary of the following user guide documentation, including all major sections, procedures, and important details:",
+    "action-focused": "Extract and organize the key procedures, step-by-step instructions, and important guidelines from the following user guide documentation:"
+}
+
+# Prompts used by the map-reduce mode for documents larger than one chunk
+map_prompt = "Summarize the following section (part {index} of {total}) of a user guide. Keep every feature, procedure, setting, warning and error message it mentions:"
+# Pages of an uploaded document are chunked while they are read, so the number of parts is not known up front
+streamed_map_prompt = "Summarize the following section (part {index}) of a user guide. Keep every feature, procedure, setting, warning and error message it mentions:"
+merge_prompt = "Merge the following partial summaries of consecutive parts of the same user guide into a single summary. Remove duplicates and keep the original order:"
+
+# Token budget for one chunk of the source document
+DEFAULT_CHUNK_TOKENS = 6000
+# Number of chunk summaries requested concurrently
+DEFAULT_MAX_WORKERS = 4
+# Token budget for the partial summaries merged in a single reduce call
+MERGE_INPUT_TOKENS = 8000
+
+
+class ApproximateEncoding:
+    """Word-level stand-in for tiktoken on machines that cannot download its BPE files"""
+
+    _pattern = re.compile(r"\s*\w+|\s*[^\w\s]|\s+")
+
+    def encode(self, text):
+        return self._pattern.findall(text)
+
+    def decode(self, tokens):
+        return "".join(tokens)
+
+
+@lru_cache(maxsize=8)
+def get_encoding(model="gpt-4o-mini"):
+    """Return the tiktoken encoding for a model, falling back to cl100k_base for unknown deployments"""
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # Offline: token counts become estimates, which is enough for budgeting and benchmarks
+        print(f"⚠️ tiktoken encoding unavailable ({type(e).__name__}), estimating tokens per word")
+        return ApproximateEncoding()
+
+
+def count_tokens(text, model="gpt-4o-mini"):
+    """Count the tokens of a text for the given model"""
+    return len(get_encoding(model).encode(text))
+
+
+def truncate_tokens(text, max_tokens, model="gpt-4o-mini", keep_end=False):
+    """Cut a text down to max_tokens, keeping its start (or its end with keep_end)"""
+    if max_tokens <= 0:
+        return ""
+    encoding = get_encoding(model)
+    tokens = encoding.encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[-max_tokens:] if keep_end else tokens[:max_tokens])
+
+
+def iter_chunks(texts, max_tokens=DEFAULT_CHUNK_TOKENS, model="gpt-4o-mini"):
+    """Yield chunks of at most max_tokens from a stream of texts, such as the pages of a document, preferring paragraph boundaries.
+
+    Only the chunk being filled is held in memory, so a document can be chunked while it is read.
+    """
+    encoding = get_encoding(model)
+    current = []
+    current_tokens = 0
+
+    for text in texts:
+        for paragraph in re.split(r"\n\s*\n", text):
+            if not paragraph.strip():
+                continue
+            tokens = encoding.encode(paragraph)
+
+            # A single oversized paragraph is cut on token boundaries
+            if len(tokens) > max_tokens:
+                if current:
+                    yield "\n\n".join(current)
+                    current, current_tokens = [], 0
+                for start in range(0, len(tokens), max_tokens):
+                    yield encoding.decode(tokens[start:start + max_tokens])
+                continue
+
+            if current and current_tokens + len(tokens) > max_tokens:
+                yield "\n\n".join(current)
+                current, current_tokens = [], 0
+            current.append(paragraph)
+            current_tokens += len(tokens)
+
+    if current:
+        yield "\n\n".join(current)
+
+
+def split_into_chunks(text, max_tokens=DEFAULT_CHUNK_TOKENS, model="gpt-4o-mini"):
+    """Split a document into chunks of at most max_tokens, preferring paragraph boundaries"""
+    return list(iter_chunks([text], max_tokens, model))
+
+
+def build_summary_prompt(text, summary_style="concise", language="English"):
+    """Build the single-call summary prompt for a style and output language"""
+    base_prompt = style_prompts.get(summary_style, style_prompts['concise'])
+    language_instruction = language_instructions.get(language, "")
+
+    if language_instruction:
+        return f"{base_prompt} {language_instruction}\n\n{text}"
+    return f"{base_prompt}\n\n{text}"
+
+
+def _complete(client, prompt, max_tokens, temperature, model):
+    with span("completion", purpose="summary", model=model):
+        response = client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=max_tokens,
+            temperature=temperature
+        )
+        record_usage(response.usage)
+    return response.choices[0].message.content
+
+
+def _complete_stream(client, prompt, max_tokens, temperature, model):
+    """Yield completion text deltas as they arrive"""
+    # Not made current: the caller runs between the yields below
+    with span("completion", activate=False, purpose="summary", model=model, stream=True) as completion_span:
+        response = client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        for chunk in response:
+            # The last chunk carries the usage and no choices
+            if chunk.usage:
+                record_usage(chunk.usage, completion_span)
+            # Azure sends content-filter chunks without choices
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+def _group_by_tokens(texts, max_tokens, model):
+    """Group consecutive texts so that each group stays within max_tokens"""
+    groups = []
+    current = []
+    current_tokens = 0
+    for text in texts:
+        tokens = count_tokens(text, model)
+        if current and current_tokens + tokens > max_tokens:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+def _next_groups(partials, groups, model):
+    """Group merged summaries for the next reduce level"""
+    new_groups = _group_by_tokens(partials, MERGE_INPUT_TOKENS, model)
+    # Merged summaries that still do not shrink into fewer groups are paired up to guarantee progress
+    if len(new_groups) >= len(groups):
+        new_groups = [partials[i:i + 2] for i in range(0, len(partials), 2)]
+    return new_groups
+
+
+def _final_merge_prompt(group, summary_style, language):
+    """Final merge applies the requested style and language"""
+    final_input = "\n\n---\n\n".join(group)
+    return f"{merge_prompt}\n{build_summary_prompt(final_input, summary_style, language)}"
+
+
+def _with_context(function):
+    """Wrap a function so worker threads run it with the caller's context variables, such as the usage scope"""
+    context = contextvars.copy_context()
+    return lambda *args: context.copy().run(function, *args)
+
+
+def build_chunked_prompt(client, text, summary_style="concise", max_tokens=300, temperature=0.3, language="English", model="gpt-4o-mini", chunk_tokens=DEFAULT_CHUNK_TOKENS, max_workers=DEFAULT_MAX_WORKERS):
+    """Map-reduce the chunks of a large document down to the prompt of the final merge call"""
+    chunks = split_into_chunks(text, chunk_tokens, model)
+    print(f"📚 Map-reduce summary: {len(chunks)} chunks, {max_workers} workers")
+
+    # Intermediate summaries get a larger budget than the final one so details survive the merge
+    partial_tokens = max(max_tokens, 500)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Map: one summary per chunk
+        partials = list(executor.map(
+            _with_context(lambda item: _complete(
+                client,
+                f"{map_prompt.format(index=item[0] + 1, total=len(chunks))}\n\n{item[1]}",
+                partial_tokens, temperature, model
+            )),
+            enumerate(chunks)
+        ))
+
+        groups = _reduce(client, executor, partials, partial_tokens, temperature, model)
+
+    return _final_merge_prompt(groups[0], summary_style, language)
+
+
+def _reduce(client, executor, partials, partial_tokens, temperature, model):
+    """Merge groups of partial summaries until a single group is left"""
+    groups = _group_by_tokens(partials, MERGE_INPUT_TOKENS, model)
+    while len(groups) > 1:
+        partials = list(executor.map(
+            _with_context(lambda group: _complete(
+                client,
+                f"{merge_prompt}\n\n" + "\n\n---\n\n".join(group),
+                partial_tokens, temperature, model
+            )),
+            groups
+        ))
+        groups = _next_groups(partials, groups, model)
+    return groups
+
+
+def build_document_prompt(client, pages, summary_style="concise", max_tokens=300, temperature=0.3, language="English", model="gpt-4o-mini", chunk_tokens=DEFAULT_CHUNK_TOKENS, max_workers=DEFAULT_MAX_WORKERS):
+    """Map-reduce a document read page by page down to the prompt of the final call, or None when it has no text.
+
+    Chunks are summarized as the pages are read, with at most two chunks per worker waiting, so memory stays
+    bounded by the chunk size and the partial summaries rather than the document. A document of one chunk
+    gets the single-call prompt.
+    """
+    chunks = iter_chunks(pages, chunk_tokens, model)
+    first = next(chunks, None)
+    if first is None:
+        return None
+    second = next(chunks, None)
+    if second is None:
+        return build_summary_prompt(first, summary_style, language)
+
+    partial_tokens = max(max_tokens, 500)
+    summarize_part = _with_context(lambda index, chunk: _complete(
+        client, f"{streamed_map_prompt.format(index=index)}\n\n{chunk}", partial_tokens, temperature, model
+    ))
+    partials = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Map: reading the next chunk waits while 2 * max_workers are in flight
+        pending = deque()
+        for index, chunk in enumerate(chain([first, second], chunks), start=1):
+            if len(pending) >= 2 * max_workers:
+                partials.append(pending.popleft().result())
+            pending.append(executor.submit(summarize_part, index, chunk))
+        partials.extend(future.result() for future in pending)
+        print(f"📚 Map-reduce summary: {len(partials)} chunks read as a stream, {max_workers} workers")
+
+        groups = _reduce(client, executor, partials, partial_tokens, temperature, model)
+
+    return _final_merge_prompt(groups[0], summary_style, language)
+
+
+def summarize_chunked(client, text, summary_style="concise", max_tokens=300, temperature=0.3, language="English", model="gpt-4o-mini", chunk_tokens=DEFAULT_CHUNK_TOKENS, max_workers=DEFAULT_MAX_WORKERS):
+    """Map-reduce summary: summarize chunks concurrently, then merge partial summaries level by level"""
+    prompt = build_chunked_prompt(client, text, summary_style, max_tokens, temperature, language, model, chunk_tokens, max_workers)
+    return _complete(client, prompt, max_tokens, temperature, model)
+
+
+def summary_cache_key(text, summary_style, max_tokens, temperature, language, model, chunk_tokens):
+    """Cache key of a summary; batch jobs use it as the request id so results land in the same cache"""
+    return ResponseCache.make_key(
+        "summary", model=model, summary_style=summary_style, language=language,
+        max_tokens=max_tokens, temperature=temperature, chunk_tokens=chunk_tokens, text=text
+    )
+
+
+def document_summary_key(document_key, summary_style, max_tokens, temperature, language, model, chunk_tokens):
+    """Cache key of an uploaded document's summary, identified by the hash of the file instead of its text"""
+    return ResponseCache.make_key(
+        "summary", model=model, summary_style=summary_style, language=language,
+        max_tokens=max_tokens, temperature=temperature, chunk_tokens=chunk_tokens, document=document_key
+    )
+
+
+def _stream_through_cache(client, cache_key, build_prompt, max_tokens, temperature, model, use_cache):
+    """Yield a cached summary, or stream the final call of build_prompt() and cache it; None means no content"""
+    cache = get_response_cache() if use_cache else None
+    if cache is not None:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+    prompt = build_prompt()
+    if prompt is None:
+        yield "⚠️ No content to summarize. Please provide a user guide document."
+        return
+
+    parts = []
+    for delta in _complete_stream(client, prompt, max_tokens, temperature, model):
+        parts.append(delta)
+        yield delta
+
+    if cache is not None:
+        cache.set(cache_key, "".join(parts))
+
+
+def _summarize_stream(client, text, summary_style, max_tokens, temperature, language, model, chunk_tokens, max_workers, use_cache):
+    """Yield the summary as it is generated; only the final call of a map-reduce summary is streamed"""
+    try:
+        if not text.strip():
+            yield "⚠️ No content to summarize. Please provide a user guide document."
+            return
+
+        def build_prompt():
+            if count_tokens(text, model) > chunk_tokens:
+                return build_chunked_prompt(client, text, summary_style, max_tokens, temperature, language, model, chunk_tokens, max_workers)
+            return build_summary_prompt(text, summary_style, language)
+
+        cache_key = summary_cache_key(text, summary_style, max_tokens, temperature, language, model, chunk_tokens)
+        yield from _stream_through_cache(client, cache_key, build_prompt, max_tokens, temperature, model, use_cache)
+
+    except Exception as e:
+        yield f"❌ Error generating summary: {str(e)}"
+
+
+def summarize_document(client, pages, document_key, summary_style="concise", max_tokens=300, temperature=0.3, language="English", model="gpt-4o-mini", chunk_tokens=DEFAULT_CHUNK_TOKENS, max_workers=DEFAULT_MAX_WORKERS, use_cache=True):
+    """Stream the summary of a document read page by page; document_key (a hash of the file) is its cache identity"""
+    try:
+        cache_key = document_summary_key(document_key, summary_style, max_tokens, temperature, language, model, chunk_tokens)
+
+        def build_prompt():
+            return build_document_prompt(client, pages, summary_style, max_tokens, temperature, language, model, chunk_tokens, max_workers)
+
+        yield from _stream_through_cache(client, cache_key, build_prompt, max_tokens, temperature, model, use_cache)
+
+    except Exception as e:
+        yield f"❌ Error generating summary: {str(e)}"
+
+
+def generate_summary(client, text, summary_style="concise", max_tokens=300, temperature=0.3, language="English", model="gpt-4o-mini", chunk_tokens=DEFAULT_CHUNK_TOKENS, max_workers=DEFAULT_MAX_WORKERS, use_cache=True):
+    """Summarize a guide through the cache, raising API errors so callers such as the batch CLI can retry"""
+    cache = get_response_cache() if use_cache else None
+    cache_key = summary_cache_key(text, summary_style, max_tokens, temperature, language, model, chunk_tokens)
+    if cache is not None:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    # Documents larger than one chunk go through the map-reduce path
+    if count_tokens(text, model) > chunk_tokens:
+        summary = summarize_chunked(client, text, summary_style, max_tokens, temperature, language, model, chunk_tokens, max_workers)
+    else:
+        prompt = build_summary_prompt(text, summary_style, language)
+        summary = _complete(client, prompt, max_tokens, temperature, model)
+
+    if cache is not None:
+        cache.set(cache_key, summary)
+    return summary
+
+
+def summarize_user_guide(client, text, summary_style="concise", max_tokens=300, temperature=0.3, language="English", model="gpt-4o-mini", chunk_tokens=DEFAULT_CHUNK_TOKENS, max_workers=DEFAULT_MAX_WORKERS, use_cache=True, stream=False):
+    """Generate user guide summary using Azure OpenAI; with stream=True, return a generator of text deltas"""
+    if stream:
+        return _summarize_stream(client, text, summary_style, max_tokens, temperature, language, model, chunk_tokens, max_workers, use_cache)
+
+    try:
+        if not text.strip():
+            return "⚠️ No content to summarize. Please provide a user guide document."
+
+        return generate_summary(client, text, summary_style, max_tokens, temperature, language, model, chunk_tokens, max_workers, use_cache)
+
+    except Exception as e:
+        return f"❌ Error generating summary: {str(e)}"
+
+
+async def _complete_async(async_client, prompt, max_tokens, temperature, model):
+    with span("completion", purpose="summary", model=model):
+        response = await async_client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=max_tokens,
+            temperature=temperature
+        )
+        record_usage(response.usage)
+    return response.choices[0].message.content
+
+
+async def build_chunked_prompt_async(async_client, text, summary_style="concise", max_tokens=300, temperature=0.3, language="English", model="gpt-4o-mini", chunk_tokens=DEFAULT_CHUNK_TOKENS, max_workers=DEFAULT_MAX_WORKERS):
+    """Async map-reduce of a large document, with at most max_workers requests in flight"""
+    chunks = split_into_chunks(text, chunk_tokens, model)
+    print(f"📚 Map-reduce summary: {len(chunks)} chunks, {max_workers} workers")
+
+    partial_tokens = max(max_tokens, 500)
+    semaphore = asyncio.Semaphore(max_workers)
+
+    async def complete(prompt):
+        async with semaphore:
+            return await _complete_async(async_client, prompt, partial_tokens, temperature, model)
+
+    partials = await asyncio.gather(*(
+        complete(f"{map_prompt.format(index=index + 1, total=len(chunks))}\n\n{chunk}")
+        for index, chunk in enumerate(chunks)
+    ))
+
+    groups = _group_by_tokens(partials, MERGE_INPUT_TOKENS, model)
+    while len(groups) > 1:
+        partials = await asyncio.gather(*(
+            complete(f"{merge_prompt}\n\n" + "\n\n---\n\n".join(group))
+            for group in groups
+        ))
+        groups = _next_groups(partials, groups, model)
+
+    return _final_merge_prompt(groups[0], summary_style, language)
+
+
+async def summarize_user_guide_async(async_client, text, summary_style="concise", max_tokens=300, temperature=0.3, language="English", model="gpt-4o-mini", chunk_tokens=DEFAULT_CHUNK_TOKENS, max_workers=DEFAULT_MAX_WORKERS, use_cache=True):
+    """Async variant of summarize_user_guide for an AsyncAzureOpenAI client"""
+    try:
+        if not text.strip():
+            return "⚠️ No content to summarize. Please provide a user guide document."
+
+        cache = get_response_cache() if use_cache else None
+        cache_key = summary_cache_key(text, summary_style, max_tokens, temperature, language, model, chunk_tokens)
+        if cache is not None:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        if count_tokens(text, model) > chunk_tokens:
+            prompt = await build_chunked_prompt_async(async_client, text, summary_style, max_tokens, temperature, language, model, chunk_tokens, max_workers)
+        else:
+            prompt = build_summary_prompt(text, summary_style, language)
+        summary = await _complete_async(async_client, prompt, max_tokens, temperature, model)
+
+        if cache is not None:
+            cache.set(cache_key, summary)
+        return summary
+
+    except Exception as e:
+        return f"❌ Error generating summary: {str(e)}"
@@ -0,0 +1,117 @@
+import json
+import time
+
+import numpy as np
+import pytest
+from starlette.testclient import TestClient
+
+import api
+import assistant
+import summarizer
+from api_client import AssistantAPIClient
+from assistant import Session
+from fake_client import FakeChatClient, FakeResponse
+from response_cache import ResponseCache
+from semantic_cache import SemanticCache, hashed_embedding
+from ticket_store import TicketStore
+
+sample_summary = "Guide Summary:\n- Notification preferences are configured under Settings"
+
+
+@pytest.fixture
+def fake(tmp_path, monkeypatch):
+    """The API with a fake model backend, an empty response cache and ticket store"""
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"))
+    tickets = TicketStore(str(tmp_path / "tickets.sqlite3"))
+    monkeypatch.setattr(assistant, "get_ticket_store", lambda: tickets)
+    monkeypatch.setattr(api, "get_ticket_store", lambda: tickets)
+    semantic_cache = SemanticCache(embed=hashed_embedding, audit_rate=0)
+    monkeypatch.setattr(assistant, "get_semantic_cache", lambda: semantic_cache)
+    monkeypatch.setattr(assistant, "get_response_cache", lambda: cache)
+    monkeypatch.setattr(summarizer, "get_response_cache", lambda: cache)
+    client = FakeChatClient()
+    monkeypatch.setattr(api, "get_api_model_client", lambda: client)
+    return client
+
+
+def test_streamed_ask_returns_state(fake):
+    """The answer streams as NDJSON deltas; the final event carries the state for the next question"""
+    http = TestClient(api.app)
+    question = "How do I change my notifications?"
+    response = http.post("/v1/ask", json={
+        "question": question,
+        "guide_summary": sample_summary,
+        "stream": True,
+        "session": {"chat_history": [{"role": "user", "content": question}], "previous_question": "How do I sign in?"}
+    })
+
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    events = [json.loads(line) for line in response.text.splitlines()]
+    final = events[-1]
+    assert len(events) > 2
+    assert "".join(event["delta"] for event in events[:-1]) == final["answer"]
+    assert final["language"] == "English"
+    assert final["session"]["previous_question"] == question
+
+    assert http.post("/v1/ask", json={"question": " "}).status_code == 400
+
+
+def test_thin_client_keeps_session_in_sync(fake):
+    """Through the API client, a tool call's ticket and the previous question land in the caller's session"""
+    fake.responder = lambda messages, **kwargs: FakeResponse(
+        tool_name="create_support_ticket",
+        tool_arguments={"name": "Ada", "email": "ada@example.com", "issue_description": "Cannot sign in"}
+    )
+    remote = AssistantAPIClient(http=TestClient(api.app))
+    session = Session(chat_history=[{"role": "user", "content": "Please open a ticket, I am Ada, ada@example.com"}])
+
+    answer_stream = remote.ask("Please open a ticket, I am Ada, ada@example.com", sample_summary, session=session)
+    "".join(answer_stream)
+    answer, _, tool_call = answer_stream.result
+
+    assert "has been created successfully" in answer
+    assert tool_call["function_called"] == "create_support_ticket"
+    assert session.support_tickets[-1]["email"] == "ada@example.com"
+    assert session.previous_question.startswith("Please open a ticket")
+    page, total = remote.tickets()
+    assert total == 1 and page[0]["id"] == session.support_tickets[-1]["id"]
+
+    http = TestClient(api.app)
+    assert http.get("/v1/tickets", params={"limit": "ten"}).status_code == 400
+    assert http.get("/v1/tickets", params={"offset": "-1"}).status_code == 400
+
+
+def test_streamed_speech_is_sent_encoded(fake, monkeypatch):
+    """Each spoken sentence travels as a compressed audio file and is decoded back into a waveform by the client"""
+    sentence = (0.3 * np.sin(np.arange(16000) / 10)).astype(np.float32)
+    monkeypatch.setattr(api, "speak_stream", lambda text, lang: iter([(sentence, 16000), (sentence, 16000)]))
+    http = TestClient(api.app)
+
+    events = [json.loads(line) for line in http.post("/v1/tts", json={"text": "Hello. Bye.", "lang": "eng", "stream": True}).text.splitlines()]
+    assert [event["format"] for event in events] == ["ogg", "ogg"]
+    assert all(len(event["audio"]) < sentence.nbytes / 4 for event in events)
+
+    stream = AssistantAPIClient(http=http).speak_stream("Hello. Bye.")
+    deadline = time.time() + 10
+    while not stream.done and time.time() < deadline:
+        time.sleep(0.01)
+    assert stream.error is None and stream.sampling_rate == 16000
+    assert [len(segment) for segment in stream.segments] == [len(sentence)] * 2
+
+
+@pytest.mark.parametrize("path, body", [
+    ("/v1/summarize", b"not json"),
+    ("/v1/summarize", [1, 2]),
+    ("/v1/summarize", {"text": 5}),
+    ("/v1/summarize", {"text": "Guide", "max_tokens": "many"}),
+    ("/v1/guides", {"text": ["a"]}),
+    ("/v1/ask", {"question": "Hi?", "session": "state"}),
+    ("/v1/ask", {"question": "Hi?", "session": {"chat_history": [{"role": "user", "content": 1}]}}),
+    ("/v1/tts", {"text": "Hello", "lang": 3}),
+    ("/v1/tickets", {"name": "Ada", "email": "ada@example.com", "question": {"text": "Help"}})
+])
+def test_malformed_bodies_are_rejected(fake, path, body):
+    http = TestClient(api.app)
+    response = http.post(path, content=body) if isinstance(body, bytes) else http.post(path, json=body)
+    assert response.status_code == 400 and response.json()["error"]
+    assert fake.requests == []
@@ -1,296 +1,179 @@
-"""
-Test cases for Meeting Notes Automation App
-Based on the requirements provided
-"""
-
-import os
-import sys
-from dotenv import load_dotenv
-
-# Add the current directory to the path for imports
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-
-# Import the functions from our app
-try:
-    from app import initialize_client, summarize_meeting, answer_question, answer_question_auto_lang, detect_question_language
-    load_dotenv()
-except ImportError as e:
-    print(f"Error importing modules: {e}")
-    sys.exit(1)
-
-def test_case_01():
-    """TC_01: Summarize a short meeting transcript → concise notes produced"""
-    print("\n🧪 Test Case 01: Short meeting transcript")
-    
-    short_transcript = """
-    Meeting: Quick standup
-    Alice: Good morning team. What did everyone work on yesterday?
-    Bob: I completed the API integration.
-    Carol: I finished the UI mockups.
-    Alice: Great! Any blockers for today?
-    Bob: None from me.
-    Carol: All good here too.
-    Alice: Perfect, let's reconvene tomorrow.
-    """
-    
-    client = initialize_client()
-    if client:
-        result = summarize_meeting(client, short_transcript, "concise", 150, 0.3)
-        print(f"✅ Result: {result}")
-        return "✅ PASS" if len(result) > 10 and "❌" not in result else "❌ FAIL"
-    else:
-        return "❌ FAIL - Client initialization failed"
-
-def test_case_02():
-    """TC_02: Summarize a long transcript with multiple topics → clear sectioned notes"""
-    print("\n🧪 Test Case 02: Long transcript with multiple topics")
-    
-    long_transcript = """
-    Meeting: Quarterly Review
-    
-    Alice: Welcome to our Q3 review. Let's start with the engineering team update.
-    Bob: We completed 85% of our planned features. The main achievements were the new API endpoints and improved performance.
-    Carol: From the design side, we delivered all mockups on time and got great user feedback.
-    
-    Alice: Now let's discuss Q4 planning.
-    Bob: We need to focus on scalability and security improvements.
-    Carol: I suggest we also prioritize user experience enhancements.
-    
-    Alice: Budget discussion - we're on track but need to allocate more for cloud infrastructure.
-    Bob: Agreed, we'll need at least 20% more for the expected traffic growth.
-    
-    Alice: Action items - Bob will prepare the infrastructure proposal, Carol will research UX tools.
-    """
-    
-    client = initialize_client()
-    if client:
-        result = summarize_meeting(client, long_transcript, "detailed", 400, 0.3)
-        print(f"✅ Result: {result}")
-        return "✅ PASS" if len(result) > 50 and "❌" not in result else "❌ FAIL"
-    else:
-        return "❌ FAIL - Client initialization failed"
-
-def test_case_03():
-    """TC_03: Empty input text → returns helpful error or prompt to retry"""
-    print("\n🧪 Test Case 03: Empty input handling")
-    
-    empty_transcript = ""
-    
-    client = initialize_client()
-    if client:
-        result = summarize_meeting(client, empty_transcript, "concise", 150, 0.3)
-        print(f"✅ Result: {result}")
-        return "✅ PASS" if "No content" in result or "⚠️" in result else "❌ FAIL"
-    else:
-        return "❌ FAIL - Client initialization failed"
-
-def test_case_04():
-    """TC_04: Invalid API key → handle authentication error"""
-    print("\n🧪 Test Case 04: Invalid API key handling")
-    
-    # Temporarily modify environment variables to simulate invalid credentials
-    original_key = os.getenv("AZURE_OPENAI_API_KEY")
-    os.environ["AZURE_OPENAI_API_KEY"] = "invalid_key_test"
-    
-    client = initialize_client()
-    
-    # Restore original key
-    if original_key:
-        os.environ["AZURE_OPENAI_API_KEY"] = original_key
-    
-    if client is None:
-        print("✅ Result: Client initialization failed gracefully")
-        return "✅ PASS"
-    else:
-        # If client was created, try to use it and expect an error
-        test_transcript = "Test meeting content"
-        result = summarize_meeting(client, test_transcript, "concise", 150, 0.3)
-        print(f"✅ Result: {result}")
-        return "✅ PASS" if "❌" in result or "Error" in result else "❌ FAIL"
-
-def test_case_05():
-    """TC_05: Chatbot Q&A functionality → answers questions about meeting summary"""
-    print("\n🧪 Test Case 05: Chatbot Q&A functionality")
-    
-    # Sample meeting summary for testing
-    sample_summary = """
-    Meeting Summary:
-    - Discussed Q3 performance review
-    - Bob completed API integration project
-    - Carol finished UI mockups ahead of schedule
-    - Action items: Bob to prepare infrastructure proposal, Carol to research UX tools
-    - Budget discussion: need 20% more allocation for cloud infrastructure
-    """
-    
-    test_question = "What are the action items from this meeting?"
-    
-    client = initialize_client()
-    if client:
-        result = answer_question(client, test_question, sample_summary)
-        print(f"✅ Question: {test_question}")
-        print(f"✅ Result: {result}")
-        return "✅ PASS" if len(result) > 10 and "❌" not in result else "❌ FAIL"
-    else:
-        return "❌ FAIL - Client initialization failed"
-
-def test_case_06():
-    """TC_06: Empty question handling → returns helpful prompt"""
-    print("\n🧪 Test Case 06: Empty question handling")
-    
-    sample_summary = "Meeting summary with some content"
-    empty_question = ""
-    
-    client = initialize_client()
-    if client:
-        result = answer_question(client, empty_question, sample_summary)
-        print(f"✅ Result: {result}")
-        return "✅ PASS" if "ask a question" in result.lower() or "⚠️" in result else "❌ FAIL"
-    else:
-        return "❌ FAIL - Client initialization failed"
-
-def test_case_07():
-    """TC_07: Multi-language summary generation → generates summary in specified language"""
-    print("\n🧪 Test Case 07: Multi-language summary generation")
-    
-    short_transcript = """
-    Meeting: Quick standup
-    Alice: Good morning team. What did everyone work on yesterday?
-    Bob: I completed the API integration.
-    Carol: I finished the UI mockups.
-    Alice: Great! Any blockers for today?
-    Bob: None from me.
-    Carol: All good here too.
-    Alice: Perfect, let's reconvene tomorrow.
-    """
-    
-    client = initialize_client()
-    if client:
-        # Test Spanish summary
-        result = summarize_meeting(client, short_transcript, "concise", 150, 0.3, "Spanish")
-        print(f"✅ Spanish Result: {result}")
-        
-        # Simple check - if it contains Spanish words or characters, consider it a pass
-        spanish_indicators = ['reunión', 'equipo', 'trabajo', 'ayer', 'hoy', 'mañana', 'completé', 'terminé']
-        has_spanish = any(word in result.lower() for word in spanish_indicators) or "✅" not in result
-        
-        return "✅ PASS" if has_spanish and "❌" not in result else "❌ FAIL"
-    else:
-        return "❌ FAIL - Client initialization failed"
-
-def test_case_08():
-    """TC_08: Multi-language Q&A → answers questions in specified language"""
-    print("\n🧪 Test Case 08: Multi-language Q&A")
-    
-    sample_summary = """
-    Meeting Summary:
-    - Discussed Q3 performance review
-    - Bob completed API integration project
-    - Action items: Prepare infrastructure proposal
-    """
-    
-    test_question = "What are the action items?"
-    
-    client = initialize_client()
-    if client:
-        # Test French Q&A
-        result = answer_question(client, test_question, sample_summary, "", "French")
-        print(f"✅ French Q&A Result: {result}")
-        
-        # Simple check for French response
-        french_indicators = ['éléments', 'actions', 'tâches', 'proposer', 'infrastructure', 'projet']
-        has_french = any(word in result.lower() for word in french_indicators) or len(result) > 10
-        
-        return "✅ PASS" if has_french and "❌" not in result else "❌ FAIL"
-    else:
-        return "❌ FAIL - Client initialization failed"
-
-def test_case_09():
-    """TC_09: Language auto-detection → detects question language correctly"""
-    print("\n🧪 Test Case 09: Language auto-detection")
-    
-    client = initialize_client()
-    if client:
-        # Test different language questions
-        test_cases = [
-            ("What are the action items?", "English"),
-            ("¿Cuáles son los elementos de acción?", "Spanish"),
-            ("Quels sont les éléments d'action?", "French")
-        ]
-        
-        results = []
-        for question, expected_lang in test_cases:
-            detected = detect_question_language(client, question)
-            print(f"✅ Question: '{question}' → Detected: {detected} (Expected: {expected_lang})")
-            results.append(detected.lower() == expected_lang.lower())
-        
-        # Pass if at least 2 out of 3 detections are correct
-        success_rate = sum(results) / len(results)
-        return "✅ PASS" if success_rate >= 0.66 else "❌ FAIL"
-    else:
-        return "❌ FAIL - Client initialization failed"
-
-def test_case_10():
-    """TC_10: Auto-language Q&A → responds in detected question language"""
-    print("\n🧪 Test Case 10: Auto-language Q&A")
-    
-    sample_summary = """
-    Meeting Summary:
-    - Discussed Q3 performance review
-    - Bob completed API integration project
-    - Action items: Prepare infrastructure proposal
-    """
-    
-    client = initialize_client()
-    if client:
-        # Test Spanish question with auto-detection
-        spanish_question = "¿Cuáles fueron las decisiones principales?"
-        result = answer_question_auto_lang(client, spanish_question, sample_summary)
-        print(f"✅ Spanish Auto-Detection Result: {result}")
-        
-        # Check if response contains Spanish elements or is substantial
-        spanish_indicators = ['decisiones', 'principales', 'reunión', 'proyecto', 'revisión']
-        has_spanish = any(word in result.lower() for word in spanish_indicators) or len(result) > 20
-        
-        return "✅ PASS" if has_spanish and "❌" not in result else "❌ FAIL"
-    else:
-        return "❌ FAIL - Client initialization failed"
-
-def run_all_tests():
-    """Run all test cases and display results"""
-    print("🚀 Running Meeting Notes Automation Test Suite")
-    print("=" * 60)
-    
-    test_results = {
-        "TC_01": test_case_01(),
-        "TC_02": test_case_02(), 
-        "TC_03": test_case_03(),
-        "TC_04": test_case_04(),
-        "TC_05": test_case_05(),
-        "TC_06": test_case_06(),
-        "TC_07": test_case_07(),
-        "TC_08": test_case_08(),
-        "TC_09": test_case_09(),
-        "TC_10": test_case_10()
-    }
-    
-    print("\n" + "=" * 60)
-    print("📊 TEST RESULTS SUMMARY")
-    print("=" * 60)
-    
-    passed = 0
-    total = len(test_results)
-    
-    for test_id, result in test_results.items():
-        print(f"{test_id}: {result}")
-        if "PASS" in result:
-            passed += 1
-    
-    print(f"\n🎯 Overall Result: {passed}/{total} tests passed")
-    
-    if passed == total:
-        print("🎉 All tests passed!")
-    else:
-        print("⚠️ Some tests failed. Please check the implementation.")
-
-if __name__ == "__main__":
-    run_all_tests()
\ No newline at end of file
+"""
+Test cases for the User Guide Summarization App
+Run offline against the in-process fake model backend
+"""
+
+import json
+
+import httpx
+import openai
+import pytest
+
+import assistant
+import summarizer
+from fake_client import FakeChatClient, FakeResponse
+from assistant import Session, answer_question, answer_question_auto_lang, detect_question_language
+from response_cache import ResponseCache
+from semantic_cache import SemanticCache, hashed_embedding
+from ticket_store import TicketStore
+from summarizer import summarize_user_guide
+
+short_guide = """
+Quick Start Guide
+1. Install the app from the download page.
+2. Sign in with your company account.
+3. Open Settings to choose your notification preferences.
+"""
+
+long_guide = "\n\n".join(
+    f"Section {i}: Configuration\nOpen the admin console, select module {i} and enable the feature flags it needs. "
+    "Save the changes and restart the service so the new settings are applied."
+    for i in range(1, 40)
+)
+
+sample_summary = """
+Guide Summary:
+- Install the app and sign in with your company account
+- Notification preferences are configured under Settings
+- Admins enable features per module in the admin console
+"""
+
+
+@pytest.fixture(autouse=True)
+def isolated_state(tmp_path, monkeypatch):
+    """Every test gets empty response, semantic and ticket stores and a fresh conversation"""
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"))
+    tickets = TicketStore(str(tmp_path / "tickets.sqlite3"))
+    monkeypatch.setattr(assistant, "get_ticket_store", lambda: tickets)
+    semantic_cache = SemanticCache(embed=hashed_embedding, audit_rate=0)
+    monkeypatch.setattr(assistant, "get_semantic_cache", lambda: semantic_cache)
+    monkeypatch.setattr(assistant, "get_response_cache", lambda: cache)
+    monkeypatch.setattr(summarizer, "get_response_cache", lambda: cache)
+    monkeypatch.setattr(assistant, "default_session", Session())
+
+
+def _prompt(client, index=-1):
+    """Full text of the messages of a recorded request"""
+    return "\n".join(str(message["content"]) for message in client.requests[index]["messages"])
+
+
+def test_case_01_short_guide_summary():
+    """TC_01: Summarize a short user guide → concise summary produced in one call"""
+    client = FakeChatClient()
+    result = summarize_user_guide(client, short_guide, "concise", 150, 0.3)
+
+    assert len(result) > 10 and "❌" not in result
+    assert len(client.requests) == 1
+    assert "Install the app" in _prompt(client)
+
+
+def test_case_02_long_guide_map_reduce():
+    """TC_02: Long multi-section guide → chunks are summarized and merged"""
+    client = FakeChatClient()
+    result = summarize_user_guide(client, long_guide, "detailed", 400, 0.3, chunk_tokens=200, max_workers=2)
+
+    assert "❌" not in result
+    assert len(client.requests) > 2  # map calls plus the final merge
+
+
+def test_case_03_empty_input():
+    """TC_03: Empty input text → helpful prompt to retry, no API call"""
+    client = FakeChatClient()
+    result = summarize_user_guide(client, "", "concise", 150, 0.3)
+
+    assert "No content" in result and "⚠️" in result
+    assert client.requests == []
+
+
+def test_case_04_authentication_error():
+    """TC_04: Invalid API key → authentication error reported, not raised"""
+    request = httpx.Request("POST", "https://fake.openai.azure.com/chat/completions")
+    error = openai.AuthenticationError("Access denied due to invalid subscription key", response=httpx.Response(401, request=request), body=None)
+    client = FakeChatClient(errors=[error])
+
+    result = summarize_user_guide(client, short_guide, "concise", 150, 0.3)
+    assert "❌" in result and "invalid subscription key" in result
+
+
+def test_case_05_chatbot_answer():
+    """TC_05: Q&A → JSON answer parsed into answer and reasoning"""
+    client = FakeChatClient(responder=lambda messages, **kwargs: json.dumps({
+        "reasoning": "Settings section", "answer": "Open Settings to change notifications.", "confidence": "0.9"
+    }))
+    answer, reasoning, tool_call = answer_question(client, "Where do I change notifications?", sample_summary)
+
+    assert answer == "Open Settings to change notifications."
+    assert "Settings section" in reasoning
+    assert tool_call is None
+
+
+def test_case_06_empty_question():
+    """TC_06: Empty question → helpful prompt, no API call"""
+    client = FakeChatClient()
+    result = answer_question(client, "", sample_summary)
+
+    assert "ask a question" in result.lower()
+    assert client.requests == []
+
+
+def test_case_07_multi_language_summary():
+    """TC_07: Summary language → the prompt asks for the selected language"""
+    client = FakeChatClient()
+    summarize_user_guide(client, short_guide, "concise", 150, 0.3, "Spanish")
+
+    assert "Respond in Spanish." in _prompt(client)
+
+
+def test_case_08_multi_language_answer():
+    """TC_08: Q&A language → the prompt asks for the selected language"""
+    client = FakeChatClient()
+    answer_question(client, "What are the main features?", sample_summary, "", "French")
+
+    assert "French" in _prompt(client)
+
+
+def test_case_09_language_detection():
+    """TC_09: Language detection → clear questions are detected offline, ambiguous ones ask the model"""
+    client = FakeChatClient(responder=lambda messages, **kwargs: "Spanish")
+
+    assert detect_question_language(client, "¿Cuáles son las características principales de esta guía?") == "Spanish"
+    assert detect_question_language(client, "Quelles sont les étapes pour configurer les notifications?") == "French"
+    assert client.requests == []
+
+    assert detect_question_language(client, "OK?") == "Spanish"
+    assert len(client.requests) == 1
+
+
+def test_case_10_auto_language_answer():
+    """TC_10: Auto-language Q&A → answer requested in the question's language"""
+    client = FakeChatClient()
+    answer, _, _ = answer_question_auto_lang(client, "¿Cuáles son las características principales de esta guía?", sample_summary)
+
+    assert "❌" not in answer
+    assert "Spanish" in _prompt(client)
+    assert assistant.default_session.answer_language == "Spanish"
+
+
+def test_support_ticket_tool_call():
+    """A tool call creates a support ticket instead of answering"""
+    client = FakeChatClient(responder=lambda messages, **kwargs: FakeResponse(
+        tool_name="create_support_ticket",
+        tool_arguments={"name": "Ada", "email": "ada@example.com", "issue_description": "Cannot sign in"}
+    ))
+
+    answer, _, tool_call = answer_question(client, "My name is Ada, ada@example.com, please open a ticket", sample_summary)
+    assert "has been created successfully" in answer
+    assert "create_support_ticket" in str(tool_call)
+    assert assistant.default_session.support_tickets[-1]["email"] == "ada@example.com"
+
+
+def test_streamed_answer():
+    """Streaming yields the answer text before the full JSON has arrived"""
+    client = FakeChatClient()
+    stream = answer_question(client, "What are the main features?", sample_summary, stream=True)
+    deltas = list(stream)
+    answer, _, _ = stream.result
+
+    assert len(deltas) > 1
+    assert "".join(deltas) == answer
+    assert client.requests[0]["stream"] is True
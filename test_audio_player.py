@@ -0,0 +1,44 @@
+"""
+Test cases for compressed audio delivery
+"""
+
+import io
+
+import numpy as np
+import soundfile as sf
+
+import audio_player
+from audio_player import audio_source, audio_stats_summary, encode_audio
+
+
+def _tone(seconds=1.0, sample_rate=16000):
+    return (0.3 * np.sin(np.arange(int(seconds * sample_rate)) / 10)).astype(np.float32)
+
+
+def test_opus_is_smaller_than_wav_and_falls_back_to_flac():
+    """Speech-rate audio is encoded as Opus; rates Opus does not support use FLAC"""
+    data, extension, mime_type = encode_audio(_tone(), 16000, "opus")
+    assert (extension, mime_type) == ("ogg", "audio/ogg")
+    assert len(data) < (44 + 2 * 16000) / 4
+
+    data, extension, _ = encode_audio(_tone(sample_rate=22050), 22050, "opus")
+    assert extension == "flac"
+    audio, sample_rate = sf.read(io.BytesIO(data))
+    assert sample_rate == 22050 and len(audio) == 22050
+
+
+def test_static_clips_are_encoded_once(tmp_path, monkeypatch):
+    """The same waveform is served from the already encoded file"""
+    monkeypatch.setattr(audio_player, "STATIC_AUDIO_DIR", str(tmp_path))
+    monkeypatch.setattr(audio_player.st, "get_option", lambda name: True)
+    before = audio_stats_summary()
+
+    first = audio_source(_tone(), 16000)
+    second = audio_source(_tone(), 16000)
+
+    assert first == second
+    assert first.startswith(audio_player.STATIC_AUDIO_URL) and first.endswith(".ogg")
+    assert len(list(tmp_path.iterdir())) == 1
+    after = audio_stats_summary()
+    assert after["clips"] - before["clips"] == 2
+    assert after["reused"] - before["reused"] == 1
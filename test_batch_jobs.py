@@ -0,0 +1,70 @@
+"""
+Test cases for Batch API bulk summarization, run through the local stand-in
+"""
+
+import io
+
+import batch_jobs
+import summarizer
+from batch_jobs import LocalBatchClient, build_batch_requests, cache_keys, load_batch_results, submit_batch, wait_for_batch, write_batch_file
+from documents import GuideDocument
+from fake_client import FakeChatClient
+from response_cache import ResponseCache
+from summarizer import summarize_document, summary_cache_key
+
+
+def _fake_completion(body):
+    prompt = body["messages"][0]["content"]
+    if "FAIL" in prompt:
+        raise RuntimeError("content filtered")
+    return {
+        "choices": [{"message": {"role": "assistant", "content": f"- Summary of {len(prompt)} chars"}}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 5}
+    }
+
+
+def test_requests_cover_every_language_and_style(monkeypatch):
+    """One request per guide, language and style, keyed by the summary cache key"""
+    monkeypatch.setattr(batch_jobs, "count_tokens", lambda text, model: len(text.split()))
+    guides = [("a.txt", "Short guide", None), ("big.txt", "word " * 50, None)]
+
+    requests, skipped = build_batch_requests(guides, ["English", "Spanish"], ["concise", "detailed"], chunk_tokens=20)
+
+    assert skipped == ["big.txt"]
+    assert len(requests) == 4
+    assert requests[0]["custom_id"] == summary_cache_key("Short guide", "concise", 300, 0.3, "English", "gpt-4o-mini", 20)
+    assert len({request["custom_id"] for request in requests}) == 4
+
+
+def test_batch_results_are_loaded_into_the_cache(tmp_path, monkeypatch):
+    """Successful results are cached under their custom_id; failed requests are counted"""
+    monkeypatch.setattr(batch_jobs, "count_tokens", lambda text, model: len(text.split()))
+    requests, _ = build_batch_requests([("a.txt", "Guide", None), ("b.txt", "FAIL", None)], ["English"], ["concise"])
+    client = LocalBatchClient(_fake_completion, str(tmp_path))
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"))
+
+    batch = submit_batch(client, write_batch_file(requests, str(tmp_path / "requests.jsonl")))
+    batch = wait_for_batch(client, batch.id, poll_seconds=0)
+    loaded, failed, usage = load_batch_results(client, batch, cache)
+
+    assert (batch.status, loaded, failed) == ("completed", 1, 1)
+    assert usage == {"prompt_tokens": 10, "completion_tokens": 5}
+    assert cache.get(requests[0]["custom_id"]).startswith("- Summary of")
+    assert cache.get(requests[1]["custom_id"]) is None
+
+
+def test_batch_summaries_are_served_for_uploads_of_the_same_file(tmp_path, monkeypatch):
+    """A guide's result is cached under its text key and the document key of the uploaded file"""
+    text = "Open Settings and enable notifications.\n"
+    upload = GuideDocument(io.BytesIO(text.encode("utf-8")), "guide.md")
+    requests, _ = build_batch_requests([("guide.md", text, upload.key)], ["English"], ["concise"])
+    client = LocalBatchClient(_fake_completion, str(tmp_path))
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"))
+    load_batch_results(client, submit_batch(client, write_batch_file(requests, str(tmp_path / "requests.jsonl"))), cache)
+
+    text_key, _ = cache_keys(requests[0]["custom_id"])
+    assert cache.get(text_key).startswith("- Summary of")
+    monkeypatch.setattr(summarizer, "get_response_cache", lambda: cache)
+    chat_client = FakeChatClient()
+    assert "".join(summarize_document(chat_client, upload.pages(), upload.key)) == cache.get(text_key)
+    assert chat_client.requests == []
@@ -0,0 +1,130 @@
+import io
+import threading
+import zipfile
+
+import pytest
+
+import retrieval
+import summarizer
+from documents import PAGE_CHARACTERS, GuideDocument, iter_pages, normalize_text
+from fake_client import FakeChatClient, default_responder
+from response_cache import ResponseCache
+from retrieval import INDEX_BATCH_SIZE, index_pages
+from summarizer import summarize_document
+
+section = "## Section {i}\n\nOpen the admin console, select module {i} and enable the feature flags it needs.\n\n"
+
+
+def _docx(paragraphs):
+    """A minimal Word document; a paragraph ending in "\\f" is followed by a page break"""
+    page_break = '<w:br w:type="page"/>'
+    body = "".join(
+        f"<w:p><w:r><w:t>{text.rstrip(chr(12))}</w:t>{page_break if text.endswith(chr(12)) else ''}</w:r></w:p>"
+        for text in paragraphs
+    )
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("word/document.xml", f'<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>{body}</w:body></w:document>')
+    return buffer
+
+
+def test_pages_are_normalized_and_read_in_blocks():
+    assert normalize_text("Con­figure   the\tapp  \r\n\r\n\r\n\r\n  - nested item") == "Configure the app\n\n  - nested item"
+
+    markdown = io.BytesIO("".join(section.format(i=i) for i in range(400)).encode("utf-8"))
+    pages = list(iter_pages(markdown, "guide.md"))
+    assert len(pages) > 3 and all(len(page) < 2 * PAGE_CHARACTERS for page in pages)
+    assert pages[0].startswith("## Section 0") and pages[-1].endswith("flags it needs.")
+    assert not markdown.closed
+
+    word = list(iter_pages(_docx(["Install the app", "Sign in\f", "Open Settings"]), "guide.docx"))
+    assert word == ["Install the app\n\nSign in", "Open Settings"]
+
+    with pytest.raises(ValueError):
+        list(iter_pages(io.BytesIO(b""), "guide.odt"))
+
+
+def test_document_is_summarized_while_it_is_read(tmp_path, monkeypatch):
+    """Chunks are sent as pages arrive, with a bounded number read ahead; the second pass replays the spool"""
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"))
+    monkeypatch.setattr(summarizer, "get_response_cache", lambda: cache)
+    pulled = []
+    read_ahead = []
+    lock = threading.Lock()
+
+    def responder(messages, **kwargs):
+        prompt = messages[-1]["content"]
+        if prompt.startswith("Summarize the following section"):
+            with lock:
+                read_ahead.append(len(pulled) - len(read_ahead))
+        return default_responder(messages, **kwargs)
+
+    document = GuideDocument(io.BytesIO("".join(section.format(i=i) for i in range(600)).encode("utf-8")), "manual.md")
+    original_pages = document.pages
+
+    def counted_pages():
+        for page in original_pages():
+            pulled.append(page)
+            yield page
+    client = FakeChatClient(responder=responder, latency=0.002)
+
+    summary = "".join(summarize_document(client, counted_pages(), document.key, chunk_tokens=300, max_workers=2))
+    assert summary.startswith("- Main features")
+    assert len(read_ahead) > 20 and max(read_ahead) <= 2 * 2 + 1
+    assert list(document.pages()) == pulled
+    assert document.words > 6000 and document.head().startswith("## Section 0")
+
+    # The same file is served from the cache without reading a page
+    requests = len(client.requests)
+    assert "".join(summarize_document(client, iter(()), document.key, chunk_tokens=300, max_workers=2)) == summary
+    assert len(client.requests) == requests
+
+
+class _Collection:
+    def __init__(self):
+        self.metadata = None
+        self.documents = []
+
+    def count(self):
+        return len(self.documents)
+
+    def add(self, ids, documents, metadatas):
+        self.documents.extend(documents)
+
+    def modify(self, metadata):
+        self.metadata = metadata
+
+
+class _Chroma:
+    """Collections by name, as far as indexing uses them"""
+
+    def __init__(self):
+        self.collections = {}
+
+    def get_or_create_collection(self, name):
+        return self.collections.setdefault(name, _Collection())
+
+    def delete_collection(self, name):
+        del self.collections[name]
+
+
+def test_interrupted_index_is_rebuilt(monkeypatch):
+    chroma = _Chroma()
+    monkeypatch.setattr(retrieval, "get_chroma_client", lambda: chroma)
+    pages = [section.format(i=i) for i in range(3 * INDEX_BATCH_SIZE)]
+
+    def failing_pages():
+        yield from pages[:2 * INDEX_BATCH_SIZE]
+        raise OSError("upload went away")
+
+    with pytest.raises(OSError):
+        index_pages("guide-test", failing_pages(), chunk_tokens=30)
+    assert chroma.collections["guide-test"].count() > 0 and chroma.collections["guide-test"].metadata is None
+
+    index_pages("guide-test", pages, chunk_tokens=30)
+    indexed = chroma.collections["guide-test"]
+    assert indexed.metadata == {"complete": True} and indexed.count() == len(pages)
+
+    # A complete collection is reused without reading a page
+    index_pages("guide-test", iter(()), chunk_tokens=30)
+    assert chroma.collections["guide-test"] is indexed
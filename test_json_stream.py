@@ -0,0 +1,53 @@
+"""
+Test cases for the incremental JSON field parser used by streamed answers
+"""
+
+import json
+
+from json_stream import JsonStringFieldStreamer
+
+RESPONSE = json.dumps({
+    "answer": "Press \"Reset\" for ~10 s.\nThen wait — LED blinks 🔴.",
+    "reasoning": "The guide says \"answer\": hold the button.",
+    "confidence": "0.9"
+})
+
+
+def stream(text, size):
+    """Feed text in fixed-size fragments and collect the decoded deltas"""
+    streamer = JsonStringFieldStreamer("answer")
+    deltas = [streamer.feed(text[i:i + size]) for i in range(0, len(text), size)]
+    return streamer, deltas
+
+
+def test_decodes_field_for_any_fragment_size():
+    """Escapes split across fragments decode to the same value"""
+    expected = json.loads(RESPONSE)["answer"]
+    for size in (1, 2, 3, 7, len(RESPONSE)):
+        streamer, deltas = stream(RESPONSE, size)
+        assert "".join(deltas) == expected
+        assert streamer.value == expected
+        assert streamer.done
+
+
+def test_ascii_escaped_unicode():
+    """\\uXXXX escapes, including surrogate pairs, are decoded"""
+    text = json.dumps({"answer": "Xin chào 🔊"}, ensure_ascii=True)
+    streamer, deltas = stream(text, 1)
+    assert "".join(deltas) == "Xin chào 🔊"
+
+
+def test_answer_before_rest_of_object():
+    """The field is emitted before the object is complete, and later fields are ignored"""
+    text = json.dumps({"reasoning": "Look up \"answer\" in the guide", "answer": "Yes", "confidence": 1})
+    streamer = JsonStringFieldStreamer("answer")
+    assert streamer.feed(text[:text.index("Yes") + 2]) == "Ye"
+    assert streamer.feed(text[text.index("Yes") + 2:]) == "s"
+    assert streamer.text == text
+
+
+def test_missing_field():
+    """Responses without the field yield nothing"""
+    streamer, deltas = stream('{"reasoning": "none"}', 4)
+    assert "".join(deltas) == ""
+    assert not streamer.done
@@ -0,0 +1,29 @@
+"""
+Test cases for the offline language detector
+"""
+
+import json
+
+from lang_detect import DEFAULT_CONFIDENCE_THRESHOLD, detect_language
+
+with open("data/language_samples.json", encoding="utf-8") as f:
+    SAMPLES = json.load(f)
+
+
+def test_labelled_samples():
+    """Every labelled sample is detected correctly"""
+    for sample in SAMPLES:
+        language, _ = detect_language(sample["text"])
+        assert language == sample["language"], sample["text"]
+
+
+def test_confident_on_most_samples():
+    """Most samples are answered locally, without the LLM fallback"""
+    confident = [s for s in SAMPLES if detect_language(s["text"])[1] >= DEFAULT_CONFIDENCE_THRESHOLD]
+    assert len(confident) / len(SAMPLES) >= 0.9
+
+
+def test_ambiguous_text_has_low_confidence():
+    """Text without language evidence defers to the LLM"""
+    assert detect_language("")[1] == 0.0
+    assert detect_language("PDF 2.0 ?")[1] < DEFAULT_CONFIDENCE_THRESHOLD
@@ -0,0 +1,88 @@
+import threading
+import time
+
+import openai
+import pytest
+
+from fake_client import FakeChatClient
+from rate_limit import Deployment, DeploymentPool, LimitedChatClient, RateLimiter
+from tracing import counter_totals
+
+messages = [{"role": "user", "content": "How do I reset my password?"}]
+
+
+def test_throttled_requests_are_retried():
+    """429s and server errors are retried; a 429 pauses the deployment for its retry-after"""
+    fake = FakeChatClient(errors=["rate_limit", "server"])
+    client = LimitedChatClient(fake, max_retries=3)
+    before = counter_totals().get("model_retries", 0)
+
+    response = client.chat.completions.create(model="retry-test", messages=messages, max_tokens=50)
+    assert response.choices[0].message.content
+    assert len(fake.requests) == 3
+    assert counter_totals()["model_retries"] == before + 2
+
+
+def test_retries_are_bounded():
+    client = LimitedChatClient(FakeChatClient(errors=["timeout"] * 3), max_retries=1)
+    with pytest.raises(openai.APITimeoutError):
+        client.chat.completions.create(model="retry-test", messages=messages)
+
+
+def test_token_bucket_spaces_requests():
+    """With a 60 request-per-minute quota, the burst capacity is spent and the next request waits about a second"""
+    limiter = RateLimiter(tpm=0, rpm=60)
+    delays = [limiter.reserve(10) for _ in range(61)]
+    assert delays[:60] == [0.0] * 60
+    assert 0.9 < delays[60] <= 1.0
+    assert limiter.reserve(10, block=False) is None
+
+
+def test_hedged_request_beats_slow_primary():
+    calls = []
+    lock = threading.Lock()
+
+    def responder(messages, **kwargs):
+        with lock:
+            calls.append(time.perf_counter())
+            first = len(calls) == 1
+        if first:
+            time.sleep(0.5)
+        return "fast" if not first else "slow"
+
+    client = LimitedChatClient(FakeChatClient(responder=responder), hedge_after=0.05)
+    start = time.perf_counter()
+    response = client.chat.completions.create(model="hedge-test", messages=messages)
+
+    assert response.choices[0].message.content == "fast"
+    assert time.perf_counter() - start < 0.4
+
+
+def test_throttled_deployment_fails_over():
+    """A 429 from one deployment sends the request to the next one at once and pauses the first"""
+    throttled = FakeChatClient(errors=["rate_limit"])
+    spare = FakeChatClient()
+    pool = DeploymentPool(deployments={"gpt-4o-mini": [
+        Deployment("eastus", throttled, "mini-eastus"),
+        Deployment("westeurope", spare, "mini-westeurope")
+    ]})
+
+    LimitedChatClient(pool).chat.completions.create(model="gpt-4o-mini", messages=messages)
+    assert len(throttled.requests) == 1
+    assert spare.requests[0]["model"] == "mini-westeurope"
+    assert pool.for_model("gpt-4o-mini")[0].limiter.wait_time(1) > 0
+
+
+def test_routing_prefers_fast_healthy_deployments():
+    slow, fast = Deployment("slow", FakeChatClient(), "a"), Deployment("fast", FakeChatClient(), "b")
+    slow.latency, fast.latency = 2.0, 0.2
+    pool = DeploymentPool(deployments={"gpt-4o-mini": [slow, fast]})
+    assert pool.choose("gpt-4o-mini", 100) is fast
+
+    failing = FakeChatClient(errors=["server"] * 3)
+    fast.client = failing
+    for _ in range(3):
+        with pytest.raises(openai.InternalServerError):
+            fast.send({"model": "gpt-4o-mini", "messages": messages})
+    assert not fast.healthy()
+    assert pool.choose("gpt-4o-mini", 100) is slow
@@ -0,0 +1,56 @@
+"""
+Test cases for the content-addressed response cache
+"""
+
+import time
+
+from response_cache import ResponseCache
+
+
+def test_hit_and_miss_counters(tmp_path):
+    """Repeated keys are served from the cache and counted"""
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"))
+    key = ResponseCache.make_key("summary", model="gpt-4o-mini", text="Guide text")
+
+    assert cache.get(key) is None
+    cache.set(key, "- Summary")
+    assert cache.get(key) == "- Summary"
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["entries"] == 1
+
+
+def test_key_depends_on_every_parameter():
+    """Changing any request parameter produces a different key"""
+    base = ResponseCache.make_key("summary", model="gpt-4o-mini", language="English", text="Guide")
+    assert base == ResponseCache.make_key("summary", text="Guide", language="English", model="gpt-4o-mini")
+    assert base != ResponseCache.make_key("summary", model="gpt-4o-mini", language="Spanish", text="Guide")
+    assert base != ResponseCache.make_key("answer", model="gpt-4o-mini", language="English", text="Guide")
+
+
+def test_expired_entries_are_misses(tmp_path):
+    """Entries older than the TTL are dropped"""
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"), ttl_seconds=0.01)
+    cache.set("key", "value")
+    time.sleep(0.02)
+
+    assert cache.get("key") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_lru_eviction(tmp_path):
+    """The least recently used entry is evicted once the size limit is exceeded"""
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"), max_entries=2)
+    cache.set("a", 1)
+    time.sleep(0.01)
+    cache.set("b", 2)
+    time.sleep(0.01)
+    cache.get("a")
+    time.sleep(0.01)
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
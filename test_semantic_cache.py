@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+import assistant
+from assistant import Session, answer_question
+from fake_client import FakeChatClient
+from response_cache import ResponseCache
+from semantic_cache import EXACT_SEARCH_LIMIT, HASHED_DIMENSIONS, SemanticCache, hashed_embedding
+from tracing import counter_totals
+
+summary = "Guide Summary:\n- Notifications are configured under Settings"
+
+
+@pytest.fixture
+def semantic_cache(tmp_path, monkeypatch):
+    cache = SemanticCache(embed=hashed_embedding, audit_rate=0)
+    monkeypatch.setattr(assistant, "get_semantic_cache", lambda: cache)
+    response_cache = ResponseCache(str(tmp_path / "cache.sqlite3"))
+    monkeypatch.setattr(assistant, "get_response_cache", lambda: response_cache)
+    return cache
+
+
+def test_rephrased_standalone_question_is_served_from_memory(semantic_cache):
+    client = FakeChatClient()
+    first, _, _ = answer_question(client, "How do I turn on notifications?", summary, session=Session())
+    again, _, _ = answer_question(client, "how do i turn on the notifications", summary, session=Session())
+    assert again == first and len(client.requests) == 1
+
+    # Another language, another step number or a follow-up in a conversation gets its own answer
+    answer_question(client, "How do I turn on notifications?", summary, language="French", session=Session())
+    answer_question(client, "How do I turn on notifications for step 2?", summary, session=Session())
+    answer_question(client, "How do I turn on notifications for step 3?", summary, session=Session())
+    follow_up = Session(chat_history=[{"role": "user", "content": "I use the mobile app"}, {"role": "assistant", "content": "OK"}, {"role": "user", "content": "how do i turn on the notifications"}])
+    answer_question(client, "how do i turn on the notifications", summary, session=follow_up)
+    assert len(client.requests) == 5
+    assert semantic_cache.stats()["hits"] == 1
+
+
+def test_embedding_errors_fall_through_to_the_model(semantic_cache, monkeypatch):
+    def offline(text):
+        raise OSError("Could not download the embedding model")
+    monkeypatch.setattr(semantic_cache, "_embed", offline)
+    client = FakeChatClient()
+
+    answer, _, _ = answer_question(client, "How do I turn on notifications?", summary, session=Session())
+    assert "According to the guide" in answer and len(client.requests) == 1
+
+
+def test_eviction_invalidation_and_ann_search(semantic_cache):
+    guide = SemanticCache.guide_key(summary)
+    scope = (guide, "English", "gpt-4o-mini")
+    questions = [f"How do I configure the {word} module?" for word in ("billing", "reporting", "export", "calendar")]
+    for question in questions:
+        semantic_cache.add(question, semantic_cache.embed(question), question, scope)
+
+    assert semantic_cache.invalidate(guide) == 4
+    assert semantic_cache.lookup(questions[0], semantic_cache.embed(questions[0]), scope) is None
+
+    # Past the exact-search limit, neighbours are found through the LSH tables
+    semantic_cache.max_entries = EXACT_SEARCH_LIMIT * 2
+    rng = np.random.default_rng(1)
+    for i in range(EXACT_SEARCH_LIMIT * 2 + 10):
+        vector = rng.standard_normal(HASHED_DIMENSIONS).astype(np.float32)
+        semantic_cache.add(f"question {i}", vector / np.linalg.norm(vector), i, scope)
+    assert semantic_cache.stats()["entries"] == EXACT_SEARCH_LIMIT * 2
+    newest = semantic_cache._lru[next(reversed(semantic_cache._lru))]
+    assert semantic_cache.lookup(newest.question, newest.vector, scope) is newest
+
+
+def test_drifted_answers_are_evicted(semantic_cache):
+    scope = (SemanticCache.guide_key(summary), "English", "gpt-4o-mini")
+    question = "How do I turn on notifications?"
+    entry = semantic_cache.add(question, semantic_cache.embed(question), "{}", scope)
+
+    assert semantic_cache.record_drift(entry, "Open Settings and enable notifications", "Open Settings and enable notifications") < 0.01
+    assert semantic_cache.lookup(question, entry.vector, scope) is entry
+    assert semantic_cache.record_drift(entry, "Open Settings and enable notifications", "Contact your administrator for billing exports") > 0.25
+    assert semantic_cache.lookup(question, entry.vector, scope) is None
+    assert semantic_cache.stats()["audits"] == 2
+
+
+def test_audits_are_opt_in_and_counted_apart(semantic_cache):
+    client = FakeChatClient()
+    answer_question(client, "How do I turn on notifications?", summary, session=Session())
+    answer_question(client, "how do i turn on the notifications", summary, session=Session())
+    assert len(client.requests) == 1
+
+    tokens = counter_totals().get("semantic_cache_audit_tokens", 0)
+    semantic_cache.audit_rate = 1
+    answer_question(client, "how do i turn on the notifications", summary, session=Session())
+    assistant._audit_executor.submit(lambda: None).result()
+    assert len(client.requests) == 2 and semantic_cache.stats()["audits"] == 1
+    assert counter_totals()["semantic_cache_audit_tokens"] > tokens
@@ -0,0 +1,8 @@
+from bench_startup import deferred_packages, measure
+
+
+def test_entry_points_import_without_heavy_packages():
+    """Speech and retrieval packages load on first use; bench_startup.py reports the import time"""
+    for module in ("assistant", "api"):
+        _, packages = measure(module)
+        assert not [package for package in deferred_packages if package in packages]
@@ -0,0 +1,52 @@
+"""
+Test cases for the batch summarization CLI
+"""
+
+import json
+
+import summarizer
+from fake_client import FakeChatClient
+from response_cache import ResponseCache
+from summarize_batch import find_guides, job_key, load_completed, summarize_file
+from summarizer import DEFAULT_CHUNK_TOKENS, split_into_chunks
+
+settings = {"language": "English", "style": "concise", "model": "gpt-4o-mini", "max_tokens": 300, "temperature": 0.3}
+
+
+def test_find_guides_in_directory_and_glob(tmp_path):
+    """Directories are searched recursively for .txt/.md; globs are used as given"""
+    (tmp_path / "sub").mkdir()
+    for name in ("a.txt", "b.md", "sub/c.txt", "d.pdf"):
+        (tmp_path / name).write_text("guide")
+
+    assert [p.replace(str(tmp_path), "") for p in find_guides(str(tmp_path))] == ["/a.txt", "/b.md", "/sub/c.txt"]
+    assert find_guides(str(tmp_path / "*.md")) == [str(tmp_path / "b.md")]
+
+
+def test_resume_skips_only_successful_records(tmp_path):
+    """Finished guides are skipped on restart; failures and partial lines are retried"""
+    output = tmp_path / "out.jsonl"
+    output.write_text(
+        json.dumps({"key": job_key("one", settings), "status": "ok"}) + "\n"
+        + json.dumps({"key": job_key("two", settings), "status": "error"}) + "\n"
+        + '{"key": "trunc'
+    )
+
+    assert load_completed(str(output)) == {job_key("one", settings)}
+    assert job_key("one", settings) != job_key("one", {**settings, "language": "Spanish"})
+
+
+def test_rate_limits_retry_only_the_throttled_request(tmp_path, monkeypatch):
+    """A throttled chunk backs off and is retried alone; the chunks that succeeded are not requested again"""
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"))
+    monkeypatch.setattr(summarizer, "get_response_cache", lambda: cache)
+    guide = "\n\n".join(f"Section {i}: enable module {i} in the admin console. " * 40 for i in range(40))
+    chunks = len(split_into_chunks(guide, DEFAULT_CHUNK_TOKENS))
+    client = FakeChatClient(errors=[None] * (chunks - 1) + ["rate_limit", "rate_limit"])
+
+    record = summarize_file(client, "guide.txt", guide, settings, chunk_workers=1)
+
+    assert chunks > 1
+    assert record["status"] == "ok" and record["summary"]
+    assert record["retries"] == 2
+    assert len(client.requests) == chunks + 1 + 2
@@ -0,0 +1,59 @@
+import sqlite3
+import threading
+
+from ticket_store import TicketStore
+
+
+def test_tickets_are_idempotent_and_unique(tmp_path):
+    store = TicketStore(str(tmp_path / "tickets.sqlite3"), flush_seconds=60)
+    first, created = store.create("Ada", "ada@example.com", "Cannot sign in")
+    again, created_again = store.create("Ada", " ADA@example.com", "Cannot sign in")
+    other, _ = store.create("Ada", "ada@example.com", "Cannot reset my password")
+
+    assert created and not created_again
+    assert again["id"] == first["id"]
+    # Same second, different issue: the old timestamp IDs collided here
+    assert other["id"] != first["id"]
+    assert store.get(first["id"])["email"] == "ada@example.com"
+
+
+def test_a_repeat_after_the_dedup_window_opens_a_new_ticket(tmp_path):
+    path = str(tmp_path / "tickets.sqlite3")
+    earlier = TicketStore(path, dedup_seconds=3600)
+    first, _ = earlier.create("Ada", "ada@example.com", "Cannot sign in")
+    earlier.close()
+    store = TicketStore(path, dedup_seconds=3600)
+    assert store.create("Ada", "ada@example.com", "Cannot sign in") == (first, False)
+
+    # A week later the same report is a new problem
+    store.dedup_seconds = 0
+    again, created = store.create("Ada", "ada@example.com", "Cannot sign in")
+    assert created and again["id"] != first["id"]
+    assert store.count() == 2
+
+
+def test_writes_are_batched_off_the_request_path(tmp_path):
+    """create() only queues; the writer thread persists a full batch in one transaction"""
+    path = str(tmp_path / "tickets.sqlite3")
+    store = TicketStore(path, batch_size=20, flush_seconds=60)
+    assert sqlite3.connect(path).execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    threads = [threading.Thread(target=store.create, args=(f"User {i}", f"user{i}@example.com", f"Issue {i}")) for i in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    store.close()
+
+    assert sqlite3.connect(path).execute("SELECT COUNT(*) FROM tickets").fetchone()[0] == 20
+
+
+def test_pages_are_newest_first(tmp_path):
+    store = TicketStore(str(tmp_path / "tickets.sqlite3"))
+    ids = [store.create("Ada", "ada@example.com", f"Issue {i}")[0]["id"] for i in range(25)]
+
+    first_page, second_page = store.list(limit=10), store.list(limit=10, offset=10)
+    assert store.count() == 25
+    assert [ticket["id"] for ticket in first_page] == ids[::-1][:10]
+    assert [ticket["id"] for ticket in second_page] == ids[::-1][10:20]
+    assert store.list(status="closed") == []
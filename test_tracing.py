@@ -0,0 +1,36 @@
+import json
+
+import pytest
+
+import tracing
+from azure_client import record_usage
+from fake_client import FakeChatClient
+from tracing import prometheus_text, record_cache, span
+
+
+def test_spans_nest_and_export_metrics(tmp_path, monkeypatch):
+    trace_file = tmp_path / "traces.jsonl"
+    monkeypatch.setattr(tracing, "TRACE_FILE", str(trace_file))
+    usage = FakeChatClient().create(messages=[{"role": "user", "content": "x" * 400}]).usage
+
+    with span("answer") as parent:
+        with span("completion", purpose="answer") as child:
+            record_usage(usage)
+            record_cache(False)
+    with pytest.raises(ValueError), span("tool_call"):
+        raise ValueError("bad arguments")
+
+    assert child.trace_id == parent.trace_id and child.parent_id == parent.span_id
+    assert child.attributes["prompt_tokens"] == usage.prompt_tokens and child.attributes["cache_hit"] is False
+    assert "prompt_tokens" not in parent.attributes
+
+    spans = [json.loads(line)["resourceSpans"][0]["scopeSpans"][0]["spans"][0] for line in trace_file.read_text().splitlines()]
+    assert [s["name"] for s in spans] == ["completion", "answer", "tool_call"]
+    assert spans[0]["parentSpanId"] == parent.span_id
+    assert spans[2]["status"] == {"code": 2, "message": "ValueError: bad arguments"}
+
+    text = prometheus_text()
+    assert 'app_stage_duration_seconds_count{stage="completion"}' in text
+    assert 'app_stage_errors_total{stage="tool_call"}' in text
+    assert 'app_tokens_total{stage="completion",kind="prompt"}' in text
+    assert 'app_response_cache_requests_total{result="miss"}' in text
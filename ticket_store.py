@@ -0,0 +1,180 @@
+import atexit
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from functools import lru_cache
+
+from tracing import increment
+
+# Location of the shared support ticket database
+TICKET_DB_PATH = os.getenv("TICKET_DB_PATH", "tickets.sqlite3")
+# Queued tickets are written in one transaction once this many are waiting or after TICKET_FLUSH_SECONDS
+DEFAULT_BATCH_SIZE = 50
+TICKET_FLUSH_SECONDS = float(os.getenv("TICKET_FLUSH_SECONDS", "0.5"))
+# A repeated request within this many seconds returns the ticket already opened; later it opens a new one
+TICKET_DEDUP_SECONDS = float(os.getenv("TICKET_DEDUP_SECONDS", "900"))
+ticket_columns = ("id", "name", "email", "question", "previous_question", "status", "timestamp", "created_at")
+
+
+def idempotency_key(name, email, question, previous_question=""):
+    """Key of a ticket request: retries, reruns and duplicate tool calls for the same issue share it within the dedup window"""
+    payload = json.dumps([name.strip().lower(), email.strip().lower(), question.strip(), previous_question.strip()], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TicketStore:
+    """SQLite (WAL) support ticket store shared by every session and worker, with write-behind batching.
+
+    create() returns at once; a background thread writes queued tickets in batches. Every ticket gets a
+    unique id; a request repeating one made within dedup_seconds gets the earlier ticket back.
+    """
+
+    def __init__(self, path=TICKET_DB_PATH, batch_size=DEFAULT_BATCH_SIZE, flush_seconds=TICKET_FLUSH_SECONDS, dedup_seconds=TICKET_DEDUP_SECONDS):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.dedup_seconds = dedup_seconds
+        self._lock = threading.Lock()  # Guards the connection
+        self._pending = {}  # id -> (ticket, idempotency key) waiting to be written
+        self._pending_lock = threading.Condition()
+        self._closed = False
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        # WAL lets the viewer read while another session or worker writes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tickets ("
+            "id TEXT PRIMARY KEY, name TEXT NOT NULL, email TEXT NOT NULL, question TEXT NOT NULL, "
+            "previous_question TEXT NOT NULL, status TEXT NOT NULL, timestamp TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        # Stores created before tickets had unique ids derived their id from the key and lack the column
+        if "dedup_key" not in [row[1] for row in self._conn.execute("PRAGMA table_info(tickets)")]:
+            self._conn.execute("ALTER TABLE tickets ADD COLUMN dedup_key TEXT NOT NULL DEFAULT ''")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tickets_created_at ON tickets (created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tickets_dedup_key ON tickets (dedup_key, created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tickets_status_created_at ON tickets (status, created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tickets_email ON tickets (email)")
+        self._conn.commit()
+        self._writer = threading.Thread(target=self._write_behind, name="ticket-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def create(self, name, email, question, previous_question="", key=None):
+        """Queue a ticket and return it with created=False when the same request was made within the dedup window"""
+        key = key or idempotency_key(name, email, question, previous_question)
+        now = time.time()
+        existing = self.recent(key, now - self.dedup_seconds)
+        if existing is not None:
+            return existing, False
+
+        ticket = {
+            "id": f"TICKET-{uuid.uuid4().hex[:16].upper()}",
+            "name": name,
+            "email": email,
+            "question": question,
+            "previous_question": previous_question,
+            "status": "pending",
+            "timestamp": datetime.fromtimestamp(now).isoformat(),
+            "created_at": now
+        }
+        with self._pending_lock:
+            # Another thread may have queued the same request since the lookup above
+            for pending, pending_key in self._pending.values():
+                if pending_key == key:
+                    return dict(pending), False
+            self._pending[ticket["id"]] = (ticket, key)
+            if len(self._pending) >= self.batch_size:
+                self._pending_lock.notify()
+        increment("tickets_created")
+        return dict(ticket), True
+
+    def recent(self, key, since):
+        """Return the newest ticket of an idempotency key created after since, queued or written, or None"""
+        with self._pending_lock:
+            for ticket, pending_key in self._pending.values():
+                if pending_key == key and ticket["created_at"] >= since:
+                    return dict(ticket)
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(ticket_columns)} FROM tickets WHERE dedup_key = ? AND created_at >= ? ORDER BY created_at DESC LIMIT 1",
+                (key, since)
+            ).fetchone()
+        return dict(zip(ticket_columns, row)) if row else None
+
+    def get(self, ticket_id):
+        """Return a ticket by id, including one still waiting to be written, or None"""
+        with self._pending_lock:
+            if ticket_id in self._pending:
+                return dict(self._pending[ticket_id][0])
+        with self._lock:
+            row = self._conn.execute(f"SELECT {', '.join(ticket_columns)} FROM tickets WHERE id = ?", (ticket_id,)).fetchone()
+        return dict(zip(ticket_columns, row)) if row else None
+
+    def list(self, status=None, limit=20, offset=0):
+        """Return one page of tickets, newest first"""
+        self.flush()  # Readers see the tickets queued by this process
+        query = f"SELECT {', '.join(ticket_columns)} FROM tickets"
+        params = []
+        if status:
+            query += " WHERE status = ?"
+            params.append(status)
+        query += " ORDER BY created_at DESC, id LIMIT ? OFFSET ?"
+        with self._lock:
+            rows = self._conn.execute(query, (*params, limit, offset)).fetchall()
+        return [dict(zip(ticket_columns, row)) for row in rows]
+
+    def count(self, status=None):
+        self.flush()
+        with self._lock:
+            if status:
+                return self._conn.execute("SELECT COUNT(*) FROM tickets WHERE status = ?", (status,)).fetchone()[0]
+            return self._conn.execute("SELECT COUNT(*) FROM tickets").fetchone()[0]
+
+    def flush(self):
+        """Write every queued ticket in one transaction"""
+        with self._pending_lock:
+            batch = list(self._pending.values())
+        if not batch:
+            return 0
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT OR IGNORE INTO tickets ({', '.join(ticket_columns)}, dedup_key) VALUES ({', '.join('?' * (len(ticket_columns) + 1))})",
+                [(*(ticket[column] for column in ticket_columns), key) for ticket, key in batch]
+            )
+            self._conn.commit()
+        with self._pending_lock:
+            for ticket, _ in batch:
+                self._pending.pop(ticket["id"], None)
+        increment("ticket_flushes")
+        return len(batch)
+
+    def _write_behind(self):
+        while True:
+            with self._pending_lock:
+                self._pending_lock.wait_for(lambda: self._closed or len(self._pending) >= self.batch_size, timeout=self.flush_seconds)
+                closed = self._closed
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                print(f"❌ Error writing support tickets: {str(e)}")
+            if closed:
+                return
+
+    def close(self):
+        """Write the remaining tickets and stop the writer thread"""
+        with self._pending_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._pending_lock.notify()
+        self._writer.join()
+
+
+@lru_cache(maxsize=1)
+def get_ticket_store():
+    """Return the process-wide ticket store"""
+    return TicketStore()
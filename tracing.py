@@ -0,0 +1,224 @@
+import contextvars
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Append finished spans as OTLP/JSON lines to this file (e.g. traces.jsonl) when set
+TRACE_FILE = os.getenv("TRACE_FILE", "")
+# Serve Prometheus text metrics on this port when set
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+# TRACE_LOG=1 prints one line per finished span to the console
+TRACE_LOG = os.getenv("TRACE_LOG", "0") == "1"
+# Upper bounds of the latency histogram buckets, in seconds
+latency_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Span attributes that are summed into token counters
+token_attributes = ("prompt_tokens", "cached_tokens", "completion_tokens")
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_metrics_lock = threading.Lock()
+_file_lock = threading.Lock()
+_durations = {}  # stage -> [bucket counts..., +Inf count, sum]
+_errors = {}
+_tokens = {}  # (stage, kind) -> count
+_cache = {"hit": 0, "miss": 0}
+_counters = {}  # (name, sorted label items) -> value
+
+
+class Span:
+    """One timed stage of a request with its attributes"""
+
+    def __init__(self, name, parent=None, **attributes):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = attributes
+        self.error = None
+        self.start_ns = time.time_ns()
+        self.started = time.perf_counter()
+        self.duration = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def add_usage(self, prompt_tokens=0, completion_tokens=0, cached_tokens=0):
+        for key, value in (("prompt_tokens", prompt_tokens), ("completion_tokens", completion_tokens), ("cached_tokens", cached_tokens)):
+            self.attributes[key] = self.attributes.get(key, 0) + value
+
+    def end(self):
+        self.duration = time.perf_counter() - self.started
+
+
+def current_span():
+    """Return the active span of this context, or None"""
+    return _current_span.get()
+
+
+@contextmanager
+def span(name, activate=True, **attributes):
+    """Time a stage and export it when the block ends.
+
+    Generators that yield inside the block should pass activate=False: the span is then not made
+    current, so it does not leak into the caller's context between yields.
+    """
+    current = Span(name, _current_span.get(), **attributes)
+    token = _current_span.set(current) if activate else None
+    try:
+        yield current
+    except BaseException as e:
+        if not isinstance(e, GeneratorExit):
+            current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        if token is not None:
+            _current_span.reset(token)
+        current.end()
+        _record(current)
+
+
+def record_cache(hit):
+    """Count a response cache lookup and mark it on the active span"""
+    with _metrics_lock:
+        _cache["hit" if hit else "miss"] += 1
+    active = _current_span.get()
+    if active is not None:
+        active.set(cache_hit=hit)
+
+
+def increment(name, amount=1, **labels):
+    """Add to a named counter, exported as app_<name>_total"""
+    key = (name, tuple(sorted(labels.items())))
+    with _metrics_lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def counter_totals():
+    """Return every counter summed over its labels, by name"""
+    totals = {}
+    with _metrics_lock:
+        for (name, _), value in _counters.items():
+            totals[name] = totals.get(name, 0) + value
+    return totals
+
+
+def _record(finished):
+    with _metrics_lock:
+        histogram = _durations.setdefault(finished.name, [0] * (len(latency_buckets) + 1) + [0.0])
+        for index, bound in enumerate(latency_buckets):
+            if finished.duration <= bound:
+                histogram[index] += 1
+        histogram[len(latency_buckets)] += 1
+        histogram[-1] += finished.duration
+        if finished.error:
+            _errors[finished.name] = _errors.get(finished.name, 0) + 1
+        for kind in token_attributes:
+            if finished.attributes.get(kind):
+                _tokens[(finished.name, kind)] = _tokens.get((finished.name, kind), 0) + finished.attributes[kind]
+    if TRACE_LOG:
+        attributes = " ".join(f"{key}={value}" for key, value in finished.attributes.items())
+        print(f"⏱️ {finished.name} {finished.duration * 1000:.1f} ms {attributes}{' ❌ ' + finished.error if finished.error else ''}")
+    if TRACE_FILE:
+        _export(finished)
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _export(finished):
+    """Append the span as one OTLP/JSON ExportTraceServiceRequest line"""
+    otlp_span = {
+        "traceId": finished.trace_id,
+        "spanId": finished.span_id,
+        "name": finished.name,
+        "kind": 1,
+        "startTimeUnixNano": str(finished.start_ns),
+        "endTimeUnixNano": str(finished.start_ns + int(finished.duration * 1e9)),
+        "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in finished.attributes.items()],
+        "status": {"code": 2, "message": finished.error} if finished.error else {"code": 1}
+    }
+    if finished.parent_id:
+        otlp_span["parentSpanId"] = finished.parent_id
+    line = json.dumps({"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "user-guide-assistant"}}]},
+        "scopeSpans": [{"scope": {"name": "tracing"}, "spans": [otlp_span]}]
+    }]})
+    with _file_lock:
+        with open(TRACE_FILE, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+def prometheus_text():
+    """Render the collected metrics in the Prometheus text exposition format"""
+    with _metrics_lock:
+        durations = {stage: list(values) for stage, values in _durations.items()}
+        errors = dict(_errors)
+        tokens = dict(_tokens)
+        cache = dict(_cache)
+        counters = dict(_counters)
+
+    lines = [
+        "# HELP app_stage_duration_seconds Latency of each request stage",
+        "# TYPE app_stage_duration_seconds histogram"
+    ]
+    for stage, values in sorted(durations.items()):
+        for bound, count in zip(latency_buckets, values):
+            lines.append(f'app_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+        lines.append(f'app_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {values[len(latency_buckets)]}')
+        lines.append(f'app_stage_duration_seconds_sum{{stage="{stage}"}} {values[-1]:.6f}')
+        lines.append(f'app_stage_duration_seconds_count{{stage="{stage}"}} {values[len(latency_buckets)]}')
+
+    lines += ["# HELP app_stage_errors_total Stages that ended with an exception", "# TYPE app_stage_errors_total counter"]
+    lines += [f'app_stage_errors_total{{stage="{stage}"}} {count}' for stage, count in sorted(errors.items())]
+
+    lines += ["# HELP app_tokens_total Model tokens by stage and kind", "# TYPE app_tokens_total counter"]
+    lines += [f'app_tokens_total{{stage="{stage}",kind="{kind.replace("_tokens", "")}"}} {count}' for (stage, kind), count in sorted(tokens.items())]
+
+    lines += ["# HELP app_response_cache_requests_total Response cache lookups", "# TYPE app_response_cache_requests_total counter"]
+    lines += [f'app_response_cache_requests_total{{result="{result}"}} {count}' for result, count in sorted(cache.items())]
+
+    for name in sorted({name for name, _ in counters}):
+        lines.append(f"# TYPE app_{name}_total counter")
+        for (counter, labels), value in sorted(counters.items()):
+            if counter == name:
+                label_text = ",".join(f'{key}="{label}"' for key, label in labels)
+                lines.append(f"app_{name}_total{{{label_text}}} {value}" if label_text else f"app_{name}_total {value}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes every few seconds would flood the console
+
+
+@lru_cache(maxsize=1)
+def start_metrics_server(port=METRICS_PORT):
+    """Serve /metrics in a background thread once per process; does nothing without a port"""
+    if not port:
+        return None
+    server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    print(f"📈 Prometheus metrics on http://0.0.0.0:{port}/metrics")
+    return server
@@ -1,37 +1,180 @@
-from transformers import pipeline
+import numpy as np
 import soundfile as sf
-import time
-import streamlit as st
-
-
-def timeit(func):
-    def wrapper(*args, **kwargs):
-        start = time.perf_counter()
-        result = func(*args, **kwargs)
-        end = time.perf_counter()
-        print(f"{func.__name__} took {end - start:.6f} seconds")
-        return result
-    return wrapper
+import os
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+from tracing import span
+
+# MMS-TTS checkpoint per answer language; languages without one are not spoken
+tts_models = {
+    "English": "eng",
+    "Spanish": "spa",
+    "French": "fra",
+    "German": "deu",
+    "Portuguese": "por",
+    "Vietnamese": "vie",
+    "Korean": "kor",
+    "Arabic": "ara"
+}
+
+# Each model holds a few hundred MB, so only the most recently used ones stay loaded
+TTS_MAX_MODELS = int(os.getenv("TTS_MAX_MODELS", "2"))
+# Comma-separated MMS codes loaded in the background once the UI has rendered
+TTS_WARM_LANGUAGES = os.getenv("TTS_WARM_LANGUAGES", "eng")
+# Opt-in CPU mode: int8 dynamic quantization of the linear layers and a bounded torch thread pool
+TTS_FAST_MODE = os.getenv("TTS_FAST_MODE", "0") == "1"
+# Intra-op threads per synthesis; 0 keeps torch's default of one per core
+TTS_THREADS = int(os.getenv("TTS_THREADS", "0"))
+
+
+def load_pipeline(lang, fast=TTS_FAST_MODE, threads=TTS_THREADS):
+    """Load the MMS-TTS pipeline for a language, optionally quantized for CPU inference"""
+    # transformers and torch take seconds to import, so they are loaded with the first voice
+    import torch
+    from transformers import pipeline
+
+    tts = pipeline("text-to-speech", model=f"facebook/mms-tts-{lang}")
+    if threads:
+        # Without a bound one utterance occupies every core and stalls the other sessions
+        torch.set_num_threads(threads)
+    if fast:
+        # No TorchScript/ONNX export is cached: MMS-TTS is a VITS model whose output length depends on the
+        # predicted durations, so a traced graph only fits inputs of the traced length. The linear layers
+        # quantized here hold most of its compute and the weights load from the Hugging Face cache anyway.
+        tts.model = torch.quantization.quantize_dynamic(tts.model, {torch.nn.Linear}, dtype=torch.qint8)
+    tts.model.eval()
+    return tts
+
+def tts_language_code(language):
+    """Return the MMS code for an answer language, or None if it has no voice"""
+    return tts_models.get(language)
+
+class TTSRegistry:
+    """Loads TTS pipelines on first use and keeps the most recently used ones in memory"""
+
+    def __init__(self, max_models=TTS_MAX_MODELS, fast=TTS_FAST_MODE, threads=TTS_THREADS):
+        self.max_models = max_models
+        self.fast = fast
+        self.threads = threads
+        self._models = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    def get(self, lang):
+        """Return the pipeline for an MMS language code, loading it if needed"""
+        with self._lock:
+            if lang in self._models:
+                self._models.move_to_end(lang)
+                return self._models[lang]
+            # Concurrent callers of the same language wait for a single load
+            loading = self._loading.setdefault(lang, threading.Lock())
+
+        with loading:
+            with self._lock:
+                if lang in self._models:
+                    return self._models[lang]
+            print(f"🔊 Loading TTS model facebook/mms-tts-{lang}{' (int8)' if self.fast else ''}")
+            model = load_pipeline(lang, self.fast, self.threads)
+            with self._lock:
+                self._models[lang] = model
+                while len(self._models) > self.max_models:
+                    evicted, _ = self._models.popitem(last=False)
+                    print(f"🔊 Unloaded TTS model facebook/mms-tts-{evicted}")
+                self._loading.pop(lang, None)
+            return model
+
+    def loaded(self):
+        """Return the codes of the resident models, least recently used first"""
+        with self._lock:
+            return list(self._models)
+
+    def warm_up(self, langs=None):
+        """Load models in a background thread so the first answer does not wait for a download"""
+        if langs is None:
+            langs = [lang.strip() for lang in TTS_WARM_LANGUAGES.split(",") if lang.strip()]
+
+        def load_all():
+            for lang in langs[:self.max_models]:
+                try:
+                    self.get(lang)
+                except Exception as e:
+                    print(f"❌ Error loading TTS model {lang}: {str(e)}")
+
+        thread = threading.Thread(target=load_all, name="tts-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+@lru_cache(maxsize=1)
+def get_tts_registry():
+    """Return the process-wide TTS model registry, warming the configured languages once"""
+    registry = TTSRegistry()
+    registry.warm_up()
+    return registry
 
-@st.cache_resource
 def load_tts(lang="vie"):
-    return pipeline("text-to-speech", model=f"facebook/mms-tts-{lang}")
+    return get_tts_registry().get(lang)
 
-@timeit
 def speak(text, tts=None, save_path=None, lang="vie"):
+    import torch
+
     if tts is None:
         tts = load_tts(lang)
 
-    speech = tts(text)
-    print(type(speech["audio"]))
-    print(speech["audio"])
-    audio = speech["audio"].squeeze()  # converts (1, N) → (N,)
+    with span("tts_synthesis", lang=lang, chars=len(text)) as tts_span, torch.inference_mode():
+        speech = tts(text)
+        audio = speech["audio"].squeeze()  # converts (1, N) → (N,)
+        tts_span.set(audio_seconds=round(audio.shape[-1] / speech["sampling_rate"], 2))
     if save_path:
         sf.write(save_path, audio, samplerate=speech["sampling_rate"])
         print(f"Saved to {save_path}")
         return
     return audio, speech["sampling_rate"]
 
+def split_sentences(text, min_chars=40, max_chars=300):
+    """Split text into sentence-sized pieces for incremental synthesis"""
+    # Markdown markers and list bullets are not spoken
+    text = re.sub(r"[*_#`>|]+", " ", text)
+    text = re.sub(r"^\s*[-•]\s+", "", text, flags=re.MULTILINE)
+    pieces = []
+    for sentence in re.split(r"(?<=[.!?。！？])\s+|\n+", text):
+        sentence = " ".join(sentence.split())
+        if not sentence:
+            continue
+        # Overlong sentences are cut at the last space before max_chars
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            pieces.append(sentence[:cut])
+            sentence = sentence[cut:].strip()
+        pieces.append(sentence)
+
+    # Very short pieces (list bullets, headings) are merged with the next one
+    merged = []
+    for piece in pieces:
+        if merged and len(merged[-1]) < min_chars and len(merged[-1]) + len(piece) < max_chars:
+            merged[-1] = f"{merged[-1]} {piece}"
+        else:
+            merged.append(piece)
+    return merged
+
+def speak_stream(text, tts=None, lang="vie", batch_size=1):
+    """Synthesize text sentence by sentence, yielding (audio, sampling_rate) as each batch finishes"""
+    import torch
+
+    if tts is None:
+        tts = load_tts(lang)
+
+    sentences = split_sentences(text)
+    for start in range(0, len(sentences), batch_size):
+        batch = sentences[start:start + batch_size]
+        with span("tts_synthesis", lang=lang, chars=sum(len(sentence) for sentence in batch), sentences=len(batch)), torch.inference_mode():
+            outputs = tts(batch, batch_size=batch_size) if batch_size > 1 else [tts(batch[0])]
+        for speech in outputs:
+            yield np.asarray(speech["audio"]).squeeze(), speech["sampling_rate"]
+
 # Example use:
 if __name__ == "__main__":
     load_tts(lang="eng")
@@ -0,0 +1,178 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+import soundfile as sf
+
+from tts import speak, speak_stream
+
+# Location and size limit of the on-disk audio cache
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", ".tts_cache")
+DEFAULT_DISK_BYTES = 200 * 1024 * 1024
+# Number of waveforms kept in memory
+DEFAULT_MEMORY_ITEMS = 32
+# Synthesis is CPU-bound and shares one model, so a single worker avoids oversubscribing cores
+DEFAULT_WORKERS = 1
+
+
+class AudioCache:
+    """Two-level LRU cache of synthesized waveforms, keyed by a hash of text and language"""
+
+    def __init__(self, directory=TTS_CACHE_DIR, max_memory_items=DEFAULT_MEMORY_ITEMS, max_disk_bytes=DEFAULT_DISK_BYTES):
+        self.directory = directory
+        self.max_memory_items = max_memory_items
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(text, lang):
+        return hashlib.sha256(f"{lang}\0{text}".encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.wav")
+
+    def get(self, key):
+        """Return (audio, sampling_rate) from memory or disk, or None"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        audio, sampling_rate = sf.read(path, dtype="float32")
+        os.utime(path)  # Mark as recently used for disk eviction
+        self._remember(key, (audio, sampling_rate))
+        return audio, sampling_rate
+
+    def set(self, key, audio, sampling_rate):
+        """Store a waveform in memory and on disk"""
+        self._remember(key, (audio, sampling_rate))
+        sf.write(self._path(key), audio, sampling_rate, subtype="FLOAT")
+        self._evict_disk()
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_items:
+                self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        """Delete the least recently used files beyond the disk budget"""
+        entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith(".wav")]
+        total = sum(entry.stat().st_size for entry in entries)
+        for entry in sorted(entries, key=lambda entry: entry.stat().st_mtime):
+            if total <= self.max_disk_bytes:
+                break
+            total -= entry.stat().st_size
+            os.remove(entry.path)
+
+
+class SpeechStream:
+    """Audio segments of one text, appended by a worker while the first ones are already playable"""
+
+    def __init__(self, key):
+        self.key = key
+        self.segments = []
+        self.sampling_rate = None
+        self.done = False
+        self.error = None
+
+    @classmethod
+    def from_audio(cls, key, audio, sampling_rate):
+        stream = cls(key)
+        stream.segments.append(audio)
+        stream.sampling_rate = sampling_rate
+        stream.done = True
+        return stream
+
+
+class TTSService:
+    """Runs speech synthesis on a worker pool and serves repeated requests from the audio cache"""
+
+    def __init__(self, cache=None, max_workers=DEFAULT_WORKERS):
+        self.cache = cache or AudioCache()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tts")
+        self._jobs = {}
+        self._streams = {}
+        self._lock = threading.Lock()
+
+    def submit(self, text, lang="eng"):
+        """Return a Future of (audio, sampling_rate); cached audio and in-flight jobs are reused"""
+        key = AudioCache.make_key(text, lang)
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None:
+                return job
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            job = Future()
+            job.set_result(cached)
+            return job
+
+        with self._lock:
+            # Another thread may have submitted the same text meanwhile
+            job = self._jobs.get(key)
+            if job is None:
+                job = self._executor.submit(self._synthesize, key, text, lang)
+                self._jobs[key] = job
+        return job
+
+    def _synthesize(self, key, text, lang):
+        try:
+            audio, sampling_rate = speak(text, lang=lang)
+            self.cache.set(key, audio, sampling_rate)
+            return audio, sampling_rate
+        finally:
+            with self._lock:
+                self._jobs.pop(key, None)
+
+    def submit_stream(self, text, lang="eng"):
+        """Return a SpeechStream that fills sentence by sentence; cached audio comes back as one finished segment"""
+        key = AudioCache.make_key(text, lang)
+        with self._lock:
+            stream = self._streams.get(key)
+            if stream is not None:
+                return stream
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            return SpeechStream.from_audio(key, *cached)
+
+        with self._lock:
+            stream = self._streams.get(key)
+            if stream is None:
+                stream = SpeechStream(key)
+                self._streams[key] = stream
+                self._executor.submit(self._synthesize_stream, stream, text, lang)
+        return stream
+
+    def _synthesize_stream(self, stream, text, lang):
+        try:
+            for audio, sampling_rate in speak_stream(text, lang=lang):
+                stream.sampling_rate = sampling_rate
+                stream.segments.append(audio)
+            if stream.segments:
+                self.cache.set(stream.key, np.concatenate(stream.segments), stream.sampling_rate)
+        except Exception as e:
+            print(f"❌ Error synthesizing speech: {str(e)}")
+            stream.error = e
+        finally:
+            stream.done = True
+            with self._lock:
+                self._streams.pop(stream.key, None)
+
+
+@lru_cache(maxsize=1)
+def get_tts_service():
+    """Return the process-wide TTS service"""
+    return TTSService()